@@ -0,0 +1,52 @@
+import os
+import psycopg2
+from dotenv import load_dotenv
+import argparse
+
+parser = argparse.ArgumentParser(description="A script with an overwrite flag.")
+
+# Add a boolean flag. 'action="store_true"' means:
+# If the flag is present, set the variable 'overwrite' to True.
+# If the flag is absent, the default value (False) is used.
+parser.add_argument(
+  "--overwrite",
+  action="store_true",
+  help="If present, allows existing files to be overwritten.",
+)
+
+args = parser.parse_args()
+
+# Check the value of the flag
+if args.overwrite:
+  print("⚠️ Overwrite mode is ON. Proceeding with caution.")
+else:
+  print("✅ Overwrite mode is OFF. Will not modify existing files.")
+# Load environment variables
+load_dotenv()
+
+# Connect to PostgreSQL
+with psycopg2.connect(
+  dbname=os.getenv("PG_DB", "vectordb"),
+  user=os.getenv("PG_USER", "postgres"),
+  password=os.getenv("PG_PASSWORD", "postgres"),
+  host=os.getenv("PG_HOST", "pgvector-db"),
+  port=int(os.getenv("PG_PORT", "5432")),
+) as conn:
+  with conn.cursor() as cur:
+    if args.overwrite:
+      cur.execute("DROP TABLE IF EXISTS chatbot_request_results;")
+
+    # Short-lived chatbot results shared between instances coalescing identical requests.
+    # UNLOGGED: losing them on a crash only costs a recomputation.
+    cur.execute("""
+      CREATE UNLOGGED TABLE IF NOT EXISTS chatbot_request_results (
+        request_key CHAR(64) PRIMARY KEY,
+        response JSONB NOT NULL,
+        created_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT clock_timestamp()
+      );
+    """)
+
+  # Explicit commit
+  conn.commit()
+
+print("Chatbot cache table created successfully.")
@@ -57,9 +57,16 @@ with psycopg2.connect(
         user_id UUID NOT NULL REFERENCES users(user_id),
         title VARCHAR(50),
         created_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT clock_timestamp(),
-        updated_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT clock_timestamp()
+        updated_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT clock_timestamp(),
+        summary TEXT,
+        summary_message_count INTEGER NOT NULL DEFAULT 0
       );
     """)
+    # Rolling summary columns for tables created before they existed
+    cur.execute("ALTER TABLE conversations ADD COLUMN IF NOT EXISTS summary TEXT;")
+    cur.execute(
+      "ALTER TABLE conversations ADD COLUMN IF NOT EXISTS summary_message_count INTEGER NOT NULL DEFAULT 0;"
+    )
     cur.execute("""
       CREATE TABLE IF NOT EXISTS messages (
         message_id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
@@ -80,9 +87,12 @@ with psycopg2.connect(
         s3_url TEXT NOT NULL,
         filename VARCHAR(255) NOT NULL,
         file_type VARCHAR(100) NOT NULL,
-        created_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT clock_timestamp()
+        created_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT clock_timestamp(),
+        content_hash VARCHAR(64)
       );
     """)
+    # Content hash column for tables created before it existed
+    cur.execute("ALTER TABLE attachments ADD COLUMN IF NOT EXISTS content_hash VARCHAR(64);")
 
     # Create composite index on common columns for faster lookups
     cur.execute(
@@ -124,6 +134,21 @@ with psycopg2.connect(
       $$ LANGUAGE plpgsql;
     """)
 
+    cur.execute("""
+      CREATE OR REPLACE FUNCTION update_conversation_timestamp_from_attachment()
+      RETURNS TRIGGER AS $$
+      BEGIN
+        UPDATE conversations
+        SET updated_at = clock_timestamp()
+        WHERE conversation_id = (
+          SELECT conversation_id FROM messages
+          WHERE message_id = COALESCE(NEW.message_id, OLD.message_id)
+        );
+        RETURN COALESCE(NEW, OLD);
+      END;
+      $$ LANGUAGE plpgsql;
+    """)
+
     # Create trigger to update messages.updated_at on row updates
     cur.execute("DROP TRIGGER IF EXISTS update_messages_updated_at ON messages;")
     cur.execute("""
@@ -144,7 +169,20 @@ with psycopg2.connect(
         EXECUTE FUNCTION update_conversation_timestamp();
     """)
 
-    # Create trigger to update conversations.updated_at on row updates
+    # Create trigger to update conversation timestamp on attachment insert/update/delete,
+    # so the conversation's updated_at versions its messages and their attachments (ETags)
+    cur.execute(
+      "DROP TRIGGER IF EXISTS update_conversation_on_attachment_change ON attachments;"
+    )
+    cur.execute("""
+      CREATE TRIGGER update_conversation_on_attachment_change
+        AFTER INSERT OR UPDATE OR DELETE ON attachments
+        FOR EACH ROW
+        EXECUTE FUNCTION update_conversation_timestamp_from_attachment();
+    """)
+
+    # Create trigger to update conversations.updated_at on row updates; summary-only updates
+    # leave it alone, since updated_at versions the conversation as users see it (ETags)
     cur.execute(
       "DROP TRIGGER IF EXISTS update_conversations_updated_at ON conversations;"
     )
@@ -152,6 +190,10 @@ with psycopg2.connect(
       CREATE TRIGGER update_conversations_updated_at
         BEFORE UPDATE ON conversations
         FOR EACH ROW
+        WHEN (
+          (OLD.summary, OLD.summary_message_count)
+            IS NOT DISTINCT FROM (NEW.summary, NEW.summary_message_count)
+        )
         EXECUTE FUNCTION update_updated_at_column();
     """)
 
@@ -0,0 +1,33 @@
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from src.shared.IFIIndex_utils import build_index
+
+# Writes the sidecar index loaded at startup: per IFI file token count, size, sections, hash and mtime
+parser = argparse.ArgumentParser(description="Index IFI markdown files")
+parser.add_argument("--source", default=os.getenv("IFI_DIR", "./src/IFI_Table_Files"))
+parser.add_argument("--output", default=os.getenv("IFI_INDEX", "./src/IFI_Table_Files.index.json"))
+parser.add_argument("--count-tokens", action="store_true", help="Count tokens with Gemini instead of estimating")
+args = parser.parse_args()
+
+if not os.path.isdir(args.source):
+    raise FileNotFoundError(f"Directory '{args.source}' not found")
+
+count_tokens = None
+tokenizer = "estimate"
+if args.count_tokens:
+    from src.core.config import genai_client, GEMINI_MODEL
+    from src.shared.Scheduler_utils import BACKGROUND, llm_scheduler
+
+    def count_tokens(text: str) -> int:
+        return llm_scheduler.call(GEMINI_MODEL, lambda: genai_client.models.count_tokens(
+            model=GEMINI_MODEL, contents=text
+        ), priority=BACKGROUND).total_tokens
+
+    tokenizer = GEMINI_MODEL
+
+count = build_index(args.source, args.output, count_tokens=count_tokens, tokenizer=tokenizer)
+print(f"✅ Indexed {count} IFI files into {args.output}")
@@ -0,0 +1,23 @@
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from src.shared.IFIArchive_utils import IFIArchive, build_archive
+
+# Packs the parsed IFI markdown files into the single archive served by read_file_text
+parser = argparse.ArgumentParser(description="Pack IFI markdown files into one archive")
+parser.add_argument("--source", default=os.getenv("IFI_DIR", "./src/IFI_Table_Files"))
+parser.add_argument("--output", default=os.getenv("IFI_ARCHIVE", "./src/IFI_Table_Files.pack"))
+parser.add_argument("--compress", action="store_true", help="zlib-compress documents (no zero-copy reads)")
+args = parser.parse_args()
+
+if not os.path.isdir(args.source):
+    raise FileNotFoundError(f"Directory '{args.source}' not found")
+
+version = build_archive(args.source, args.output, compress=args.compress)
+archive = IFIArchive(args.output)
+if not archive.verify():
+    raise RuntimeError(f"Archive {args.output} failed verification")
+print(f"✅ Packed {len(archive)} IFI files into {args.output} (version {version})")
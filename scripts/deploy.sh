@@ -73,8 +73,17 @@ aws ecr get-login-password --region "$REGION" | \
   docker login --username AWS --password-stdin "$ECR_REGISTRY"
 
 # === Step 3: Build Docker image ===
+# IFI markdown files ship as one packed archive plus its sidecar index; docker/Dockerfile.lambda.dockerignore
+# keeps the .md files out of the Lambda image (read by BuildKit, since the build context is the repo root)
+if [[ -d ./src/IFI_Table_Files ]]; then
+  echo "📦 Packing IFI files..."
+  python init/pack_ifi_archive.py --source ./src/IFI_Table_Files --output ./src/IFI_Table_Files.pack
+  # Token counts come from Gemini's tokenizer; unchanged files reuse the counts of the previous index
+  python init/index_ifi_files.py --source ./src/IFI_Table_Files --output ./src/IFI_Table_Files.index.json --count-tokens
+fi
+
 echo "🔨 Building Docker image from $DOCKERFILE..."
-docker build --no-cache -t "${REPO_NAME}:${IMAGE_TAG}" -f "$DOCKERFILE" . \
+DOCKER_BUILDKIT=1 docker build --no-cache -t "${REPO_NAME}:${IMAGE_TAG}" -f "$DOCKERFILE" . \
   --build-arg CACHE_BREAK="$BUILD_ARG_CACHE_BREAK"
 
 # === Step 4: Tag + Push image ===
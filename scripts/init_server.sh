@@ -21,6 +21,11 @@ if [ -f /app/init/create_conversation_table.py ]; then
 python3 /app/init/create_conversation_table.py
 fi
 
+echo "🔹 Creating chatbot cache table..."
+if [ -f /app/init/create_chatbot_cache_table.py ]; then
+python3 /app/init/create_chatbot_cache_table.py
+fi
+
 echo "✅ Initialization done. Starting Uvicorn..."
 # exec to hand PID 1 to uvicorn so signals work correctly
 exec uvicorn src.main:app --host 0.0.0.0 --port 8000 --reload
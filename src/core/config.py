@@ -24,3 +24,111 @@ COGNITO_CLIENT_SECRET = os.environ.get("COGNITO_CLIENT_SECRET")
 COGNITO_REGION = os.environ.get("COGNITO_REGION")
 USER_POOL_ID = os.environ.get("USER_POOL_ID")
 APP_FRONTEND_URL = os.environ.get("APP_FRONTEND_URL")
+
+# Prompt context budgets (estimated tokens per section)
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "24000"))
+HISTORY_TOKEN_BUDGET = int(os.getenv("HISTORY_TOKEN_BUDGET", "4000"))
+ATTACHMENT_TOKEN_BUDGET = int(os.getenv("ATTACHMENT_TOKEN_BUDGET", "8000"))
+
+# Rolling conversation summary: raw turns kept verbatim next to the summary, and how long a turn
+# waits for a stale summary's refresh after its answer is ready
+HISTORY_RAW_TURNS = int(os.getenv("HISTORY_RAW_TURNS", "4"))
+SUMMARY_REFRESH_WAIT_SECONDS = float(os.getenv("SUMMARY_REFRESH_WAIT_SECONDS", "1.5"))
+
+# Chatbot request coalescing: "memory" (per instance) or "postgres" (across instances)
+CHATBOT_COALESCE_BACKEND = os.getenv("CHATBOT_COALESCE_BACKEND", "memory")
+CHATBOT_COALESCE_TTL_SECONDS = int(os.getenv("CHATBOT_COALESCE_TTL_SECONDS", "60"))
+
+# Outbound provider scheduler
+# LLM_RATE_LIMITS: comma-separated "model=requests_per_minute" pairs
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "8"))
+LLM_DEFAULT_RPM = float(os.getenv("LLM_DEFAULT_RPM", "600"))
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "5"))
+# Scheduler metrics are written as CloudWatch Embedded Metric Format log lines at most once per
+# interval (0 disables them)
+LLM_METRICS_INTERVAL_SECONDS = float(os.getenv("LLM_METRICS_INTERVAL_SECONDS", "60"))
+LLM_METRICS_NAMESPACE = os.getenv("LLM_METRICS_NAMESPACE", "RagApp/LLMScheduler")
+LLM_RATE_LIMITS = {
+  model.strip(): float(rpm)
+  for model, rpm in (
+    pair.split("=", 1)
+    for pair in os.getenv("LLM_RATE_LIMITS", "").split(",")
+    if "=" in pair
+  )
+}
+
+# Chatbot request deadline (API Gateway caps requests at 29s)
+CHATBOT_DEADLINE_SECONDS = float(os.getenv("CHATBOT_DEADLINE_SECONDS", "25"))
+# Time kept back for the final generation call while earlier stages run
+DEADLINE_GENERATION_RESERVE_SECONDS = float(os.getenv("DEADLINE_GENERATION_RESERVE_SECONDS", "10"))
+
+# Attachments saved/converted/uploaded at once per chatbot request
+ATTACHMENT_CONCURRENCY = int(os.getenv("ATTACHMENT_CONCURRENCY", "4"))
+
+# Content-addressed attachment caches (entries per instance; extracted descriptions TTL)
+ATTACHMENT_CACHE_SIZE = int(os.getenv("ATTACHMENT_CACHE_SIZE", "256"))
+DESCRIPTION_CACHE_TTL_SECONDS = float(os.getenv("DESCRIPTION_CACHE_TTL_SECONDS", str(24 * 3600)))
+
+# Attachment uploads: per-request scratch directories are created under this root; size limits in bytes
+ATTACHMENT_SCRATCH_ROOT = os.getenv("ATTACHMENT_SCRATCH_ROOT", "/tmp")
+MAX_ATTACHMENT_BYTES = int(os.getenv("MAX_ATTACHMENT_BYTES", str(20 * 1024 * 1024)))
+MAX_ATTACHMENTS_TOTAL_BYTES = int(os.getenv("MAX_ATTACHMENTS_TOTAL_BYTES", str(50 * 1024 * 1024)))
+
+# Local PDF extraction: worker processes, pages per parallel task, and the text a page needs
+# to count as text-based (pages below it with images or drawings are uploaded to Gemini as scanned)
+ATTACHMENT_WORKERS = int(os.getenv("ATTACHMENT_WORKERS", str(min(4, os.cpu_count() or 1))))
+PDF_PAGES_PER_TASK = int(os.getenv("PDF_PAGES_PER_TASK", "8"))
+PDF_MIN_PAGE_CHARS = int(os.getenv("PDF_MIN_PAGE_CHARS", "32"))
+
+# Image attachments are downscaled to fit this many pixels per side and re-encoded before upload
+IMAGE_MAX_DIMENSION = int(os.getenv("IMAGE_MAX_DIMENSION", "2048"))
+IMAGE_JPEG_QUALITY = int(os.getenv("IMAGE_JPEG_QUALITY", "85"))
+
+# Spreadsheets over this many data rows are extracted in parallel row ranges; invalid output of a
+# range (e.g. truncated JSON) is retried this many times
+SHEET_CHUNK_ROWS = int(os.getenv("SHEET_CHUNK_ROWS", "200"))
+SHEET_CHUNK_RETRIES = int(os.getenv("SHEET_CHUNK_RETRIES", "2"))
+
+# Spreadsheet sheets whose BOM columns map with at least this confidence (0-1) are described
+# locally instead of by Gemini; set above 1 to always use Gemini
+BOM_MAPPER_MIN_CONFIDENCE = float(os.getenv("BOM_MAPPER_MIN_CONFIDENCE", "0.8"))
+
+# S3 bucket holding uploaded chat attachments
+ATTACHMENTS_BUCKET = os.getenv("ATTACHMENTS_BUCKET", "lemonaid-attachments-bucket")
+
+# Parsed IFI files are kept in memory up to this many bytes; cached files are re-checked against
+# their mtime at most every IFI_REVALIDATE_SECONDS, missing ones for IFI_MISSING_TTL_SECONDS.
+# IFI_PRELOAD=true loads the directory at startup instead of on first use.
+IFI_CACHE_MAX_BYTES = int(os.getenv("IFI_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+IFI_REVALIDATE_SECONDS = float(os.getenv("IFI_REVALIDATE_SECONDS", "60"))
+IFI_MISSING_TTL_SECONDS = float(os.getenv("IFI_MISSING_TTL_SECONDS", "60"))
+IFI_PRELOAD = os.getenv("IFI_PRELOAD", "false").lower() == "true"
+
+# Packed IFI archive (init/pack_ifi_archive.py); when present it is served instead of IFI_DIR
+IFI_ARCHIVE = os.getenv("IFI_ARCHIVE", "./src/IFI_Table_Files.pack")
+
+# Prompt context includes the IFI sections (headings / tables) matching the retrieved chunk plus this
+# many neighbouring sections on each side; negative includes whole documents
+IFI_SECTION_RADIUS = int(os.getenv("IFI_SECTION_RADIUS", "1"))
+
+# Sidecar index of the IFI files (init/index_ifi_files.py): token counts, sizes, sections, hashes
+IFI_INDEX = os.getenv("IFI_INDEX", "./src/IFI_Table_Files.index.json")
+
+# Verified access tokens cached per instance (entries), each until its exp
+VERIFIED_TOKEN_CACHE_SIZE = int(os.getenv("VERIFIED_TOKEN_CACHE_SIZE", "1024"))
+
+# Cognito JWKS: keys are refreshed in the background this long before JWKS_CACHE_SECONDS runs out;
+# an unknown kid triggers a refresh at most every JWKS_MIN_REFRESH_SECONDS
+JWKS_CACHE_SECONDS = float(os.getenv("JWKS_CACHE_SECONDS", str(24 * 3600)))
+JWKS_REFRESH_AHEAD_SECONDS = float(os.getenv("JWKS_REFRESH_AHEAD_SECONDS", "3600"))
+JWKS_MIN_REFRESH_SECONDS = float(os.getenv("JWKS_MIN_REFRESH_SECONDS", "60"))
+
+# Registered users cached per instance (entries, seconds) so /auth/user skips the database
+USER_CACHE_SIZE = int(os.getenv("USER_CACHE_SIZE", "1024"))
+USER_CACHE_TTL_SECONDS = float(os.getenv("USER_CACHE_TTL_SECONDS", "300"))
+
+# Presigned attachment download URLs live PRESIGNED_URL_EXPIRES_SECONDS and are reused until they have
+# PRESIGNED_URL_MARGIN_SECONDS left (windows of EXPIRES - MARGIN); PRESIGNED_URL_CACHE_SIZE entries per instance
+PRESIGNED_URL_EXPIRES_SECONDS = int(os.getenv("PRESIGNED_URL_EXPIRES_SECONDS", "3600"))
+PRESIGNED_URL_MARGIN_SECONDS = int(os.getenv("PRESIGNED_URL_MARGIN_SECONDS", "1800"))
+PRESIGNED_URL_CACHE_SIZE = int(os.getenv("PRESIGNED_URL_CACHE_SIZE", "4096"))
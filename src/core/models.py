@@ -30,6 +30,8 @@ class ChatbotReq(BaseModel):
   background: Optional[str] = None
   query: str
   histories: List[History] = []
+  conversation_id: Optional[str] = None  # Enables the server-side rolling summary
+  attachment_keys: List[str] = []  # S3 keys of attachments uploaded via upload_attachments_urls
 
 
 class ChatbotResult(BaseModel):
@@ -42,6 +44,7 @@ class ChatbotRes(BaseModel):
   file_description: str
   resources: List[str]
   result: ChatbotResult
+  attachment_hashes: List[str] = []  # Per attachment, in request order; save them with the message
 
 
 # models for summarize
@@ -104,6 +107,11 @@ class AttachmentCreateRequest(BaseModel):
   file_type: str = Field(
     description="MIME type of the file", examples=["application/pdf"]
   )
+  content_hash: Optional[str] = Field(
+    None,
+    description="Hash of the attachment as returned by the chatbot in attachment_hashes; lets later turns reuse its description",
+    examples=["9f86d081884c7d659a2feaa0c55ad015a3bf4f1b2b0b822cd15d6c15b0f00a08"],
+  )
 
 
 class AttachmentResponse(BaseModel):
@@ -1,3 +1,4 @@
+import asyncio
 import logging
 from pythonjsonlogger import jsonlogger
 logger = logging.getLogger()
@@ -19,9 +20,19 @@ logger.debug("🔥 handler_server.py is being imported")
 
 from mangum import Mangum
 from src.main import app
+from src.core.config import IFI_PRELOAD
+from src.shared.File_utils import ifi_store
+from src.shared.jwt_auth import jwks_manager
 
 logger.debug("✅ app imported successfully")
 
+# Lifespan is off under Mangum: preload IFI documents and JWKS keys during the Lambda init phase instead
+if IFI_PRELOAD:
+    ifi_store.preload()
+# One-shot fetch on a throwaway loop: it leaves no task behind, and Mangum's own loop schedules any
+# background refresh later from get_key
+asyncio.run(jwks_manager.prefetch())
+
 handler = Mangum(app, lifespan="off")
 
 logger.debug("✅ handler wrapped with Mangum")
@@ -1,6 +1,11 @@
+import asyncio
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 import socket as _s
+from src.core.config import IFI_PRELOAD
+from src.shared.File_utils import ifi_store
+from src.shared.jwt_auth import jwks_manager
 from src.modules.auth import api as auth_api
 from src.modules.chatbot import api as chat_api
 from src.modules.summarize import api as sum_api
@@ -29,7 +34,18 @@ openapi_tags = [
   },
 ]
 
-app = FastAPI(redirect_slashes=True, openapi_tags=openapi_tags)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+  # Warm the IFI document store so the first requests do not read IFI files from disk
+  if IFI_PRELOAD:
+    await asyncio.to_thread(ifi_store.preload)
+  # Fetch the Cognito signing keys before the first authenticated request needs them
+  await jwks_manager.prefetch()
+  yield
+
+
+app = FastAPI(redirect_slashes=True, openapi_tags=openapi_tags, lifespan=lifespan)
 app.add_middleware(
   CORSMiddleware,
   allow_origins=["*"],
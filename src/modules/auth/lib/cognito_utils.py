@@ -1,7 +1,11 @@
 import jwt
 from fastapi import HTTPException, Cookie
-from src.core.config import COGNITO_DOMAIN
-from src.shared.DB_utils import insert_user, get_user_by_id, update_user_username
+from src.core.config import COGNITO_DOMAIN, USER_CACHE_SIZE, USER_CACHE_TTL_SECONDS
+from src.shared.Cache_utils import TTLCache
+from src.shared.DB_utils import upsert_user
+
+# user_id -> {"user_id", "username", "email"} of users known to be registered and up to date
+known_users = TTLCache(USER_CACHE_SIZE, USER_CACHE_TTL_SECONDS)
 
 def get_cognito_urls() -> dict:
     """Constructs the necessary Cognito OAuth2 URLs."""
@@ -23,12 +27,13 @@ def register_user_with_id_token(id_token: str):
     """
     Registers a new user into the database using the provided id_token.
     This function decodes the given JWT `id_token` to extract user claims,
-    retrieves the required fields (sub, name, email), and inserts the user
-    into the 'users' table of the database if they do not already exist.
+    retrieves the required fields (sub, name, email), and upserts the user
+    into the 'users' table in one query (inserted if new, username updated if changed).
+    Users seen recently with the same username are served from a per-instance cache without a query.
     Args:
         id_token (str): A JWT id_token obtained from Cognito or another identity provider.
     Returns:
-        tuple[str, str, str]: A tuple containing (user_id, username, email).
+        dict: The user_id, username, email and picture of the user.
     """
     try:
         claims = decode_id_token(id_token)
@@ -41,31 +46,17 @@ def register_user_with_id_token(id_token: str):
         if not user_id or not username or not email:
             raise ValueError("Missing required claims: sub, name, or email")
 
-        user_info = get_user_by_id(user_id)
-        if user_info:
-            if user_info["username"] != username:
-                new_username = update_user_username(user_id, username)
-                return {
-                    "user_id": user_info['user_id'], 
-                    "username": new_username if new_username else username, 
-                    "email": user_info['email'], 
-                    "picture": picture
-                }
-            else: 
-                return {
-                    "user_id": user_info['user_id'], 
-                    "username": user_info['username'], 
-                    "email": user_info['email'], 
-                    "picture": picture
-                }
-        ret = insert_user(user_id, username, email)
-        if ret != user_id:
-            raise ValueError("Failed to insert or retrieve user from database")
+        user_info = known_users.get(user_id)
+        if user_info is None or user_info["username"] != username:
+            user_info = upsert_user(user_id, username, email)
+            if not user_info:
+                raise ValueError("Failed to insert or retrieve user from database")
+            known_users.set(user_id, user_info)
 
         return {
-            "user_id": user_id, 
-            "username": username, 
-            "email": email, 
+            "user_id": user_info["user_id"],
+            "username": user_info["username"],
+            "email": user_info["email"],
             "picture": picture
         }
     except Exception as e:
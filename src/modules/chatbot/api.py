@@ -1,14 +1,32 @@
-from fastapi import APIRouter, File, Form, UploadFile
+import asyncio
+from fastapi import APIRouter, File, Form, Request, UploadFile
 from typing import List, Optional
 from .service.server import agent_service
+from .lib.request_coalescer import coalesce_request
+from .lib.attachment_parser import attachment_digests, check_attachment_sizes
 from src.core.models import ChatbotRes
+from src.shared.Deadline_utils import Deadline
+from src.shared.jwt_auth import CurrentUser
 
 router = APIRouter()
 
 
 @router.post("")
 async def agent_router(
+  request: Request,
+  user: CurrentUser,
   attachments: Optional[List[UploadFile]] = File(None),
   chatbotReq: Optional[str] = Form(None),
 ) -> ChatbotRes:
-  return await agent_service(attachments, chatbotReq)
+  check_attachment_sizes(attachments)
+  deadline = Deadline.from_scope(request.scope)
+  # Hashed once, off the event loop: the coalescing key and the attachment caches share the digests
+  digests = await asyncio.to_thread(attachment_digests, attachments) if attachments else []
+  return await coalesce_request(
+    chatbotReq,
+    attachments,
+    digests,
+    lambda: agent_service(attachments, chatbotReq, deadline, user_id=user["sub"], digests=digests),
+    user_id=user["sub"],
+    deadline=deadline,
+  )
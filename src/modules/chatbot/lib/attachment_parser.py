@@ -1,17 +1,60 @@
 import os
 import uuid
-from google.genai.types import GenerateContentConfig
+import asyncio
+import hashlib
+import shutil
+import tempfile
+from datetime import datetime, timezone
+from google.genai.types import GenerateContentConfig, HttpOptions, UploadFileConfig
 from google import genai
-from fastapi import UploadFile, File
-from typing import List
-import pandas as pd
+from fastapi import UploadFile, File, HTTPException
+from typing import List, Optional
 import logging
 import json
-from src.core.config import GEMINI_MODEL, GEMINI_API_KEY
+from src.core.config import (
+    GEMINI_MODEL,
+    GEMINI_API_KEY,
+    DEADLINE_GENERATION_RESERVE_SECONDS,
+    ATTACHMENT_CONCURRENCY,
+    ATTACHMENT_CACHE_SIZE,
+    DESCRIPTION_CACHE_TTL_SECONDS,
+    ATTACHMENT_SCRATCH_ROOT,
+    MAX_ATTACHMENT_BYTES,
+    MAX_ATTACHMENTS_TOTAL_BYTES,
+    ATTACHMENT_WORKERS,
+    PDF_PAGES_PER_TASK,
+    PDF_MIN_PAGE_CHARS,
+    IMAGE_MAX_DIMENSION,
+    IMAGE_JPEG_QUALITY,
+    SHEET_CHUNK_ROWS,
+    SHEET_CHUNK_RETRIES,
+    BOM_MAPPER_MIN_CONFIDENCE,
+)
+from src.shared.Scheduler_utils import llm_scheduler
+from src.shared.Deadline_utils import Deadline, DeadlineExceeded
+from src.shared.Cache_utils import TTLCache
+from src.shared.WorkerPool_utils import WorkerPool
+from .spreadsheet_reader import SPREADSHEET_EXTENSIONS, read_spreadsheet, chunk_sheets, render_sheets
+from .bom_mapper import map_bom_sheet
+from .s3_attachments import S3Attachment, open_s3_attachment
+from .pdf_reader import PageText, page_count, extract_pages, subset_pdf, render_pages
+from .image_preprocessor import prepare_image
 # Set up basic logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Gemini deletes uploaded files after 48 hours; stop reusing them well before that
+GEMINI_FILE_TTL_SECONDS = 48 * 3600
+GEMINI_FILE_EXPIRY_MARGIN_SECONDS = 3600
+HASH_CHUNK_SIZE = 1024 * 1024
+COPY_CHUNK_SIZE = 1024 * 1024
+
+# Content-addressed caches, keyed by SHA-256 of MIME type + bytes
+gemini_file_cache = TTLCache(ATTACHMENT_CACHE_SIZE)  # attachment hash -> uploaded gemini File
+description_cache = TTLCache(ATTACHMENT_CACHE_SIZE, DESCRIPTION_CACHE_TTL_SECONDS)  # attachment set hash -> List[str]
+
+# CPU-bound attachment work (PDF text extraction, image re-encoding) runs in worker processes
+attachment_pool = WorkerPool("attachments", ATTACHMENT_WORKERS)
 
 
 # Define accepted MIME types for documentation files.
@@ -22,17 +65,46 @@ ACCEPTED_DOC_TYPES = {
     'text/csv': '.csv'
 }
 
+# TODO: the prompt waitting for review and optimization 
+# NEED TO BE REVIEWED
+EXTRACTION_INSTRUCTION = """
+## ROLE
+You are a detail-oriented fastener-industry expert whose primary goal is to help user with RFQ (Request for Quote) email building.
+
+## INSTRUCTIONS
+For this step, parse every debugrmation from the attachments.
+A large sheet may be given as one part (a range of rows, with its header repeated); parse only the rows given.
+
+## OUTPUT
+Return only a JSON array of strings (i.e., list[str]).
+Rules:
+- One string per fastener line item, containing all of that item’s details in source order.
+- If nothing relevant is found, return an empty array `[]`.
+"""
+
 async def attachments_parser(
-    attachments: List[UploadFile] | None = File(None),
-    file_dir: str | None = None
+    attachments: List[UploadFile | S3Attachment] | None = File(None),
+    file_dir: str | None = None,
+    deadline: Optional[Deadline] = None,
+    digests: Optional[List[str]] = None
 ) -> List[str]:
     """
     1. Get the file and query from the attachments
     2. Get the description from Gemini with all the files and content if it's a sheet.
+       Sheets whose BOM columns map with high confidence are described locally without Gemini.
+       Other sheets longer than SHEET_CHUNK_ROWS rows are split into row ranges, each extracted in its own
+       parallel call (retried on its own) and merged back in row order.
     3.  Return the description (List of String will be split by regular expression )
+
+    With a `deadline`, uploads and the extraction call time out early enough to leave the generation reserve.
+    Attachments already in S3 (S3Attachment) are identified by key and ETag and only downloaded,
+    streamed into the scratch directory, when their description is not cached.
+    Files that must exist on disk are written to a scratch directory under `file_dir`
+    (ATTACHMENT_SCRATCH_ROOT by default) that is removed when parsing finishes.
+    `digests` (from `attachment_digests`) saves hashing the attachments again when the caller has them.
     """
     try:
-        if attachments is None:
+        if not attachments:
             return []
         
         # Initialize the Gemini client
@@ -41,78 +113,145 @@ async def attachments_parser(
         # 1. Get the file and query from the attachments
 
         # Ensure the file directory exists
+        file_dir = file_dir or ATTACHMENT_SCRATCH_ROOT
         os.makedirs(file_dir, exist_ok=True)
 
-        gemini_files = []
-        sheet_contents = []
+        # Identical attachments (same bytes and type, in the same order) reuse their extracted descriptions
+        if digests is None:
+            digests = await asyncio.to_thread(attachment_digests, attachments)
+        set_key = hashlib.sha256("\0".join(digests).encode("utf-8")).hexdigest()
+        cached_descriptions = description_cache.get(set_key)
+        if cached_descriptions is not None:
+            logger.info(f"[Attachments Parser] Reusing extracted descriptions for {len(attachments)} attachment(s)")
+            return list(cached_descriptions)
 
-        for attachment in attachments:
-            content, file_type = await attachment_parser(attachment, file_dir)
+        # Save, convert and upload the attachments concurrently (bounded), keeping their input order.
+        # Scratch files of this request live in their own directory, removed even if parsing fails.
+        semaphore = asyncio.Semaphore(ATTACHMENT_CONCURRENCY)
+
+        with tempfile.TemporaryDirectory(prefix="attachments-", dir=file_dir) as scratch_dir:
+            async def parse_one(attachment: UploadFile | S3Attachment, digest: str) -> tuple:
+                async with semaphore:
+                    if not isinstance(attachment, S3Attachment):
+                        return await attachment_parser(attachment, scratch_dir, deadline, digest)
+                    upload = await asyncio.to_thread(open_s3_attachment, attachment, scratch_dir)
+                    try:
+                        return await attachment_parser(upload, scratch_dir, deadline, digest)
+                    finally:
+                        upload.file.close()
+
+            parsed = await asyncio.gather(*(
+                parse_one(attachment, digest) for attachment, digest in zip(attachments, digests)
+            ))
+
+        # 2. Group the contents into extraction calls, in attachment order: everything that is not a
+        # split sheet goes into one shared call, and every sheet row range gets a call of its own.
+        # Sheets mapped locally already are descriptions and skip Gemini.
+        contents = []
+        jobs = []  # (contents to extract, None) or (None, descriptions)
+        for content, file_type in parsed:
             logger.debug(f"[Attachments Parser] Content: {content}")
             logger.debug(f"[Attachments Parser] File type: {file_type}")
-            if file_type == "sheet":
-                sheet_contents.append(content) # Add the sheet content to the list
-            elif content is not None:
-                gemini_files.append(genai_client.files.get(name=content)) # Add the gemini file to the list
-                
-        # TODO: the prompt waitting for review and optimization 
-        # NEED TO BE REVIEWED
-        system_instruction = """
-        ## ROLE
-        You are a detail-oriented fastener-industry expert whose primary goal is to help user with RFQ (Request for Quote) email building.
-
-        ## INSTRUCTIONS
-        For this step, parse every debugrmation from the attachments.
-        
-        ## OUTPUT
-        Return only a JSON array of strings (i.e., list[str]).
-        Rules:
-        - One string per fastener line item, containing all of that item’s details in source order.
-        - If nothing relevant is found, return an empty array `[]`.
-        """
-        return_content = genai_client.models.generate_content(
-            model=GEMINI_MODEL,
-            contents=[*sheet_contents, *gemini_files],
-            config=GenerateContentConfig(
-                system_instruction=system_instruction,
-                response_mime_type="application/json",
-                response_schema={
-                    "type": "array",
-                    "items": {"type": "string"}
-                },
-                temperature=0,
-            )
-        )
+            if content is None:
+                continue
+            if file_type == "sheet_parts":
+                jobs.extend((None, part) if isinstance(part, list) else ([part], None) for part in content)
+                continue
+            if not contents:
+                jobs.append((contents, None))
+            if isinstance(content, list):
+                contents.extend(content) # PDF text plus the uploaded file of its visual pages
+            else:
+                contents.append(content) # Sheet / PDF text, or the uploaded gemini file itself
+        calls = sum(1 for job_contents, _ in jobs if job_contents is not None)
+        if calls > 1:
+            logger.info(f"[Attachments Parser] Extracting in {calls} parallel calls")
 
-        response_text = return_content.text
-        description_list = json.loads(response_text)
+        async def run_job(job_contents: Optional[list], descriptions: Optional[List[str]]) -> List[str]:
+            if job_contents is None:
+                return descriptions
+            return await extract_descriptions(genai_client, job_contents, deadline)
 
-        if type(description_list) != list:
-            raise RuntimeError("[Attachments Parser] Gemini returned invalid description for the attachment")
+        results = await asyncio.gather(*(run_job(*job) for job in jobs))
+        description_list = [line for result in results for line in result]
 
         formatted_description = "\n".join(f"- {line}" for line in description_list)
         logger.debug(f"[Attachments Parser] Length of description list: {len(description_list)}") 
         logger.debug(f"[Attachments Parser] Description/BOM:\n{formatted_description[:500]}{'...' if len(formatted_description) > 500 else ''}")
 
+        description_cache.set(set_key, list(description_list))
         return description_list
 
 
+    except DeadlineExceeded:
+        raise
     except Exception as e:
         logger.error(f"[Attachments Parser] Error: {e}")
         raise RuntimeError(f"[Attachments Parser] Error: {e}")
 
 
+async def extract_descriptions(
+    genai_client: genai.Client,
+    contents: list,
+    deadline: Optional[Deadline] = None
+) -> List[str]:
+    """
+    One extraction call returning the fastener descriptions of `contents`. Output that is not a
+    JSON list of strings (e.g. truncated) is retried up to SHEET_CHUNK_RETRIES times.
+    """
+    attempt = 0
+    while True:
+        return_content = await llm_scheduler.acall(GEMINI_MODEL, lambda: genai_client.models.generate_content(
+            model=GEMINI_MODEL,
+            contents=contents,
+            config=GenerateContentConfig(
+                system_instruction=EXTRACTION_INSTRUCTION,
+                response_mime_type="application/json",
+                response_schema={
+                    "type": "array",
+                    "items": {"type": "string"}
+                },
+                temperature=0,
+                http_options=HttpOptions(timeout=deadline.timeout_ms(reserve=DEADLINE_GENERATION_RESERVE_SECONDS)) if deadline else None,
+            )
+        ), deadline=deadline)
+
+        try:
+            description_list = json.loads(return_content.text)
+            if type(description_list) != list:
+                raise ValueError("not a JSON array")
+            return [str(line) for line in description_list]
+        except (ValueError, TypeError) as e:
+            if attempt >= SHEET_CHUNK_RETRIES or (deadline is not None and deadline.expired(reserve=DEADLINE_GENERATION_RESERVE_SECONDS)):
+                raise RuntimeError(f"[Attachments Parser] Gemini returned invalid description for the attachment: {e}")
+            attempt += 1
+            logger.warning(f"[Attachments Parser] Invalid extraction output ({e}); retrying ({attempt}/{SHEET_CHUNK_RETRIES})")
+
+
 async def attachment_parser( 
     attachment: UploadFile | None = File(None), 
-    file_dir: str | None = None
+    file_dir: str | None = None,
+    deadline: Optional[Deadline] = None,
+    digest: Optional[str] = None
 ) -> tuple[str, str]:
 
     """
-    Parses and processes an uploaded file attachment, saving it to a file directory.
+    Parses and processes an uploaded file attachment. Spreadsheets and PDFs are copied in chunks
+    into `file_dir` and converted to text locally; only PDF pages Gemini has to see (scanned, drawn or illustrated) and images are uploaded
+    to Gemini. Images are auto-oriented, downscaled and re-encoded before upload.
 
     Args:
         attachment (UploadFile): The file object to process.
-        file_dir (str): The file directory to save files in.
+        file_dir (str): The scratch directory for files that must exist on disk; the caller removes it.
+        deadline (Deadline): Optional request deadline bounding the upload.
+        digest (str): Optional content hash of the attachment; a still-valid upload of the same content is reused.
+    Returns:
+        tuple: ("Sheet Content:\n<TSV of every sheet>", "sheet") for spreadsheets and CSV,
+        ([descriptions of a mapped BOM sheet | "Sheet Content:\n<TSV of a row range>", ...], "sheet_parts")
+        for workbooks with locally mapped BOM sheets or sheets over SHEET_CHUNK_ROWS rows,
+        ("PDF Content:\n<page text>", "text") for PDFs with a text layer,
+        ([PDF text, gemini File of the visual pages], "pdf") for PDFs with scanned, drawn or illustrated pages,
+        (gemini File, "file") for uploads, or (None, None) if the attachment could not be processed.
     """
 
     # Generate a unique filename to prevent collisions
@@ -131,55 +270,246 @@ async def attachment_parser(
         logger.error(f"[Attachment Parser] Unsupported file type: {attachment.content_type}")
         return None, None
 
-    # Construct the full path for the temporary file
-    temp_file_path = f"{base_file_path}{file_ext}"
+    if file_ext == '.pdf':
+        temp_file_path = f"{base_file_path}{file_ext}"
+        await asyncio.to_thread(save_upload, attachment, temp_file_path)
+        try:
+            pages = await extract_pdf_pages(temp_file_path)
+        except Exception as e:
+            logger.warning(f"[Attachment Parser] Local PDF extraction failed ({e}); uploading {attachment.filename}")
+            pages = None
+
+        if pages is not None:
+            pdf_text = "PDF Content:\n" + render_pages(attachment.filename, pages)
+            visual = [page.number for page in pages if page.visual]
+            logger.debug(f"[Attachment Parser] PDF {attachment.filename}: {len(pages)} page(s), {len(visual)} visual")
+            if not visual:
+                return pdf_text, "text"
 
-    # First, save the entire file to disk to ensure pandas can read it reliably.
-    logger.debug(f"[Attachment Parser] Saving temporary file to: {temp_file_path}")
-    contents = attachment.file.read()
-    with open(temp_file_path, "wb") as f:
-        f.write(contents)
-    
-    # Get the original file size from the temporary file
-    original_size_bytes = os.path.getsize(temp_file_path)
-    logger.debug(f"[Attachment Parser] Original file size: {original_size_bytes} bytes")
+            # Only the scanned, drawn or illustrated pages need Gemini to see them
+            gemini_file = gemini_file_cache.get(digest) if digest else None
+            if gemini_file is None:
+                subset_path = await asyncio.to_thread(
+                    subset_pdf, temp_file_path, visual, f"{base_file_path}-visual.pdf"
+                )
+                gemini_file = await upload_to_gemini(subset_path, attachment.content_type, deadline, digest)
+            if gemini_file is None:
+                return pdf_text, "text"
+            return [pdf_text, gemini_file], "pdf"
+
+    # Reuse a still-valid upload of the same content
+    if digest and file_ext not in SPREADSHEET_EXTENSIONS:
+        cached_file = gemini_file_cache.get(digest)
+        if cached_file is not None:
+            logger.debug(f"[Attachment Parser] Reusing uploaded file {cached_file.name}")
+            return cached_file, "file"
 
     is_sheet=False
 
     # Handle the files based on their type
-    if file_ext in ['.xlsx', '.xls']:
-        logger.debug(f"[Attachment Parser] Processing Excel file for conversion to JSON...")
+    if file_ext in SPREADSHEET_EXTENSIONS:
+        logger.debug(f"[Attachment Parser] Processing spreadsheet for conversion to text...")
         
         try:
-            # Read the saved Excel file using pandas
-            df = pd.read_excel(temp_file_path, sheet_name=0)
-            json_str = df.to_json(orient='records')
+            # Save the file to disk so the reader can stream it by extension
+            temp_file_path = f"{base_file_path}{file_ext}"
+            logger.debug(f"[Attachment Parser] Saving temporary file to: {temp_file_path}")
+            original_size_bytes = await asyncio.to_thread(save_upload, attachment, temp_file_path)
+            logger.debug(f"[Attachment Parser] Original file size: {original_size_bytes} bytes")
+
+            # Map BOM sheets locally, the rest as compact header-once TSV row ranges (off the event loop)
+            parts = await asyncio.to_thread(sheet_parts, temp_file_path, file_ext)
             
-            logger.debug(f"[Attachment Parser] Converted JSON String Successfully")
-            sheet_content="Sheet Content: "+json_str
+            logger.debug(f"[Attachment Parser] Converted spreadsheet to {len(parts)} part(s)")
+            if not parts:
+                return None, None
+            if len(parts) > 1 or isinstance(parts[0], list):
+                return parts, "sheet_parts"
+            sheet_content=parts[0]
             is_sheet=True
 
         except Exception as e:
-            logger.error(f"[Attachment Parser] Error converting Excel file: {e}")
+            logger.error(f"[Attachment Parser] Error converting spreadsheet: {e}")
+            return None, None
             
-    else:
-        # For all other file types, the file has already been saved.
-        logger.debug(f"[Attachment Parser] File processed and saved to: {temp_file_path}")
-        # Initialize the Gemini client
-        genai_client = genai.Client(api_key=GEMINI_API_KEY)
-        gemini_file = genai_client.files.upload(file=temp_file_path)
+    elif attachment.content_type.startswith("image/"):
+        temp_file_path = f"{base_file_path}{file_ext}"
+        await asyncio.to_thread(save_upload, attachment, temp_file_path)
+        try:
+            prepared = await attachment_pool.run(
+                prepare_image, temp_file_path, f"{base_file_path}-prepared", IMAGE_MAX_DIMENSION, IMAGE_JPEG_QUALITY
+            )
+        except Exception as e:
+            logger.warning(f"[Attachment Parser] Could not preprocess image {attachment.filename} ({e}); uploading it as is")
+            prepared = None
 
-        if not hasattr(gemini_file, "name"):
-            logger.error("[Attachment Parser] Gemini upload failed: no file name returned")
+        if prepared is not None:
+            logger.info(
+                f"[Attachment Parser] Image {attachment.filename}: {prepared.original_bytes} -> {prepared.prepared_bytes} bytes, "
+                f"{prepared.original_size[0]}x{prepared.original_size[1]} -> {prepared.prepared_size[0]}x{prepared.prepared_size[1]}"
+            )
+            gemini_file = await upload_to_gemini(prepared.path, prepared.mime_type, deadline, digest)
+        else:
+            gemini_file = await upload_to_gemini(temp_file_path, attachment.content_type, deadline, digest)
+        if gemini_file is None:
             return None, None
 
-        logger.debug(f"[Attachment Parser] upload file DONE -> {gemini_file.name}")
+    else:
+        # PDFs that could not be read locally: stream the upload to Gemini in chunks
+        logger.debug(f"[Attachment Parser] Streaming {attachment.filename} ({upload_size(attachment)} bytes) to Gemini")
+        gemini_file = await upload_to_gemini(attachment.file, attachment.content_type, deadline, digest)
+        if gemini_file is None:
+            return None, None
 
     if is_sheet:
         return sheet_content, "sheet"
     else:
-        return gemini_file.name, "file"
+        # The upload result already is the File object generate_content needs; no files.get round trip
+        return gemini_file, "file"
         
     # We should never reach here
     logger.error(f"[Attachment Parser] Unsupported file type: {attachment.content_type}")
-    return None, None
\ No newline at end of file
+    return None, None
+
+
+async def upload_to_gemini(file, mime_type: str, deadline: Optional[Deadline] = None, digest: Optional[str] = None):
+    """
+    Uploads a path or binary stream to Gemini and caches the File under `digest`.
+    Returns None if the upload returned no file name.
+    """
+    # Initialize the Gemini client
+    genai_client = genai.Client(api_key=GEMINI_API_KEY)
+    upload_config = UploadFileConfig(
+        mime_type=mime_type,
+        http_options=HttpOptions(timeout=deadline.timeout_ms(reserve=DEADLINE_GENERATION_RESERVE_SECONDS)) if deadline else None,
+    )
+    gemini_file = await llm_scheduler.acall("files", lambda: upload_stream(genai_client, file, upload_config), deadline=deadline)
+
+    if not hasattr(gemini_file, "name"):
+        logger.error("[Attachment Parser] Gemini upload failed: no file name returned")
+        return None
+
+    logger.debug(f"[Attachment Parser] upload file DONE -> {gemini_file.name}")
+    if digest:
+        gemini_file_cache.set(digest, gemini_file, gemini_file_ttl(gemini_file))
+    return gemini_file
+
+
+async def extract_pdf_pages(path: str) -> List[PageText]:
+    """
+    Extracts the text layer of every page, in page order. Larger PDFs are split into runs of
+    PDF_PAGES_PER_TASK pages extracted in parallel by the worker pool.
+    """
+    count = await asyncio.to_thread(page_count, path)
+    if count <= PDF_PAGES_PER_TASK:
+        return await asyncio.to_thread(extract_pages, path, 0, count, PDF_MIN_PAGE_CHARS)
+
+    runs = await asyncio.gather(*(
+        attachment_pool.run(extract_pages, path, start, start + PDF_PAGES_PER_TASK, PDF_MIN_PAGE_CHARS)
+        for start in range(0, count, PDF_PAGES_PER_TASK)
+    ))
+    return [page for run in runs for page in run]
+
+
+def sheet_parts(path: str, file_ext: str) -> list:
+    """
+    Reads a spreadsheet into parts, in sheet order: the descriptions (List[str]) of every sheet the
+    BOM mapper accepts with BOM_MAPPER_MIN_CONFIDENCE, and "Sheet Content:" texts of at most
+    SHEET_CHUNK_ROWS rows for the other sheets.
+    """
+    parts = []
+    pending = []
+
+    def flush():
+        parts.extend("Sheet Content:\n" + render_sheets(chunk) for chunk in chunk_sheets(pending, SHEET_CHUNK_ROWS))
+        pending.clear()
+
+    for sheet in read_spreadsheet(path, file_ext):
+        descriptions = map_bom_sheet(sheet, BOM_MAPPER_MIN_CONFIDENCE)
+        if descriptions is None:
+            pending.append(sheet)
+            continue
+        flush()
+        parts.append(descriptions)
+    flush()
+    return parts
+
+
+def attachment_digests(attachments: List[UploadFile | S3Attachment]) -> List[str]:
+    # S3 objects are identified by key and ETag, uploads by their content
+    return [
+        attachment.digest if isinstance(attachment, S3Attachment) else content_hash(attachment)
+        for attachment in attachments
+    ]
+
+
+def content_hash(attachment: UploadFile) -> str:
+    """
+    SHA-256 of the attachment's MIME type and bytes. The upload stream is rewound afterwards.
+    """
+    digest = hashlib.sha256()
+    digest.update(f"{attachment.content_type}\0".encode("utf-8"))
+    attachment.file.seek(0)
+    for chunk in iter(lambda: attachment.file.read(HASH_CHUNK_SIZE), b""):
+        digest.update(chunk)
+    attachment.file.seek(0)
+    return digest.hexdigest()
+
+
+def gemini_file_ttl(gemini_file) -> float:
+    """
+    Seconds an uploaded file can still be referenced, keeping a margin before the provider deletes it.
+    """
+    expiration_time = getattr(gemini_file, "expiration_time", None)
+    if isinstance(expiration_time, datetime):
+        remaining = (expiration_time - datetime.now(timezone.utc)).total_seconds()
+    else:
+        remaining = GEMINI_FILE_TTL_SECONDS
+    return remaining - GEMINI_FILE_EXPIRY_MARGIN_SECONDS
+
+
+def upload_size(attachment: UploadFile) -> int:
+    """
+    Size of the upload in bytes, measured by seeking rather than reading. The stream is rewound.
+    """
+    attachment.file.seek(0, os.SEEK_END)
+    size = attachment.file.tell()
+    attachment.file.seek(0)
+    return size
+
+
+def check_attachment_sizes(attachments: Optional[List[UploadFile]]) -> None:
+    """
+    Rejects (413) any attachment over MAX_ATTACHMENT_BYTES, or a total over MAX_ATTACHMENTS_TOTAL_BYTES.
+    """
+    total = 0
+    for attachment in attachments or []:
+        size = upload_size(attachment)
+        if size > MAX_ATTACHMENT_BYTES:
+            raise HTTPException(
+                status_code=413,
+                detail=f"Attachment {attachment.filename} is {size} bytes; the limit is {MAX_ATTACHMENT_BYTES} bytes",
+            )
+        total += size
+    if total > MAX_ATTACHMENTS_TOTAL_BYTES:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Attachments total {total} bytes; the limit is {MAX_ATTACHMENTS_TOTAL_BYTES} bytes",
+        )
+
+
+def upload_stream(genai_client: genai.Client, file, config: UploadFileConfig):
+    # Streams are rewound on every attempt, so a retried upload sends the whole file again
+    if not isinstance(file, (str, os.PathLike)):
+        file.seek(0)
+    return genai_client.files.upload(file=file, config=config)
+
+
+def save_upload(attachment: UploadFile, path: str) -> int:
+    """
+    Copies the uploaded file to `path` in fixed-size chunks and returns its size in bytes.
+    """
+    attachment.file.seek(0)
+    with open(path, "wb") as f:
+        shutil.copyfileobj(attachment.file, f, COPY_CHUNK_SIZE)
+    return os.path.getsize(path)
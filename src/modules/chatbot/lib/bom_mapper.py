@@ -0,0 +1,152 @@
+import logging
+import re
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+from .spreadsheet_reader import Sheet
+
+# Set up basic logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Header synonyms per BOM field (normalized with `normalize_header` at import)
+FIELD_SYNONYMS = {
+    "part_number": [
+        "part no", "part number", "part #", "part num", "p/n", "pn", "item no", "item number", "item #",
+        "sku", "part code", "mfr part no", "mpn", "catalog no", "drawing no", "part",
+    ],
+    "description": [
+        "description", "desc", "item description", "part description", "part name", "name",
+        "product", "product description", "component",
+    ],
+    "size": [
+        "size", "dimension", "dimensions", "thread", "thread size", "diameter", "dia", "length",
+        "nominal size", "spec size",
+    ],
+    "material": ["material", "mat", "mat'l", "grade", "material grade", "class", "property class"],
+    "finish": ["finish", "plating", "coating", "surface", "surface treatment", "treatment"],
+    "quantity": [
+        "qty", "quantity", "q'ty", "qty per", "order qty", "req qty", "required qty", "pcs", "count",
+        "amount", "eau", "annual usage",
+    ],
+    "standard": ["standard", "spec", "specification", "norm", "din", "iso", "ansi"],
+}
+
+# Fields that make a sheet a fastener BOM; at least this many must be mapped for full coverage
+KEY_FIELDS = ("part_number", "description", "size", "material", "finish", "quantity")
+FULL_COVERAGE_FIELDS = 3
+
+# A header containing a synonym as a phrase scores between these, by how much of the header it covers
+EXACT_SCORE = 1.0
+PHRASE_BASE_SCORE = 0.6
+PHRASE_COVERAGE_SCORE = 0.3
+
+QUANTITY_PATTERN = re.compile(r"^\d[\d,]*(\.\d+)?\s*(pcs|pc|ea|each|x|units?)?\.?$", re.IGNORECASE)
+
+
+def normalize_header(header: str) -> str:
+    # "Qty (pcs)" -> "qty", "Part No." -> "part no", "P/N" -> "p n"
+    header = re.sub(r"\(.*?\)|\[.*?\]", " ", header.lower())
+    return " ".join(re.sub(r"[^a-z0-9#']+", " ", header).split())
+
+
+SYNONYMS = {
+    field_name: {normalize_header(synonym) for synonym in synonyms}
+    for field_name, synonyms in FIELD_SYNONYMS.items()
+}
+
+
+@dataclass
+class BomMapping:
+    columns: Dict[str, int] = field(default_factory=dict)  # field -> column index
+    scores: Dict[str, float] = field(default_factory=dict)  # field -> header match score
+    confidence: float = 0.0
+
+
+def header_score(header: str, synonyms: set) -> float:
+    normalized = normalize_header(header)
+    if not normalized:
+        return 0.0
+    if normalized in synonyms:
+        return EXACT_SCORE
+    padded = f" {normalized} "
+    matched = [synonym for synonym in synonyms if f" {synonym} " in padded]
+    if matched:
+        return PHRASE_BASE_SCORE + PHRASE_COVERAGE_SCORE * max(map(len, matched)) / len(normalized)
+    return 0.0
+
+
+def map_columns(header: List[str]) -> BomMapping:
+    """
+    Assigns header columns to BOM fields, best matches first, one column per field.
+    """
+    candidates = sorted(
+        (
+            (header_score(title, SYNONYMS[field_name]), field_name, index)
+            for field_name in SYNONYMS
+            for index, title in enumerate(header)
+        ),
+        key=lambda candidate: -candidate[0],
+    )
+    mapping = BomMapping()
+    used = set()
+    for score, field_name, index in candidates:
+        if score <= 0:
+            break
+        if field_name in mapping.columns or index in used:
+            continue
+        mapping.columns[field_name] = index
+        mapping.scores[field_name] = score
+        used.add(index)
+    return mapping
+
+
+def score_mapping(mapping: BomMapping, rows: List[List[str]]) -> float:
+    """
+    Confidence in [0, 1] that every row can be described from the mapped columns:
+    header match quality x key-field coverage x share of rows with an identity and a quantity.
+    """
+    has_identity = "description" in mapping.columns or "part_number" in mapping.columns
+    if not has_identity or "quantity" not in mapping.columns or not rows:
+        return 0.0
+
+    key_scores = [mapping.scores[name] for name in KEY_FIELDS if name in mapping.scores]
+    header_quality = sum(key_scores) / len(key_scores)
+    coverage = min(1.0, len(key_scores) / FULL_COVERAGE_FIELDS)
+
+    def row_ok(cells: List[str]) -> bool:
+        identity = any(
+            cells[mapping.columns[name]] for name in ("description", "part_number") if name in mapping.columns
+        )
+        return identity and bool(QUANTITY_PATTERN.match(cells[mapping.columns["quantity"]]))
+
+    row_quality = sum(1 for cells in rows if row_ok(cells)) / len(rows)
+    return header_quality * coverage * row_quality
+
+
+def describe_row(header: List[str], cells: List[str]) -> str:
+    # Every non-empty cell, in source column order, like the extraction prompt asks for
+    return "; ".join(f"{title}: {value}" if title else value for title, value in zip(header, cells) if value)
+
+
+def map_bom_sheet(sheet: Sheet, min_confidence: float) -> Optional[List[str]]:
+    """
+    Returns one description per BOM line of `sheet` when its columns map with at least
+    `min_confidence`, or None so the sheet goes through the Gemini extraction instead.
+    """
+    mapping = map_columns(sheet.header)
+    rows = [cells for _, cells in sheet.rows]
+    mapping.confidence = score_mapping(mapping, rows)
+    logger.info(
+        f"[BOM Mapper] Sheet {sheet.name}: confidence {mapping.confidence:.2f}, columns "
+        f"{ {name: sheet.header[index] for name, index in mapping.columns.items()} }"
+    )
+    if mapping.confidence < min_confidence:
+        return None
+
+    identity_columns = [mapping.columns[name] for name in ("part_number", "description") if name in mapping.columns]
+    return [
+        describe_row(sheet.header, cells)
+        for cells in rows
+        if any(cells[index] for index in identity_columns)
+    ]
@@ -0,0 +1,320 @@
+import logging
+import math
+from dataclasses import dataclass, field
+from typing import List, Optional
+
+from src.core.config import (
+    CONTEXT_TOKEN_BUDGET,
+    HISTORY_TOKEN_BUDGET,
+    ATTACHMENT_TOKEN_BUDGET,
+    IFI_SECTION_RADIUS,
+)
+from src.core.models import History
+from src.shared.File_utils import document_info, file_sections, read_file_texts
+from src.shared.IFIIndex_utils import DocumentInfo
+from src.shared.Section_utils import locate_chunk, matched_sections
+from .display_formatter import render_history
+
+# Set up basic logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Rough estimate: 1 token ~ 4 characters (same heuristic as the window splitter)
+CHAR_PER_TOKEN = 4
+
+# Below this many tokens an excerpt is not worth including
+MIN_EXCERPT_TOKENS = 500
+
+EXCERPT_MARKER = "...(excerpt)"
+TRUNCATION_MARKER = "...(truncated)"
+
+
+@dataclass
+class PackedContext:
+    context_text: str = ""
+    history_text: str = ""
+    attachment_text: str = ""
+    included_docs: List[str] = field(default_factory=list)  # IFI files included in full
+    sectioned_docs: List[str] = field(default_factory=list)  # IFI files reduced to their matched sections
+    excerpted_docs: List[str] = field(default_factory=list)  # IFI files trimmed to an excerpt
+    dropped_docs: List[str] = field(default_factory=list)  # IFI files left out entirely
+    dropped_histories: int = 0  # Oldest history turns left out
+    attachment_truncated: bool = False
+
+    def report(self) -> dict:
+        return {
+            "included_docs": self.included_docs,
+            "sectioned_docs": self.sectioned_docs,
+            "excerpted_docs": self.excerpted_docs,
+            "dropped_docs": self.dropped_docs,
+            "dropped_histories": self.dropped_histories,
+            "attachment_truncated": self.attachment_truncated,
+            "context_tokens": estimate_tokens(self.context_text),
+            "history_tokens": estimate_tokens(self.history_text),
+            "attachment_tokens": estimate_tokens(self.attachment_text),
+        }
+
+
+def estimate_tokens(text: Optional[str]) -> int:
+    """
+    Estimates the token count of a text without calling the provider.
+    """
+    if not text:
+        return 0
+    return math.ceil(len(text) / CHAR_PER_TOKEN)
+
+
+def document_tokens(ifi_file_name: str, document: str, text: str) -> int:
+    """
+    Tokens of `text`, a part of `document`: scaled from the document's indexed token count when the
+    sidecar index has it, estimated from the characters otherwise.
+    """
+    info = document_info(ifi_file_name, document)
+    if info is None or not info.chars:
+        return estimate_tokens(text)
+    return math.ceil(info.tokens * len(text) / info.chars)
+
+
+def min_packed_tokens(info: DocumentInfo, radius: int) -> int:
+    """
+    Fewest tokens a document can take in the context, from its index entry alone: its smallest run of
+    `radius` + 1 consecutive sections (a match at either end keeps one side only), or the whole document
+    when it has no sections or sectioning is off.
+    """
+    if radius < 0 or not info.sections or not info.chars:
+        return info.tokens
+    width = min(len(info.sections), radius + 1)
+    chars = min(
+        info.sections[i + width - 1][1] - info.sections[i][0] for i in range(len(info.sections) - width + 1)
+    )
+    return math.ceil(info.tokens * chars / info.chars)
+
+
+def may_fit(info: Optional[DocumentInfo], remaining: int, radius: int) -> bool:
+    """
+    Whether a document can still get into the context with `remaining` tokens left: whole or sectioned,
+    or as an excerpt. Unindexed documents have to be read to tell.
+    """
+    return info is None or remaining >= MIN_EXCERPT_TOKENS or min_packed_tokens(info, radius) <= remaining
+
+
+def plan_reads(ranked: List[tuple[str, str, float]], budget: int, radius: int) -> List[str]:
+    """
+    Names of the ranked documents worth reading, decided from the index without touching file contents.
+
+    Each planned document is charged the fewest tokens it can take, so the budget shrinks no faster
+    than while packing and every document the packer can use is read in this one batch.
+    """
+    names = []
+    remaining = budget
+    for _, ifi_file_name, _ in ranked:
+        info = document_info(ifi_file_name)
+        if not may_fit(info, remaining, radius):
+            continue
+        names.append(ifi_file_name)
+        if info is not None:
+            remaining -= min(min_packed_tokens(info, radius), remaining)
+    return names
+
+
+def excerpt_around(document: str, anchor: Optional[str], max_chars: int) -> str:
+    """
+    Cuts a window of at most `max_chars` characters out of `document`.
+
+    The window starts a little before the first occurrence of `anchor` (the matched retrieval chunk)
+    so the relevant table survives the cut; without a match it keeps the head of the document.
+    Cuts are snapped to line boundaries to avoid splitting markdown table rows.
+    """
+    if len(document) <= max_chars:
+        return document
+
+    start = -1
+    if anchor:
+        # Long chunks rarely appear verbatim, so only look for their beginning
+        start = document.find(anchor.strip()[:200])
+    start = 0 if start < 0 else max(0, start - max_chars // 4)
+    end = min(len(document), start + max_chars)
+    start = max(0, end - max_chars)
+
+    if start > 0:
+        newline = document.find("\n", start, end)
+        if newline != -1:
+            start = newline + 1
+    if end < len(document):
+        newline = document.rfind("\n", start, end)
+        if newline > start:
+            end = newline
+
+    excerpt = document[start:end].strip("\n")
+    if start > 0:
+        excerpt = f"{EXCERPT_MARKER}\n{excerpt}"
+    if end < len(document):
+        excerpt = f"{excerpt}\n{EXCERPT_MARKER}"
+    return excerpt
+
+
+def select_sections(
+    document: str,
+    sections: List[tuple[int, int]],
+    chunk: Optional[str],
+    radius: int,
+) -> Optional[str]:
+    """
+    Cuts the sections matching the retrieval `chunk`, plus `radius` neighbouring sections on each side,
+    out of `document`; gaps between kept runs of sections are marked as excerpts.
+
+    Returns None when the chunk cannot be located, so the caller falls back to the whole document.
+    """
+    span = locate_chunk(document, chunk)
+    matched = matched_sections(sections, span) if span else []
+    if not matched:
+        return None
+
+    keep = sorted({
+        i for m in matched for i in range(max(0, m - radius), min(len(sections), m + radius + 1))
+    })
+    runs = []  # (first, last) section indexes of consecutive kept sections
+    for i in keep:
+        if runs and runs[-1][1] == i - 1:
+            runs[-1][1] = i
+        else:
+            runs.append([i, i])
+
+    parts = [EXCERPT_MARKER] if runs[0][0] > 0 else []
+    for n, (first, last) in enumerate(runs):
+        if n > 0:
+            parts.append(EXCERPT_MARKER)
+        parts.append(document[sections[first][0]:sections[last][1]].strip("\n"))
+    if runs[-1][1] < len(sections) - 1:
+        parts.append(EXCERPT_MARKER)
+    return "\n".join(parts)
+
+
+def pack_documents(
+    similar_docs: List[tuple[str, str, float]],
+    budget: int,
+    packed: PackedContext,
+    radius: int = IFI_SECTION_RADIUS,
+) -> str:
+    """
+    Fills the context budget with IFI documents, most relevant first.
+
+    Each document is reduced to the sections around its matched chunk (`radius` sections on each side,
+    whole documents when negative). Documents that fit are included; the first ones that do not fit
+    are trimmed to an excerpt around the matched chunk while enough budget is left, and the rest are dropped.
+    Indexed documents that cannot fit any more are dropped from their index entry, without being read.
+    """
+    ranked = sorted(similar_docs, key=lambda doc: doc[2], reverse=True)
+    documents = read_file_texts(plan_reads(ranked, budget, radius))
+
+    parts = []
+    remaining = budget
+    for content, ifi_file_name, _ in ranked:
+        if not may_fit(document_info(ifi_file_name), remaining, radius):
+            packed.dropped_docs.append(ifi_file_name)
+            continue
+        if ifi_file_name not in documents:
+            # Left out of the plan, but an earlier document took less than its planned share
+            documents.update(read_file_texts([ifi_file_name]))
+        document = documents.get(ifi_file_name, "")
+        text = document.strip()
+        if not text:
+            packed.dropped_docs.append(ifi_file_name)
+            continue
+
+        sectioned = False
+        if radius >= 0:
+            selected = select_sections(document, file_sections(ifi_file_name, document), content, radius)
+            if selected is not None and len(selected.strip()) < len(text):
+                text, sectioned = selected.strip(), True
+
+        tokens = document_tokens(ifi_file_name, document, text)
+        if tokens <= remaining:
+            parts.append(text)
+            (packed.sectioned_docs if sectioned else packed.included_docs).append(ifi_file_name)
+            remaining -= tokens
+        elif remaining >= MIN_EXCERPT_TOKENS:
+            chars_per_token = len(text) / tokens if tokens else CHAR_PER_TOKEN
+            excerpt = excerpt_around(text, content, int(remaining * chars_per_token))
+            parts.append(excerpt)
+            packed.excerpted_docs.append(ifi_file_name)
+            remaining -= document_tokens(ifi_file_name, document, excerpt)
+        else:
+            packed.dropped_docs.append(ifi_file_name)
+
+    return "\n\n".join(parts)
+
+
+def pack_histories(
+    histories: List[History],
+    budget: int,
+    packed: PackedContext,
+    summary: Optional[str] = None,
+) -> str:
+    """
+    Keeps the most recent history turns that fit in the budget, in chronological order.
+    A rolling summary of earlier turns is placed first and counts against the same budget.
+    """
+    summary_text = f"Summary of earlier turns:\n{summary.strip()}" if summary else ""
+    kept = []
+    remaining = budget - estimate_tokens(summary_text)
+    for h in reversed(histories):
+        rendered = render_history(h)
+        tokens = estimate_tokens(rendered) + 1  # newline separator
+        if tokens > remaining:
+            break
+        kept.append(rendered)
+        remaining -= tokens
+
+    packed.dropped_histories = len(histories) - len(kept)
+    turns_text = "\n".join(reversed(kept))
+    if summary_text and turns_text:
+        return f"{summary_text}\n\nRecent turns:\n{turns_text}"
+    return summary_text or turns_text
+
+
+def pack_attachment(joined_description: str, budget: int, packed: PackedContext) -> str:
+    """
+    Truncates the attachment description to the budget, keeping whole lines where possible.
+    """
+    if estimate_tokens(joined_description) <= budget:
+        return joined_description
+
+    cut = joined_description[: budget * CHAR_PER_TOKEN]
+    newline = cut.rfind("\n")
+    if newline > 0:
+        cut = cut[:newline]
+    packed.attachment_truncated = True
+    return f"{cut}\n{TRUNCATION_MARKER}"
+
+
+def pack_context(
+    similar_docs: List[tuple[str, str, float]],
+    histories: List[History],
+    joined_description: str,
+    summary: Optional[str] = None,
+    context_budget: int = CONTEXT_TOKEN_BUDGET,
+    history_budget: int = HISTORY_TOKEN_BUDGET,
+    attachment_budget: int = ATTACHMENT_TOKEN_BUDGET,
+) -> PackedContext:
+    """
+    Packs the prompt sections of `ask_gemini` into per-section token budgets.
+
+    Args:
+        similar_docs (List[tuple[str, str, float]]): Retrieved (content, IFI_file_name, score) tuples
+        histories (List[History]): Previous turns, oldest first
+        joined_description (str): Fastener descriptions extracted from the attachments
+        summary (Optional[str]): Rolling summary of the turns before `histories`
+        context_budget (int): Token budget for the IFI documents
+        history_budget (int): Token budget for the rendered history
+        attachment_budget (int): Token budget for the attachment description
+    Returns:
+        PackedContext: The packed section texts plus what was excerpted or dropped
+    """
+    packed = PackedContext()
+    packed.context_text = pack_documents(similar_docs, context_budget, packed)
+    packed.history_text = pack_histories(histories or [], history_budget, packed, summary)
+    packed.attachment_text = pack_attachment(joined_description or "", attachment_budget, packed)
+
+    logger.info(f"[Context Packer] Packed context: {packed.report()}")
+    return packed
@@ -0,0 +1,64 @@
+import logging
+from typing import List, Optional
+
+from fastapi import UploadFile
+
+from src.modules.conversation.conversation_repository import ConversationRepository
+from .s3_attachments import KEY_PREFIX, S3Attachment
+
+# Set up basic logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def s3_key_from_url(s3_url: Optional[str]) -> Optional[str]:
+    # Stored URLs look like https://<bucket>.s3.amazonaws.com/attachments/...
+    if not s3_url:
+        return None
+    index = s3_url.find(KEY_PREFIX)
+    return s3_url[index:].split("?", 1)[0] if index >= 0 else None
+
+
+def reuse_stored_descriptions(
+    conversation_id: str,
+    attachments: List[UploadFile | S3Attachment],
+    digests: List[str],
+) -> tuple[List[str], List[int]]:
+    """
+    Resolves attachments already sent earlier in the conversation to the file descriptions
+    stored with those messages, so they are not parsed again.
+
+    A stored message is reused when every one of its attachments is among the current ones,
+    matched by content hash or by S3 key. Its description covers exactly those attachments.
+
+    Returns:
+        (descriptions reused from stored messages, indexes of the attachments still to parse)
+    """
+    identities = [
+        {digest} | ({attachment.key} if isinstance(attachment, S3Attachment) else set())
+        for attachment, digest in zip(attachments, digests)
+    ]
+    remaining = set(range(len(attachments)))
+    descriptions: List[str] = []
+
+    for message in ConversationRepository.get_described_attachments(conversation_id):
+        covered = set()
+        for stored in message["attachments"]:
+            stored_ids = {stored.get("content_hash"), s3_key_from_url(stored.get("s3_url"))} - {None}
+            match = next(
+                (i for i in sorted(remaining - covered) if identities[i] & stored_ids), None
+            )
+            if match is None:
+                break
+            covered.add(match)
+        else:
+            remaining -= covered
+            descriptions.extend(line for line in message["file_description"].splitlines() if line.strip())
+            logger.info(
+                f"[Description Reuse] Reusing the description of message {message['message_id']} "
+                f"for {len(covered)} attachment(s)"
+            )
+        if not remaining:
+            break
+
+    return descriptions, sorted(remaining)
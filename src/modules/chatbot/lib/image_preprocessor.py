@@ -0,0 +1,66 @@
+import os
+from dataclasses import dataclass
+from typing import Optional
+
+from PIL import Image, ImageOps
+
+# Kept free of config / client imports: this module is loaded by spawned worker processes.
+
+# Palette / grayscale scans and drawings stay lossless; everything else becomes JPEG
+LOSSLESS_MODES = {"1", "L", "P"}
+
+
+@dataclass
+class PreparedImage:
+    path: str
+    mime_type: str
+    original_bytes: int
+    prepared_bytes: int
+    original_size: tuple[int, int]
+    prepared_size: tuple[int, int]
+
+
+def prepare_image(path: str, target_base: str, max_dimension: int, jpeg_quality: int) -> Optional[PreparedImage]:
+    """
+    Auto-orients the image, downscales it to fit `max_dimension`, and re-encodes it without
+    metadata (EXIF, GPS, ICC are not copied) to `target_base` + ".jpg" / ".png".
+
+    Returns None when re-encoding would not make the upload smaller, so the original is sent.
+    """
+    original_bytes = os.path.getsize(path)
+    with Image.open(path) as image:
+        original_size = image.size
+        lossless = image.format in ("PNG", "GIF") and image.mode in LOSSLESS_MODES
+
+        prepared = ImageOps.exif_transpose(image)
+        prepared.thumbnail((max_dimension, max_dimension), Image.Resampling.LANCZOS)
+        changed = prepared.size != original_size or image.getexif().get(0x0112, 1) != 1
+
+        if lossless:
+            target_path, mime_type = f"{target_base}.png", "image/png"
+            prepared.save(target_path, format="PNG", optimize=True)
+        else:
+            target_path, mime_type = f"{target_base}.jpg", "image/jpeg"
+            flatten(prepared).save(
+                target_path, format="JPEG", quality=jpeg_quality, optimize=True, progressive=True
+            )
+
+    prepared_bytes = os.path.getsize(target_path)
+    if prepared_bytes >= original_bytes and not changed:
+        os.remove(target_path)
+        return None
+    return PreparedImage(
+        target_path, mime_type, original_bytes, prepared_bytes, original_size, prepared.size
+    )
+
+
+def flatten(image: Image.Image) -> Image.Image:
+    """
+    JPEG has no alpha channel: composite transparent images onto white.
+    """
+    if image.mode in ("RGBA", "LA") or (image.mode == "P" and "transparency" in image.info):
+        rgba = image.convert("RGBA")
+        background = Image.new("RGB", rgba.size, (255, 255, 255))
+        background.paste(rgba, mask=rgba.getchannel("A"))
+        return background
+    return image.convert("RGB") if image.mode != "RGB" else image
@@ -0,0 +1,122 @@
+import logging
+from dataclasses import dataclass
+from typing import List
+
+import pymupdf
+
+# Kept free of config / client imports: this module is loaded by spawned worker processes.
+
+# Set up basic logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+TEXT_BLOCK = 0
+# A text page is still uploaded when its pictures cover this share of the page, or when it
+# carries this many vector paths (a drawing, not just table rules and underlines)
+FIGURE_MIN_AREA = 0.05
+FIGURE_MIN_PATHS = 200
+
+
+@dataclass
+class PageText:
+    number: int  # 0-based page index
+    text: str  # Empty for pages without a usable text layer
+    visual: bool  # Gemini has to see the page: scanned, vector drawing, or figures beside the text
+
+
+def page_count(path: str) -> int:
+    with pymupdf.open(path) as doc:
+        if doc.needs_pass:
+            raise ValueError("[PDF Reader] PDF is password protected")
+        return doc.page_count
+
+
+def extract_pages(path: str, start: int, stop: int, min_chars: int) -> List[PageText]:
+    """
+    Extracts the text of pages [start, stop), with tables rendered as tab-separated rows.
+
+    A page with fewer than `min_chars` characters of text is visual if it has images or vector
+    drawings (it must go to Gemini to be read) and skipped as blank otherwise. A text page keeps
+    its text and is also visual if it has figures (see `has_figures`).
+    """
+    pages = []
+    with pymupdf.open(path) as doc:
+        for number in range(start, min(stop, doc.page_count)):
+            page = doc[number]
+            text = page_text(page)
+            if len(text.strip()) >= min_chars:
+                pages.append(PageText(number, text, visual=has_figures(page)))
+            elif page.get_images() or page.get_drawings():
+                pages.append(PageText(number, "", visual=True))
+    return pages
+
+
+def has_figures(page: "pymupdf.Page") -> bool:
+    """
+    Whether a text page carries content its text layer misses: pictures covering at least
+    FIGURE_MIN_AREA of the page, or at least FIGURE_MIN_PATHS vector paths. Logos, table rules
+    and underlines stay below both.
+    """
+    page_area = abs(page.rect) or 1
+    image_area = sum(abs(pymupdf.Rect(info["bbox"]) & page.rect) for info in page.get_image_info())
+    if image_area / page_area >= FIGURE_MIN_AREA:
+        return True
+    return len(page.get_drawings()) >= FIGURE_MIN_PATHS
+
+
+def page_text(page: "pymupdf.Page") -> str:
+    """
+    Text of a page in reading order. Tables are emitted once, row by row with tab-separated
+    cells, in place of the loose text blocks they cover.
+    """
+    items = []  # (top, left, text)
+    table_boxes = []
+    try:
+        tables = page.find_tables().tables
+    except Exception as e:
+        logger.debug(f"[PDF Reader] Table detection failed on page {page.number}: {e}")
+        tables = []
+    for table in tables:
+        box = pymupdf.Rect(table.bbox)
+        table_boxes.append(box)
+        rows = [
+            "\t".join(" ".join((cell or "").split()) for cell in row)
+            for row in table.extract()
+        ]
+        items.append((box.y0, box.x0, "\n".join(row for row in rows if row.strip())))
+
+    for x0, y0, x1, y1, text, _, block_type in page.get_text("blocks"):
+        if block_type != TEXT_BLOCK or not text.strip():
+            continue
+        block = pymupdf.Rect(x0, y0, x1, y1)
+        if any(block.intersects(box) for box in table_boxes):
+            continue
+        items.append((y0, x0, text.strip()))
+
+    items.sort(key=lambda item: (round(item[0], 1), item[1]))
+    return "\n".join(text for _, _, text in items)
+
+
+def subset_pdf(path: str, page_numbers: List[int], target_path: str) -> str:
+    """
+    Writes a PDF holding only `page_numbers` of `path` (e.g. the visual pages) to `target_path`.
+    """
+    with pymupdf.open(path) as doc, pymupdf.open() as subset:
+        for number in page_numbers:
+            subset.insert_pdf(doc, from_page=number, to_page=number)
+        subset.save(target_path, garbage=3, deflate=True)
+    return target_path
+
+
+def render_pages(filename: str, pages: List[PageText]) -> str:
+    lines = [f"## PDF: {filename}"]
+    for page in pages:
+        if not page.text:
+            lines.append(f"--- Page {page.number + 1} (scanned; see the attached file) ---")
+        elif page.visual:
+            lines.append(f"--- Page {page.number + 1} (figures in the attached file) ---")
+            lines.append(page.text)
+        else:
+            lines.append(f"--- Page {page.number + 1} ---")
+            lines.append(page.text)
+    return "\n".join(lines)
@@ -0,0 +1,171 @@
+import asyncio
+import hashlib
+import logging
+from typing import Awaitable, Callable, List, Optional
+
+from fastapi import UploadFile
+
+from src.core.config import (
+    CHATBOT_COALESCE_BACKEND,
+    CHATBOT_COALESCE_TTL_SECONDS,
+    CHATBOT_DEADLINE_SECONDS,
+    DEADLINE_GENERATION_RESERVE_SECONDS,
+)
+from src.core.models import ChatbotRes
+from src.shared.DB_utils import get_conn
+from src.shared.Deadline_utils import Deadline
+from src.shared.SingleFlight_utils import SingleFlight
+
+# Set up basic logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# A follower polls the leader's advisory lock at this interval
+LOCK_POLL_SECONDS = 0.25
+
+_chatbot_flight = SingleFlight("Request Coalescer")
+
+
+def request_key(
+    chatbotReq: Optional[str],
+    attachments: Optional[List[UploadFile]],
+    digests: List[str],
+    user_id: Optional[str] = None,
+) -> str:
+    """
+    Hashes the requesting user, the raw request payload and every attachment's name and content
+    digest (see attachment_digests) into a single key, so only the same user's identical requests
+    share a result.
+    """
+    digest = hashlib.sha256()
+    if user_id:
+        digest.update(f"user:{user_id}\0".encode("utf-8"))
+    digest.update((chatbotReq or "").encode("utf-8"))
+    digest.update(b"\0")
+    for attachment, content_digest in zip(attachments or [], digests):
+        digest.update(f"{attachment.filename}\0{content_digest}\0".encode("utf-8"))
+    return digest.hexdigest()
+
+
+def advisory_lock_id(key: str) -> int:
+    # pg advisory locks take a signed 64-bit key
+    return int.from_bytes(bytes.fromhex(key[:16]), "big", signed=True)
+
+
+async def coalesce_request(
+    chatbotReq: Optional[str],
+    attachments: Optional[List[UploadFile]],
+    digests: List[str],
+    fn: Callable[[], Awaitable],
+    user_id: Optional[str] = None,
+    deadline: Optional[Deadline] = None,
+):
+    """
+    Runs `fn` once per distinct request (per user) while identical requests are in flight.
+
+    Duplicates within this process always await the same in-progress call. With
+    CHATBOT_COALESCE_BACKEND=postgres the leader additionally holds a Postgres advisory lock,
+    so duplicates on other instances wait for it (within `deadline`) and reuse its stored result.
+    """
+    key = request_key(chatbotReq, attachments, digests, user_id)
+    if CHATBOT_COALESCE_BACKEND == "postgres":
+        deadline = deadline or Deadline(CHATBOT_DEADLINE_SECONDS)
+        return await _chatbot_flight.do(key, lambda: _coalesce_across_instances(key, fn, deadline))
+    return await _chatbot_flight.do(key, fn)
+
+
+async def _coalesce_across_instances(key: str, fn: Callable[[], Awaitable], deadline: Deadline):
+    try:
+        conn = await asyncio.to_thread(get_conn)
+        conn.autocommit = True
+    except Exception as e:
+        logger.warning(f"[Request Coalescer] Postgres unavailable, coalescing in-process only: {e}")
+        return await fn()
+
+    lock_id = advisory_lock_id(key)
+    try:
+        is_leader = await asyncio.to_thread(_try_lock, conn, lock_id)
+
+        if not is_leader:
+            # Another instance is running the same request: wait for it, then reuse its result
+            logger.info(f"[Request Coalescer] Waiting for request {key[:12]} on another instance")
+            is_leader = await _wait_for_lock(conn, lock_id, deadline)
+            cached = None
+            if is_leader:
+                try:
+                    cached = await asyncio.to_thread(_load_result, conn, key)
+                except Exception as e:
+                    logger.warning(f"[Request Coalescer] Could not load result of {key[:12]}: {e}")
+            else:
+                logger.warning(f"[Request Coalescer] Request {key[:12]} still running elsewhere; running it here")
+            if cached is not None:
+                await asyncio.to_thread(_unlock, conn, lock_id)
+                return cached
+
+        result = await fn()
+        if is_leader and isinstance(result, ChatbotRes):
+            try:
+                await asyncio.to_thread(_store_result, conn, key, result)
+            except Exception as e:
+                logger.warning(f"[Request Coalescer] Could not store result of {key[:12]}: {e}")
+        if is_leader:
+            await asyncio.to_thread(_unlock, conn, lock_id)
+        return result
+    finally:
+        conn.close()  # Also releases a lock still held after an error
+
+
+def _try_lock(conn, lock_id: int) -> bool:
+    with conn.cursor() as cur:
+        cur.execute("SELECT pg_try_advisory_lock(%s);", (lock_id,))
+        return cur.fetchone()[0]
+
+
+async def _wait_for_lock(conn, lock_id: int, deadline: Deadline) -> bool:
+    """
+    Polls the advisory lock until it is free, without holding a thread between polls.
+    Gives up (False) once only the generation reserve of the deadline is left, so the
+    request can still be answered here.
+    """
+    while not deadline.expired(reserve=DEADLINE_GENERATION_RESERVE_SECONDS):
+        await asyncio.sleep(LOCK_POLL_SECONDS)
+        if await asyncio.to_thread(_try_lock, conn, lock_id):
+            return True
+    return False
+
+
+def _unlock(conn, lock_id: int) -> None:
+    with conn.cursor() as cur:
+        cur.execute("SELECT pg_advisory_unlock(%s);", (lock_id,))
+
+
+def _load_result(conn, key: str) -> Optional[ChatbotRes]:
+    with conn.cursor() as cur:
+        cur.execute(
+            """
+            SELECT response::text
+            FROM chatbot_request_results
+            WHERE request_key = %s AND created_at > clock_timestamp() - make_interval(secs => %s);
+            """,
+            (key, CHATBOT_COALESCE_TTL_SECONDS),
+        )
+        row = cur.fetchone()
+    return ChatbotRes.model_validate_json(row[0]) if row else None
+
+
+def _store_result(conn, key: str, result: ChatbotRes) -> None:
+    with conn.cursor() as cur:
+        cur.execute(
+            """
+            INSERT INTO chatbot_request_results (request_key, response)
+            VALUES (%s, %s::jsonb)
+            ON CONFLICT (request_key) DO UPDATE
+            SET response = EXCLUDED.response, created_at = clock_timestamp();
+            """,
+            (key, result.model_dump_json()),
+        )
+        # Results only need to outlive the duplicates of the same request
+        cur.execute(
+            "DELETE FROM chatbot_request_results WHERE created_at < clock_timestamp() - make_interval(secs => %s);",
+            (CHATBOT_COALESCE_TTL_SECONDS,),
+        )
@@ -0,0 +1,113 @@
+import hashlib
+import logging
+import tempfile
+from dataclasses import dataclass
+from typing import List, Optional
+
+from botocore.exceptions import ClientError
+from fastapi import UploadFile
+from starlette.datastructures import Headers
+
+from src.core.config import ATTACHMENTS_BUCKET, MAX_ATTACHMENT_BYTES, MAX_ATTACHMENTS_TOTAL_BYTES
+from src.shared.S3_utils import s3
+
+# Set up basic logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Keys handed out by upload_attachments_urls: attachments/user-<id>/conv-<id>/<uuid>-<filename>
+KEY_PREFIX = "attachments/"
+UUID_PREFIX_LENGTH = 37  # "<uuid4>-"
+DOWNLOAD_CHUNK_SIZE = 1024 * 1024
+SPOOL_MAX_MEMORY = 1024 * 1024  # Like Starlette's UploadFile: larger objects spill to disk
+
+
+@dataclass
+class S3Attachment:
+    key: str
+    filename: str
+    content_type: str
+    size: int
+    etag: str
+    bucket: str = ATTACHMENTS_BUCKET
+
+    @property
+    def digest(self) -> str:
+        """
+        Identity of the object version, used in place of a content hash: an unchanged object
+        (same key and ETag) reuses its parsed description and Gemini upload without being downloaded.
+        """
+        return hashlib.sha256(
+            f"{self.content_type}\0s3://{self.bucket}/{self.key}\0{self.etag}".encode("utf-8")
+        ).hexdigest()
+
+
+def resolve_s3_attachments(
+    keys: List[str],
+    conversation_id: Optional[str] = None,
+    user_id: Optional[str] = None,
+) -> List[S3Attachment]:
+    """
+    Looks up uploaded attachments by S3 key (HEAD only, nothing is downloaded).
+
+    Keys must be attachment keys, of the given user and conversation when set, and within the
+    attachment size limits; otherwise a ValueError is raised.
+    """
+    prefix = f"{KEY_PREFIX}user-{user_id}/" if user_id else KEY_PREFIX
+    resolved = []
+    total = 0
+    for key in keys:
+        if not key.startswith(prefix) or ".." in key.split("/"):
+            raise ValueError(f"[S3 Attachments] Not an attachment key of this user: {key}")
+        if conversation_id and f"/conv-{conversation_id}/" not in key:
+            raise ValueError(f"[S3 Attachments] Attachment {key} does not belong to conversation {conversation_id}")
+
+        try:
+            head = s3.head_object(Bucket=ATTACHMENTS_BUCKET, Key=key)
+        except ClientError as e:
+            raise ValueError(f"[S3 Attachments] Attachment {key} not found: {e}")
+
+        size = head["ContentLength"]
+        if size > MAX_ATTACHMENT_BYTES:
+            raise ValueError(f"[S3 Attachments] Attachment {key} is {size} bytes; the limit is {MAX_ATTACHMENT_BYTES} bytes")
+        total += size
+        if total > MAX_ATTACHMENTS_TOTAL_BYTES:
+            raise ValueError(f"[S3 Attachments] Attachments total over the limit of {MAX_ATTACHMENTS_TOTAL_BYTES} bytes")
+
+        resolved.append(S3Attachment(
+            key=key,
+            filename=filename_from_key(key),
+            content_type=head.get("ContentType") or "application/octet-stream",
+            size=size,
+            etag=head["ETag"].strip('"'),
+        ))
+    return resolved
+
+
+def filename_from_key(key: str) -> str:
+    basename = key.rsplit("/", 1)[-1]
+    return basename[UUID_PREFIX_LENGTH:] if len(basename) > UUID_PREFIX_LENGTH and basename[UUID_PREFIX_LENGTH - 1] == "-" else basename
+
+
+def open_s3_attachment(attachment: S3Attachment, spool_dir: Optional[str] = None) -> UploadFile:
+    """
+    Streams the object into a spooled temporary file and wraps it as an UploadFile, so it goes
+    through the same parsing and upload pipeline as a multipart attachment. The caller closes it.
+    """
+    spool = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_MEMORY, dir=spool_dir)
+    try:
+        body = s3.get_object(Bucket=attachment.bucket, Key=attachment.key)["Body"]
+        for chunk in body.iter_chunks(DOWNLOAD_CHUNK_SIZE):
+            spool.write(chunk)
+        body.close()
+        spool.seek(0)
+    except Exception:
+        spool.close()
+        raise
+    logger.debug(f"[S3 Attachments] Downloaded {attachment.key} ({attachment.size} bytes)")
+    return UploadFile(
+        file=spool,
+        size=attachment.size,
+        filename=attachment.filename,
+        headers=Headers({"content-type": attachment.content_type}),
+    )
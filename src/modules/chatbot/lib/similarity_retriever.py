@@ -1,9 +1,13 @@
+import asyncio
 import logging
-from typing import List
-import logging
+from typing import List, Optional
+import httpx
+from google.genai.types import CountTokensConfig, HttpOptions
 from src.shared.Embedding_utils import get_embedding_gemini
 from src.shared.DB_utils import retrieve_similar_content
-from src.core.config import genai_client
+from src.core.config import genai_client, DEADLINE_GENERATION_RESERVE_SECONDS
+from src.shared.Scheduler_utils import llm_scheduler
+from src.shared.Deadline_utils import Deadline
 import math
 
 
@@ -13,15 +17,24 @@ logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 
-async def get_context_and_ifi(data: str, top_n: int = 3) -> List[tuple[str, str]]:
+async def get_context_and_ifi(
+    data: str,
+    top_n: int = 3,
+    with_scores: bool = False,
+    deadline: Optional[Deadline] = None,
+) -> List[tuple]:
     """
     For each fastener, retrieve IFI(md) and Content (string) by applying sliding window cosine similarity on vector DB
 
     Args:
         data (str): The data to search for
         top_n (int): The number of top matches to return
+        with_scores (bool): Also return the aggregated similarity score of each IFI_file_name
+        deadline (Optional[Deadline]): Request deadline; every call of the stage (token counting, embeddings,
+            similarity search) times out early enough to leave the generation reserve, and the windows
+            left when it runs out are skipped
     Returns:
-        List[tuple[str, str]]: A list of tuples containing the content and IFI_file_name
+        List[tuple]: A list of tuples containing the content and IFI_file_name (and the score if `with_scores`)
 
     Notes:
     Sliding Window Cross-Similarity:
@@ -31,9 +44,19 @@ async def get_context_and_ifi(data: str, top_n: int = 3) -> List[tuple[str, str]
     try:
         if data.strip() == "":
             return []
-        
+
+        stage = deadline.with_reserve(DEADLINE_GENERATION_RESERVE_SECONDS) if deadline is not None else None
+        if stage is not None and stage.expired():
+            logger.warning("[Similarity Retriever] Out of time; skipping retrieval")
+            return []
+
         # 1. Split the input into overlapping windows of 256 tokens
-        windows = split_into_windows(data, window_size=256, stride=200)
+        #    (token counting goes through the blocking scheduler, so it runs in a worker thread)
+        try:
+            windows = await asyncio.to_thread(split_into_windows, data, 256, 200, stage)
+        except (TimeoutError, httpx.TimeoutException) as e:
+            logger.warning(f"[Similarity Retriever] Out of time splitting the input; skipping retrieval: {e}")
+            return []
 
         # 2. For each window, compute cross-similarity and select the top 3 matches
         similar_docs = dict() # key: IFI_file_name, value: score list
@@ -45,9 +68,18 @@ async def get_context_and_ifi(data: str, top_n: int = 3) -> List[tuple[str, str]
             ORDER BY similarity DESC
             LIMIT %s
         """
-        for window in windows:
-            embedding_window = get_embedding_gemini(window)
-            window_similar = retrieve_similar_content(sql, (embedding_window, top_n))
+        for i, window in enumerate(windows):
+            if stage is not None and stage.expired():
+                logger.warning(f"[Similarity Retriever] Out of time; skipping {len(windows) - i} of {len(windows)} windows")
+                break
+            try:
+                embedding_window = await get_embedding_gemini(window, stage)
+                window_similar = await asyncio.to_thread(
+                    retrieve_similar_content, sql, (embedding_window, top_n), stage.timeout() if stage else None
+                )
+            except (TimeoutError, httpx.TimeoutException) as e:
+                logger.warning(f"[Similarity Retriever] Out of time; skipping {len(windows) - i} of {len(windows)} windows: {e}")
+                break
             for content, IFI_file_name, similarity in window_similar:
                 similar_docs[IFI_file_name] = similar_docs.get(IFI_file_name, 0) + similarity
                 file_content_map[IFI_file_name] = content
@@ -57,17 +89,22 @@ async def get_context_and_ifi(data: str, top_n: int = 3) -> List[tuple[str, str]
         similar_docs = similar_docs[:top_n]
 
         # 4. Return the top 3 IFI_file_name and content
-        most_similar_docs = [(file_content_map[IFI_file_name], IFI_file_name) for IFI_file_name, _ in similar_docs]
-
-        logger.debug(f"[Similarity Retriever] Similar IFI_file_name values: {', '.join(ifi_name for _, ifi_name in most_similar_docs)}")
-        logger.debug(f"[Similarity Retriever] Similar content values: {', '.join(content[0:100] for content, _ in most_similar_docs)}")
-        return most_similar_docs
+        logger.debug(f"[Similarity Retriever] Similar IFI_file_name values: {', '.join(ifi_name for ifi_name, _ in similar_docs)}")
+        logger.debug(f"[Similarity Retriever] Similar content values: {', '.join(file_content_map[ifi_name][0:100] for ifi_name, _ in similar_docs)}")
+        if with_scores:
+            return [(file_content_map[IFI_file_name], IFI_file_name, score) for IFI_file_name, score in similar_docs]
+        return [(file_content_map[IFI_file_name], IFI_file_name) for IFI_file_name, _ in similar_docs]
         
     except Exception as e:
         logger.error(f"[Similarity Retriever] Error: {e}")
         raise RuntimeError(f"[Similarity Retriever] Error: {e}")
 
-def split_into_windows(data: str, window_size: int = 256, stride: int = 200) -> List[str]:
+def split_into_windows(
+    data: str,
+    window_size: int = 256,
+    stride: int = 200,
+    deadline: Optional[Deadline] = None,
+) -> List[str]:
     """
     Splits text into overlapping windows using a character-to-token heuristic.
     This method avoids `compute_tokens` and works with a simple API key.
@@ -79,6 +116,7 @@ def split_into_windows(data: str, window_size: int = 256, stride: int = 200) ->
         data (str): The text to be split into windows.
         window_size (int): The target size of each window in tokens.
         stride (int): The number of tokens to advance for each new window.
+        deadline (Optional[Deadline]): Bounds every token count (DeadlineExceeded once it is spent).
 
     Returns:
         List[str]: A list of text strings, where each string is a window.
@@ -87,7 +125,7 @@ def split_into_windows(data: str, window_size: int = 256, stride: int = 200) ->
     CHAR_PER_TOKEN = 4
     
     # First, a single API call to check if the whole text is small enough.
-    if genai_client.models.count_tokens(model="gemini-embedding-001", contents=data).total_tokens <= window_size:
+    if count_tokens(data, deadline) <= window_size:
         logger.debug(f"[Window Split] The number of API calls is 1")
         return [data]
         
@@ -103,7 +141,7 @@ def split_into_windows(data: str, window_size: int = 256, stride: int = 200) ->
         chunk = data[start_char:end_char_est]
         
         # 3. Verify the token count of our estimated chunk in a single API call.
-        token_count = genai_client.models.count_tokens(model="gemini-embedding-001", contents=chunk).total_tokens
+        token_count = count_tokens(chunk, deadline)
         cnt_api_calls += 1
         
         # 4. Adjust the chunk size if we are over the limit.
@@ -120,7 +158,7 @@ def split_into_windows(data: str, window_size: int = 256, stride: int = 200) ->
                 break
             cnt_api_calls += 1
             chunk = chunk[:-chars_to_remove]
-            token_count = genai_client.models.count_tokens(model="gemini-embedding-001", contents=chunk).total_tokens
+            token_count = count_tokens(chunk, deadline)
 
         logger.debug(f"[Window Split] The number of API calls is {cnt_api_calls}")
         # If the chunk is empty after adjustments, stop to prevent infinite loops.
@@ -132,4 +170,20 @@ def split_into_windows(data: str, window_size: int = 256, stride: int = 200) ->
         # 5. Move the start position forward for the next window based on the stride heuristic.
         start_char += stride * CHAR_PER_TOKEN
             
-    return windows
\ No newline at end of file
+    return windows
+
+def count_tokens(text: str, deadline: Optional[Deadline] = None) -> int:
+    """
+    Counts the tokens of `text` for the embedding model through the shared scheduler.
+    Blocking: call it from a worker thread, as get_context_and_ifi does through split_into_windows.
+    With a `deadline`, each attempt times out when it is spent and no retry starts past it.
+    """
+    return llm_scheduler.call(
+        "gemini-embedding-001:count_tokens",
+        lambda: genai_client.models.count_tokens(
+            model="gemini-embedding-001",
+            contents=text,
+            config=CountTokensConfig(http_options=HttpOptions(timeout=deadline.timeout_ms())) if deadline else None,
+        ),
+        deadline=deadline,
+    ).total_tokens
@@ -0,0 +1,177 @@
+import csv
+import logging
+from dataclasses import dataclass, field
+from datetime import date, datetime, time
+from typing import Iterable, Iterator, List, Optional, Sequence
+
+import openpyxl
+import xlrd
+
+# Set up basic logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+SPREADSHEET_EXTENSIONS = ('.xlsx', '.xls', '.csv')
+CSV_SNIFF_BYTES = 64 * 1024
+
+
+@dataclass
+class Sheet:
+    name: str
+    header: List[str] = field(default_factory=list)
+    rows: List[tuple[int, List[str]]] = field(default_factory=list)  # (source row number, cells)
+    total_rows: Optional[int] = None  # Set when `rows` is one part of a larger sheet
+
+
+def read_spreadsheet(path: str, file_ext: str) -> List[Sheet]:
+    """
+    Reads every non-empty sheet of an .xlsx, .xls or .csv file.
+
+    Blank rows and columns are dropped; the first remaining row of a sheet is its header.
+    Row numbers refer to the rows of the source file (1-based), so extracted items can be traced back.
+    """
+    if file_ext == '.xlsx':
+        raw_sheets = _iter_xlsx(path)
+    elif file_ext == '.xls':
+        raw_sheets = _iter_xls(path)
+    elif file_ext == '.csv':
+        raw_sheets = _iter_csv(path)
+    else:
+        raise ValueError(f"[Spreadsheet Reader] Unsupported spreadsheet type: {file_ext}")
+
+    sheets = []
+    for name, rows in raw_sheets:
+        sheet = _compact(name, rows)
+        if sheet is not None:
+            sheets.append(sheet)
+    return sheets
+
+
+def render_sheets(sheets: Sequence[Sheet]) -> str:
+    """
+    Renders sheets as tab-separated text with the header written once and a leading row-number column:
+
+        ## Sheet: BOM (3 rows)
+        row	Part No	Description	Qty
+        2	A-100	M6 x 20 SHCS	40
+    """
+    blocks = []
+    for sheet in sheets:
+        if sheet.total_rows is not None and sheet.total_rows != len(sheet.rows):
+            lines = [f"## Sheet: {sheet.name} (part: {len(sheet.rows)} of {sheet.total_rows} rows)"]
+        else:
+            lines = [f"## Sheet: {sheet.name} ({len(sheet.rows)} rows)"]
+        lines.append("\t".join(["row"] + sheet.header))
+        lines.extend("\t".join([str(number)] + cells) for number, cells in sheet.rows)
+        blocks.append("\n".join(lines))
+    return "\n\n".join(blocks)
+
+
+def chunk_sheets(sheets: Sequence[Sheet], rows_per_chunk: int) -> List[List[Sheet]]:
+    """
+    Splits sheets into chunks of at most `rows_per_chunk` data rows, in row order.
+    Small sheets share a chunk; a longer sheet is split into row ranges, each keeping the header.
+    """
+    chunks: List[List[Sheet]] = []
+    current: List[Sheet] = []
+    current_rows = 0
+    for sheet in sheets:
+        start = 0
+        while True:
+            room = rows_per_chunk - current_rows
+            part = sheet.rows[start:start + room]
+            if part or not sheet.rows:
+                current.append(Sheet(sheet.name, sheet.header, part, total_rows=len(sheet.rows)))
+                current_rows += len(part)
+                start += len(part)
+            if current_rows >= rows_per_chunk:
+                chunks.append(current)
+                current, current_rows = [], 0
+            if start >= len(sheet.rows):
+                break
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+# --- Readers: yield (sheet name, rows of raw cell values)
+def _iter_xlsx(path: str) -> Iterator[tuple[str, Iterable[Sequence]]]:
+    # read_only streams rows from the archive instead of building the whole workbook in memory
+    workbook = openpyxl.load_workbook(path, read_only=True, data_only=True)
+    try:
+        for worksheet in workbook.worksheets:
+            yield worksheet.title, worksheet.iter_rows(values_only=True)
+    finally:
+        workbook.close()
+
+
+def _iter_xls(path: str) -> Iterator[tuple[str, Iterable[Sequence]]]:
+    workbook = xlrd.open_workbook(path, on_demand=True)
+    try:
+        for index in range(workbook.nsheets):
+            worksheet = workbook.sheet_by_index(index)
+            yield worksheet.name, (
+                [_xls_value(cell, workbook.datemode) for cell in row] for row in worksheet.get_rows()
+            )
+            workbook.unload_sheet(index)
+    finally:
+        workbook.release_resources()
+
+
+def _iter_csv(path: str) -> Iterator[tuple[str, Iterable[Sequence]]]:
+    with open(path, "r", encoding="utf-8-sig", errors="replace", newline="") as f:
+        sample = f.read(CSV_SNIFF_BYTES)
+        f.seek(0)
+        try:
+            dialect = csv.Sniffer().sniff(sample, delimiters=",;\t|")
+        except csv.Error:
+            dialect = csv.excel
+        yield "CSV", csv.reader(f, dialect)
+
+
+# --- Cell values and compaction
+def _xls_value(cell: xlrd.sheet.Cell, datemode: int):
+    if cell.ctype == xlrd.XL_CELL_DATE:
+        try:
+            return xlrd.xldate.xldate_as_datetime(cell.value, datemode)
+        except (ValueError, OverflowError):
+            return cell.value
+    if cell.ctype in (xlrd.XL_CELL_EMPTY, xlrd.XL_CELL_BLANK, xlrd.XL_CELL_ERROR):
+        return None
+    if cell.ctype == xlrd.XL_CELL_BOOLEAN:
+        return bool(cell.value)
+    return cell.value
+
+
+def format_cell(value) -> str:
+    if value is None:
+        return ""
+    if isinstance(value, float):
+        return str(int(value)) if value.is_integer() else repr(value)
+    if isinstance(value, datetime):
+        return value.date().isoformat() if value.time() == time(0) else value.isoformat(sep=" ")
+    if isinstance(value, (date, time)):
+        return value.isoformat()
+    # Tabs and line breaks would break the row/column layout
+    return " ".join(str(value).split())
+
+
+def _compact(name: str, rows: Iterable[Sequence]) -> Optional[Sheet]:
+    # Keep non-blank rows with their source row number
+    kept: List[tuple[int, List[str]]] = []
+    for number, row in enumerate(rows, start=1):
+        cells = [format_cell(value) for value in row]
+        if any(cells):
+            kept.append((number, cells))
+    if not kept:
+        return None
+
+    # Drop columns that are blank in every kept row
+    width = max(len(cells) for _, cells in kept)
+    used = [i for i in range(width) if any(i < len(cells) and cells[i] for _, cells in kept)]
+
+    def pick(cells: List[str]) -> List[str]:
+        return [cells[i] if i < len(cells) else "" for i in used]
+
+    (_, header), *data = kept
+    return Sheet(name=name, header=pick(header), rows=[(number, pick(cells)) for number, cells in data])
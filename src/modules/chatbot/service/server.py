@@ -2,38 +2,70 @@
 # coding: utf-8
 
 # Standard library imports
+import asyncio
 import json as jsonlib
 from typing import List, Optional
 import logging
 
 # Third-party imports
+import httpx
 from fastapi import File, Form, UploadFile
-from google.genai.types import GenerateContentConfig
+from google.genai.types import GenerateContentConfig, HttpOptions
 from fastapi.responses import JSONResponse
-from src.core.config import genai_client, GEMINI_MODEL  
+from src.core.config import (
+  genai_client,
+  GEMINI_MODEL,
+  HISTORY_RAW_TURNS,
+  SUMMARY_REFRESH_WAIT_SECONDS,
+  CONTEXT_TOKEN_BUDGET,
+  CHATBOT_DEADLINE_SECONDS,
+  DEADLINE_GENERATION_RESERVE_SECONDS,
+)
 
 # Local application imports
-from ..lib.attachment_parser import attachments_parser
+from ..lib.attachment_parser import attachment_digests, attachments_parser
+from ..lib.description_reuse import reuse_stored_descriptions
+from ..lib.s3_attachments import resolve_s3_attachments
 from ..lib.similarity_retriever import get_context_and_ifi
-from src.core.models import ChatbotReq, ChatbotRes, ChatbotResult
-from src.shared.File_utils import read_file_text
-from ..lib.display_formatter import render_histories
+from src.core.models import ChatbotReq, ChatbotRes, ChatbotResult, History
+from ..lib.context_packer import pack_context
+from src.modules.conversation.conversation_repository import ConversationRepository
+from src.modules.conversation.conversation_service import ConversationService
+from src.shared.Scheduler_utils import llm_scheduler
+from src.shared.Deadline_utils import Deadline, DeadlineExceeded
 
 # Set up basic logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Below this much time left, only the most relevant IFI docs are sent to Gemini
+LOW_TIME_SECONDS = DEADLINE_GENERATION_RESERVE_SECONDS * 1.5
+
+DEADLINE_FALLBACK_TEXT = (
+  "Sorry, I could not finish answering in time. "
+  "Please try again, or send fewer or smaller attachments."
+)
+
 async def agent_service(
   attachments: Optional[List[UploadFile]] = File(None),
-  chatbotReq: Optional[str] = Form(None)
+  chatbotReq: Optional[str] = Form(None),
   # At least one of attachments or chatbotReq must be provided; enforce in function body
+  deadline: Optional[Deadline] = None,
+  user_id: Optional[str] = None,
+  digests: Optional[List[str]] = None,
 ):
   """
-  1. Receive ChatReq
+  1. Receive ChatReq (attachments may also be given as S3 keys in `attachment_keys`)
   2. Pass ALL attachments into attachment_parser to get attachment description (List of string) for multiple fastener
   3. For each fastener and user's query, retrieve IFI(md) and Content (string) by applying sliding window cosine similarity on vector DB
   4. Attach all doc and ask Gemini
+
+  Every stage runs against `deadline`: attachment parsing and retrieval leave time for generation,
+  and a stage that runs out of time degrades (fewer descriptions, windows or docs) instead of failing.
+  With a `user_id` (the authenticated user), the request's conversation and S3 attachment keys must be theirs.
+  `digests` are the content digests of `attachments` when the caller already computed them.
   """
+  deadline = deadline or Deadline(CHATBOT_DEADLINE_SECONDS)
   try:
     # 1. Receive ChatReq
     # Convert Form of chatbotReq into JSON
@@ -46,6 +78,29 @@ async def agent_service(
 
     request_obj = ChatbotReq(**request_data)
 
+    # The conversation's history, summary and stored descriptions are only read for its owner
+    if user_id and request_obj.conversation_id:
+      status = await asyncio.to_thread(
+        ConversationRepository.check_conversation_ownership, user_id, request_obj.conversation_id
+      )
+      if status == "not_found":
+        return JSONResponse(status_code=404, content={"error": "Conversation not found"})
+      elif status == "not_owner":
+        return JSONResponse(status_code=403, content={"error": "Access denied"})
+
+    # Attachments already uploaded to S3 are parsed alongside the multipart ones;
+    # S3 attachments carry their digest (key and ETag), so only uploads are hashed
+    attachments = list(attachments or [])
+    if digests is None:
+      digests = await asyncio.to_thread(attachment_digests, attachments) if attachments else []
+    digests = list(digests)
+    if request_obj.attachment_keys:
+      s3_attachments = await asyncio.to_thread(
+        resolve_s3_attachments, request_obj.attachment_keys, request_obj.conversation_id, user_id
+      )
+      attachments += s3_attachments
+      digests += attachment_digests(s3_attachments)
+
     # At least one of attachments or query is required
     if not attachments and not request_obj.query:
       logger.error(
@@ -72,9 +127,29 @@ async def agent_service(
     logger.debug("=========================\n")
 
     # 2. Pass all attachments into file_parser to get description for multiple fastner
-    fasteners_description: List[str] = await attachments_parser(
-      attachments, file_dir="/tmp"
-    )  # List of string
+    #    Attachments already described earlier in the conversation reuse the stored description
+    stored_description: List[str] = []
+    to_parse = list(range(len(attachments)))
+    if attachments and request_obj.conversation_id:
+      try:
+        stored_description, to_parse = await asyncio.to_thread(
+          reuse_stored_descriptions, request_obj.conversation_id, attachments, digests
+        )
+      except Exception as e:
+        logger.warning(f"[RAG chatbot] Could not load stored attachment descriptions: {e}")
+    try:
+      parsed_description: List[str] = await asyncio.wait_for(
+        attachments_parser(
+          [attachments[i] for i in to_parse],
+          deadline=deadline,
+          digests=[digests[i] for i in to_parse],
+        ),
+        timeout=deadline.timeout(share=0.7, reserve=DEADLINE_GENERATION_RESERVE_SECONDS),
+      )  # List of string
+    except (asyncio.TimeoutError, DeadlineExceeded):
+      logger.warning("[RAG chatbot] Attachment parsing ran out of time; answering without attachments")
+      parsed_description = []
+    fasteners_description = stored_description + parsed_description
     joined_description = (
       "\n".join(fasteners_description) if fasteners_description else ""
     )
@@ -83,39 +158,61 @@ async def agent_service(
     )
 
     # 3. For each fastener, retrieve IFI(md) and Content (string) by applying sliding window cosine similarity on vector DB
-    all_similar_docs: List[tuple[str, str]] = []
-    unique_similar_docs = set()
+    all_similar_docs: List[tuple[str, str, float]] = []
+    doc_index = dict()  # key: ifi_file_name, value: index in all_similar_docs
     for single_description in fasteners_description + [request_obj.query]:
       if single_description.strip() == "":
         continue
+      if all_similar_docs and deadline.expired(reserve=DEADLINE_GENERATION_RESERVE_SECONDS):
+        logger.warning("[RAG chatbot] Retrieval ran out of time; skipping remaining descriptions")
+        break
       similar_docs = await get_context_and_ifi(
-        single_description, top_n=3
-      )  # List of tuple (content, ifi_file_name)
+        single_description, top_n=3, with_scores=True, deadline=deadline
+      )  # List of tuple (content, ifi_file_name, score)
       logger.debug(f"[RAG chatbot] Length of similar docs: {len(similar_docs)}")
-      for content, ifi_file_name in similar_docs:
-        if (
-          ifi_file_name not in unique_similar_docs
-        ):  # WARNING: if there are duplicate ifi_file_name, the content will be overwritten
-          unique_similar_docs.add(ifi_file_name)
-          all_similar_docs.append((content, ifi_file_name))
-          logger.debug(
-            f"[RAG chatbot] Similar doc: {content[:100]}{'...' if len(content) > 100 else ''}"
-          )
-          logger.debug(f"[RAG chatbot] Similar doc: {ifi_file_name}")
-          logger.debug("=========================\n")
+      for content, ifi_file_name, score in similar_docs:
+        if ifi_file_name in doc_index:
+          # Keep the best match of a document retrieved by several descriptions
+          i = doc_index[ifi_file_name]
+          if score > all_similar_docs[i][2]:
+            all_similar_docs[i] = (content, ifi_file_name, score)
+          continue
+        doc_index[ifi_file_name] = len(all_similar_docs)
+        all_similar_docs.append((content, ifi_file_name, score))
+        logger.debug(
+          f"[RAG chatbot] Similar doc: {content[:100]}{'...' if len(content) > 100 else ''}"
+        )
+        logger.debug(f"[RAG chatbot] Similar doc: {ifi_file_name} ({score:.3f})")
+        logger.debug("=========================\n")
 
     logger.debug(f"[RAG chatbot] Length of all_similar_docs: {len(all_similar_docs)}")
 
     # 4. Attach all doc and ask Gemini
+    #    A summary lagging behind the stored messages is refreshed while Gemini answers
+    histories, summary, stale = await load_rolling_history(request_obj)
+    summary_refresh = None
+    if stale:
+      summary_refresh = asyncio.ensure_future(
+        asyncio.to_thread(ConversationService().refresh_summary, request_obj.conversation_id)
+      )
+    try:
+      result = await ask_gemini(
+        all_similar_docs, request_obj, joined_description, histories, summary, deadline
+      )
+    except DeadlineExceeded as e:
+      logger.warning(f"[RAG chatbot] Generation ran out of time: {e}")
+      result = {"text": DEADLINE_FALLBACK_TEXT, "email": None}
+    if summary_refresh is not None:
+      await wait_for_summary_refresh(summary_refresh)
+
     return ChatbotRes(
       query=request_obj.query,
       file_description=joined_description,  # all fasteners description
       resources=[
-        ifi_file_name for _, ifi_file_name in all_similar_docs
+        ifi_file_name for _, ifi_file_name, _ in all_similar_docs
       ],  # all ifi_file_name
-      result=ChatbotResult(
-        **ask_gemini(all_similar_docs, request_obj, joined_description)
-      ),
+      result=ChatbotResult(**result),
+      attachment_hashes=digests,
     )
 
   except Exception as e:
@@ -123,15 +220,63 @@ async def agent_service(
     return JSONResponse(status_code=500, content={"error": str(e)})
 
 
+# --- Replace old history turns with the conversation's rolling summary
+async def load_rolling_history(request_obj: ChatbotReq) -> tuple[List[History], Optional[str], bool]:
+  """
+  Returns the history turns to replay verbatim, the rolling summary covering the earlier ones, and
+  whether the summary is stale: more than HISTORY_RAW_TURNS stored messages are not covered by it yet.
+  Staleness is counted from the stored messages, not the posted history.
+  Without a conversation_id or a stored summary the full history is replayed.
+  """
+  histories = request_obj.histories or []
+  if not request_obj.conversation_id:
+    return histories, None, False
+
+  try:
+    state = await asyncio.to_thread(
+      ConversationRepository.get_conversation_summary, request_obj.conversation_id
+    )
+  except Exception as e:
+    logger.warning(f"[RAG chatbot] Could not load conversation summary: {e}")
+    return histories, None, False
+
+  if not state:
+    return histories, None, False
+  stale = state["message_count"] - state["summary_message_count"] > HISTORY_RAW_TURNS
+  summary = state.get("summary")
+  if not summary:
+    return histories, None, stale
+
+  # Turns the summary does not cover yet stay raw
+  start = max(0, min(state["summary_message_count"], len(histories) - HISTORY_RAW_TURNS))
+  logger.debug(f"[RAG chatbot] Replaying {len(histories) - start} of {len(histories)} turns with summary")
+  return histories[start:], summary, stale
+
+
+async def wait_for_summary_refresh(refresh: asyncio.Future) -> None:
+  """
+  Gives a summary refresh started for this turn up to SUMMARY_REFRESH_WAIT_SECONDS once the answer
+  is ready; the response is never held longer for it. A refresh still running is left to finish on
+  its own, and a turn that finds the summary still stale starts another (a late summary never
+  overwrites a newer one).
+  """
+  done, _ = await asyncio.wait({refresh}, timeout=SUMMARY_REFRESH_WAIT_SECONDS)
+  if not done:
+    logger.info("[RAG chatbot] Summary refresh still running; answering without waiting for it")
+
+
 # --- Send the prompt to Gemini
-def ask_gemini(
-  all_similar_docs: List[tuple[str, str]],
+async def ask_gemini(
+  all_similar_docs: List[tuple[str, str, float]],
   request_obj: ChatbotReq,
   joined_description: str,
+  histories: Optional[List[History]] = None,
+  summary: Optional[str] = None,
+  deadline: Optional[Deadline] = None,
 ) -> str:
   """
-  1. Get the query, fasteners_description, histories from the request object
-  2. Render the histories into a readable text
+  1. Get the query, fasteners_description, histories from the request object (or the given recent turns)
+  2. Pack the IFI docs, histories, rolling summary and description into their token budgets
   3. Generate the prompt with the hidden prompt, query, description, histories, and similar docs
   4. Send the prompt to Gemini
   5. Return the response
@@ -140,14 +285,19 @@ def ask_gemini(
   try:
     background = ", \n\n".join(request_obj.background) if request_obj.background else ""
     query = request_obj.query.strip()
-    histories = request_obj.histories or []
-    histories_text = render_histories(histories)
-    similar_docs_text = ""
-    for _, ifi_file_name in all_similar_docs:
-      similar_docs = read_file_text(ifi_file_name)
-      similar_docs_text += similar_docs
-      similar_docs_text += "\n\n"
-    similar_docs_text = similar_docs_text.strip()
+    if histories is None:
+      histories = request_obj.histories or []
+    context_budget = CONTEXT_TOKEN_BUDGET
+    if deadline is not None and deadline.expired(reserve=LOW_TIME_SECONDS):
+      # Short on time: a smaller prompt keeps prefill fast by skipping low-ranked docs
+      context_budget = CONTEXT_TOKEN_BUDGET // 4
+    # Packing reads IFI documents (archive or disk) and splits sections: keep it off the event loop
+    packed = await asyncio.to_thread(
+      pack_context, all_similar_docs, histories, joined_description, summary, context_budget=context_budget
+    )
+    similar_docs_text = packed.context_text
+    histories_text = packed.history_text
+    attachment_text = packed.attachment_text
 
     # --- Hidden/system prompt
     system_instruction = f"""
@@ -217,14 +367,14 @@ def ask_gemini(
         {histories_text or "(none)"}
 
         ## ATTACHMENT
-        {joined_description or "(none)"}
+        {attachment_text or "(none)"}
 
         ## QUERY
         {query}
         """
 
     logger.info(f"[RAG chatbot] Prompt: {prompt}")
-    response = genai_client.models.generate_content(
+    response = await llm_scheduler.acall(GEMINI_MODEL, lambda: genai_client.models.generate_content(
       model=GEMINI_MODEL,
       contents=[prompt],
       config=GenerateContentConfig(
@@ -258,13 +408,16 @@ def ask_gemini(
           },
         },
         temperature=0,
+        http_options=HttpOptions(timeout=deadline.timeout_ms()) if deadline else None,
       ),
-    )
+    ), deadline=deadline)
 
     result = response.text.strip()
     logger.info(f"[RAG chatbot] Gemini response: {result}")
     return jsonlib.loads(result)
 
+  except (DeadlineExceeded, httpx.TimeoutException) as e:
+    raise DeadlineExceeded(f"[RAG chatbot] Generation timed out: {e}") from e
   except Exception as e:
     logger.error(f"[RAG chatbot] Error: {e}")
     raise RuntimeError(f"[RAG chatbot] Error: {e}")
\ No newline at end of file
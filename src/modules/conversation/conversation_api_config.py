@@ -82,6 +82,9 @@ READ_CONVERSATIONS_CONFIG = {
         }
       },
     },
+    304: {
+      "description": "Not Modified - The If-None-Match ETag is still current",
+    },
     401: {
       "description": "Unauthorized - Invalid or missing access token",
       "content": {
@@ -345,6 +348,9 @@ READ_MESSAGES_CONFIG = {
         }
       },
     },
+    304: {
+      "description": "Not Modified - The If-None-Match ETag is still current",
+    },
     401: {
       "description": "Unauthorized - Invalid or missing access token",
       "content": {
@@ -1,4 +1,4 @@
-from fastapi import APIRouter, Depends, Cookie
+from fastapi import APIRouter, Depends, Request, Response
 from .conversation_service import ConversationService
 from src.core.models import (
   ConversationCreateRequest,
@@ -19,53 +19,65 @@ from .conversation_api_config import (
   READ_MESSAGES_CONFIG,
   UPLOAD_FILES_CONFIG,
 )
-from src.shared.jwt_auth import verify_session_token
+from src.shared.jwt_auth import CurrentUser
+from src.shared.ETag_utils import etag_matches
 
 router = APIRouter()
 
+# Clients may keep read responses but must revalidate them (If-None-Match) before reuse
+READ_CACHE_CONTROL = "private, no-cache"
+
 
 def get_conversation_service() -> ConversationService:
   return ConversationService()
 
 
+def not_modified(etag: str) -> Response:
+  return Response(status_code=304, headers={"ETag": etag, "Cache-Control": READ_CACHE_CONTROL})
+
+
 @router.post("", **CREATE_CONVERSATION_CONFIG)
 async def create_conversation(
   request: ConversationCreateRequest,
-  access_token: str = Cookie(include_in_schema=False),
+  user: CurrentUser,
   service: ConversationService = Depends(get_conversation_service),
 ) -> ConversationResponse:
-  claim = verify_session_token(access_token)
-  return await service.create_conversation(claim["sub"], request.title)
+  return await service.create_conversation(user["sub"], request.title)
 
 
 @router.get("", **READ_CONVERSATIONS_CONFIG)
 async def read_conversations(
-  access_token: str = Cookie(include_in_schema=False),
+  request: Request,
+  response: Response,
+  user: CurrentUser,
   service: ConversationService = Depends(get_conversation_service),
 ) -> ConversationsResponse:
-  claim = verify_session_token(access_token)
-  return await service.read_conversations(claim["sub"])
+  etag = await service.conversations_etag(user["sub"])
+  if etag_matches(request.headers.get("if-none-match"), etag):
+    return not_modified(etag)
+
+  response.headers["ETag"] = etag
+  response.headers["Cache-Control"] = READ_CACHE_CONTROL
+  return await service.read_conversations(user["sub"])
 
 
 @router.post("/{conversation_id}/message", **CREATE_MESSAGE_CONFIG)
 async def create_message(
   conversation_id: str,
   request: MessageCreateRequest,
-  access_token: str = Cookie(include_in_schema=False),
+  user: CurrentUser,
   service: ConversationService = Depends(get_conversation_service),
 ) -> MessageResponse:
-  claim = verify_session_token(access_token)
-
   # Convert attachments to dict format if present
   attachments = None
   if request.attachments:
     attachments = [
-      {"s3_url": att.s3_url, "filename": att.filename, "file_type": att.file_type}
+      {"s3_url": att.s3_url, "filename": att.filename, "file_type": att.file_type, "content_hash": att.content_hash}
       for att in request.attachments
     ]
 
-  return await service.create_message(
-    claim["sub"],
+  message = await service.create_message(
+    user["sub"],
     conversation_id,
     request.query,
     request.file_description,
@@ -74,16 +86,16 @@ async def create_message(
     request.email,
     attachments,
   )
+  return message
 
 
 @router.post("/{conversation_id}/messages", **CREATE_MESSAGES_CONFIG)
 async def create_messages(
   conversation_id: str,
   request: MessagesCreateRequest,
-  access_token: str = Cookie(include_in_schema=False),
+  user: CurrentUser,
   service: ConversationService = Depends(get_conversation_service),
 ) -> MessagesResponse:
-  claim = verify_session_token(access_token)
   messages = [
     {
       "query": message.query,
@@ -92,7 +104,7 @@ async def create_messages(
       "result_text": message.result_text,
       "email": message.email,
       "attachments": [
-        {"s3_url": att.s3_url, "filename": att.filename, "file_type": att.file_type}
+        {"s3_url": att.s3_url, "filename": att.filename, "file_type": att.file_type, "content_hash": att.content_hash}
         for att in message.attachments
       ]
       if message.attachments
@@ -100,24 +112,31 @@ async def create_messages(
     }
     for message in request.messages
   ]
-  return await service.create_messages(claim["sub"], conversation_id, messages)
+  return await service.create_messages(user["sub"], conversation_id, messages)
 
 
 @router.get("/{conversation_id}/messages", **READ_MESSAGES_CONFIG)
 async def read_messages(
   conversation_id: str,
-  access_token: str = Cookie(include_in_schema=False),
+  request: Request,
+  response: Response,
+  user: CurrentUser,
   service: ConversationService = Depends(get_conversation_service),
 ) -> MessagesResponse:
-  claim = verify_session_token(access_token)
-  return await service.read_messages(claim["sub"], conversation_id)
+  # Also the ownership check: 404 / 403 before anything is compared or loaded
+  etag = await service.messages_etag(user["sub"], conversation_id)
+  if etag_matches(request.headers.get("if-none-match"), etag):
+    return not_modified(etag)
+
+  response.headers["ETag"] = etag
+  response.headers["Cache-Control"] = READ_CACHE_CONTROL
+  return await service.read_messages(user["sub"], conversation_id)
 
 @router.post("/{conversation_id}/attachments/upload-urls", **UPLOAD_FILES_CONFIG)
 async def upload_attachments_urls(
   conversation_id: str,
   request: UploadFilesRequest,
-  access_token: str = Cookie(include_in_schema=False),
+  user: CurrentUser,
   service: ConversationService = Depends(get_conversation_service),
 ) -> UploadFilesResponse:
-  claim = verify_session_token(access_token)
-  return await service.upload_attachments_urls(claim["sub"], conversation_id, request.files)
+  return await service.upload_attachments_urls(user["sub"], conversation_id, request.files)
@@ -61,6 +61,22 @@ class ConversationRepository:
       )
     return conversations
 
+  @staticmethod
+  def get_conversations_version(user_id: str) -> Dict[str, Any]:
+    """
+    Get the latest update time and the number of a user's conversations, without loading them.
+    Served from idx_conversations_user_updated.
+    """
+    sql = """
+        SELECT MAX(updated_at), COUNT(*)
+        FROM conversations
+        WHERE user_id = %s;
+        """
+    results = run_query(sql, (user_id,))
+
+    row = results[0] if results else (None, 0)
+    return {"updated_at": row[0], "count": row[1]}
+
   @staticmethod
   def insert_message(
     conversation_id: str,
@@ -151,14 +167,14 @@ class ConversationRepository:
       return []
 
     params = [
-      (message_id, att.get("s3_url"), att.get("filename"), att.get("file_type"))
+      (message_id, att.get("s3_url"), att.get("filename"), att.get("file_type"), att.get("content_hash"))
       for att in attachments
     ]
     flat_params = [item for tup in params for item in tup]
 
     sql = f"""
-        INSERT INTO attachments (message_id, s3_url, filename, file_type)
-        VALUES {",".join(["(%s,%s,%s,%s)"] * len(params))}
+        INSERT INTO attachments (message_id, s3_url, filename, file_type, content_hash)
+        VALUES {",".join(["(%s,%s,%s,%s,%s)"] * len(params))}
         RETURNING *;
         """
     results = run_query(sql, flat_params)
@@ -176,6 +192,7 @@ class ConversationRepository:
           "filename": row[3],
           "file_type": row[4],
           "created_at": row[5],
+          "content_hash": row[6],
         }
       )
     return out
@@ -224,6 +241,106 @@ class ConversationRepository:
       )
     return messages
 
+  @staticmethod
+  def get_messages_version(conversation_id: str) -> Dict[str, Any]:
+    """
+    Get the owner, the latest update time and the message count of a conversation, without loading
+    its messages. Message and attachment changes bump conversations.updated_at (see the triggers).
+    """
+    sql = """
+        SELECT c.user_id, c.updated_at,
+               (SELECT COUNT(*) FROM messages m WHERE m.conversation_id = c.conversation_id)
+        FROM conversations c
+        WHERE c.conversation_id = %s;
+        """
+    results = run_query(sql, (conversation_id,))
+
+    if not results:
+      return {}
+
+    row = results[0]
+    return {"user_id": row[0], "updated_at": row[1], "count": row[2]}
+
+  @staticmethod
+  def get_conversation_summary(conversation_id: str) -> Dict[str, Any]:
+    """
+    Get the rolling summary of a conversation, how many messages it covers, and how many
+    messages the conversation has stored.
+    """
+    sql = """
+        SELECT c.summary, c.summary_message_count,
+               (SELECT COUNT(*) FROM messages m WHERE m.conversation_id = c.conversation_id)
+        FROM conversations c
+        WHERE c.conversation_id = %s;
+        """
+    results = run_query(sql, (conversation_id,))
+
+    if not results:
+      return {}
+
+    row = results[0]
+    return {"summary": row[0], "summary_message_count": row[1], "message_count": row[2]}
+
+  @staticmethod
+  def get_described_attachments(conversation_id: str):
+    """
+    Get the messages of a conversation that have a file description, newest first, each with
+    the S3 URLs and content hashes of its attachments.
+    """
+    sql = """
+        SELECT m.message_id, m.file_description,
+               json_agg(json_build_object('s3_url', a.s3_url, 'content_hash', a.content_hash))
+        FROM messages m
+        JOIN attachments a ON a.message_id = m.message_id
+        WHERE m.conversation_id = %s AND COALESCE(m.file_description, '') <> ''
+        GROUP BY m.message_id
+        ORDER BY MAX(m.created_at) DESC;
+        """
+    results = run_query(sql, (conversation_id,))
+
+    return [
+      {"message_id": row[0], "file_description": row[1], "attachments": row[2]}
+      for row in results
+    ]
+
+  @staticmethod
+  def get_messages_after(conversation_id: str, offset: int):
+    """
+    Get the messages of a conversation that come after the first `offset` ones, oldest first.
+    """
+    sql = """
+        SELECT query, file_description, result_text
+        FROM messages
+        WHERE conversation_id = %s
+        ORDER BY created_at ASC
+        OFFSET %s;
+        """
+    results = run_query(sql, (conversation_id, offset))
+
+    return [
+      {"query": row[0], "file_description": row[1], "result_text": row[2]}
+      for row in results
+    ]
+
+  @staticmethod
+  def update_conversation_summary(
+    conversation_id: str, summary: str, summary_message_count: int
+  ) -> bool:
+    """
+    Store a newer rolling summary. A refresh that finished late never overwrites a summary
+    covering more messages.
+    """
+    sql = """
+        UPDATE conversations
+        SET summary = %s, summary_message_count = %s
+        WHERE conversation_id = %s AND summary_message_count < %s
+        RETURNING conversation_id;
+        """
+    params = (summary, summary_message_count, conversation_id, summary_message_count)
+    results = run_query(sql, params)
+
+    return bool(results)
+
   @staticmethod
   def check_conversation_ownership(user_id: str, conversation_id: str) -> str:
     """
@@ -246,11 +363,7 @@ class ConversationRepository:
 
     db_user_id = result[0][0]
 
-    print(user_id)
-    print(db_user_id)
-
     if UUID(db_user_id) != UUID(user_id):
-      print("here")
       return "not_owner"
 
     return "ok"
@@ -14,8 +14,12 @@ from src.core.models import (
   UploadFilesRequest,
   UploadFilesResponse,
   UploadFilesInfo,
+  Record,
 )
-from src.shared.S3_utils import get_presigned_url
+from src.core.config import ATTACHMENTS_BUCKET
+from src.shared.S3_utils import get_presigned_url, get_cached_presigned_urls, presign_epoch
+from src.shared.ETag_utils import make_etag
+from src.modules.summarize.service.summarize import generate_summary
 
 class ConversationService:
   async def create_conversation(self, user_id: str, title: str) -> ConversationResponse:
@@ -47,6 +51,28 @@ class ConversationService:
     resp = ConversationsResponse(conversations=conversations, count=count)
     return resp
 
+  async def conversations_etag(self, user_id: str) -> str:
+    version = ConversationRepository.get_conversations_version(user_id)
+    updated_at = version["updated_at"].isoformat() if version["updated_at"] else ""
+    return make_etag("conversations", user_id, updated_at, version["count"])
+
+  async def messages_etag(self, user_id: str, conversation_id: str) -> str:
+    """
+    ETag of a conversation's messages; also checks that the user owns the conversation.
+
+    Attachment URLs in the body are presigned and reused for one presign epoch, so the ETag changes
+    with the epoch: a revalidated body never carries URLs within the expiry margin.
+    """
+    version = ConversationRepository.get_messages_version(conversation_id)
+    if not version:
+      raise HTTPException(status_code=404, detail="Conversation not found")
+    if uuid.UUID(str(version["user_id"])) != uuid.UUID(user_id):
+      raise HTTPException(status_code=403, detail="Access denied")
+
+    return make_etag(
+      "messages", conversation_id, version["updated_at"].isoformat(), version["count"], presign_epoch()
+    )
+
   async def create_message(
     self,
     user_id: str,
@@ -161,6 +187,14 @@ class ConversationService:
 
     results = ConversationRepository.get_messages_by_conversation(conversation_id)
 
+    # Sign the download URLs of the whole thread at once; unchanged ones come from the cache
+    S3_URL_PREFIX = f'https://{ATTACHMENTS_BUCKET}.s3.amazonaws.com/'
+    attachments = [att for result in results for att in result.get("attachments") or []]
+    objects = [(att['s3_url'].replace(S3_URL_PREFIX, '', 1), att['file_type']) for att in attachments]
+    urls = get_cached_presigned_urls(ATTACHMENTS_BUCKET, objects) if objects else {}
+    for att, obj in zip(attachments, objects):
+      att["s3_url"] = urls[obj]
+
     count = 0
     messages = []
     for result in results:
@@ -168,10 +202,6 @@ class ConversationService:
       attachment_responses = []
       if result.get("attachments"):
         for att in result["attachments"]:
-          S3_URL_PREFIX = 'https://lemonaid-attachments-bucket.s3.amazonaws.com/'
-          s3_key = att['s3_url'].replace(S3_URL_PREFIX, '', 1)
-          att["s3_url"] = get_presigned_url('get_object', 'lemonaid-attachments-bucket', s3_key, 3600, ContentType=att['file_type']) # 1 hr expiration 
-          print(att["s3_url"])
           attachment_responses.append(AttachmentResponse(**att))
         result["attachments"] = attachment_responses
 
@@ -200,7 +230,7 @@ class ConversationService:
           s3_key = f"attachments/user-{user_id}/conv-{conversation_id}/{unique_id}-{file.filename}"
           url = get_presigned_url(
                 'put_object', 
-                'lemonaid-attachments-bucket', 
+                ATTACHMENTS_BUCKET, 
                 s3_key, 
                 900, 
                 # This keyword must be accepted by your wrapper and passed to Boto3's Params for signing
@@ -221,4 +251,40 @@ class ConversationService:
     if not uploads_list:
         raise HTTPException(status_code=500, detail="Failed to generate upload URLs")
 
-    return UploadFilesResponse(files=uploads_list)
\ No newline at end of file
+    return UploadFilesResponse(files=uploads_list)
+
+  def refresh_summary(self, conversation_id: str) -> None:
+    """
+    Fold the messages persisted since the last refresh into the conversation's rolling summary.
+    Runs alongside the chatbot turn that finds the summary stale, so failures are only logged.
+    """
+    try:
+      state = ConversationRepository.get_conversation_summary(conversation_id)
+      if not state:
+        return
+
+      covered = state["summary_message_count"]
+      new_messages = ConversationRepository.get_messages_after(conversation_id, covered)
+      if not new_messages:
+        return
+
+      records = [
+        Record(
+          query=(
+            f"{msg['query'] or ''}\nAttachment: {msg['file_description']}"
+            if msg["file_description"]
+            else msg["query"] or ""
+          ),
+          result=msg["result_text"] or "",
+        )
+        for msg in new_messages
+      ]
+      summary = generate_summary(records, state["summary"])
+      ConversationRepository.update_conversation_summary(
+        conversation_id, summary, covered + len(new_messages)
+      )
+      logging.info(
+        f"[Conversation Summary] Summary of {conversation_id} now covers {covered + len(new_messages)} messages"
+      )
+    except Exception as e:
+      logging.error(f"[Conversation Summary] Failed to refresh summary of {conversation_id}: {e}")
@@ -1,10 +1,11 @@
 from fastapi import APIRouter
 from .service.summarize import summarize_service
 from src.core.models import RecordsRequest
+from src.shared.jwt_auth import CurrentUser
 
 router = APIRouter()
 
 
 @router.post("")
-async def summarize(req: RecordsRequest):
+async def summarize(req: RecordsRequest, user: CurrentUser):
   return await summarize_service(req)
@@ -1,6 +1,9 @@
+import asyncio
+from typing import List, Optional
 from fastapi.responses import JSONResponse
-from src.core.models import RecordsRequest
+from src.core.models import Record, RecordsRequest
 from src.core.config import genai_client, GEMINI_MODEL
+from src.shared.Scheduler_utils import llm_scheduler, BACKGROUND
 
 import logging
 
@@ -11,25 +14,50 @@ logger = logging.getLogger(__name__)
 async def summarize_service(req: RecordsRequest):
     try:
         logger.info(f"[RAG Background] Start to generate the background")
-        # Combine all query/results into a single prompt
-        prompt_content = "\n".join(
-            [f"Q: {r.query}\nA: {r.result}" for r in req.records]
+        background_summary = await asyncio.to_thread(generate_summary, req.records)
+        logger.info(f"[RAG Background] Finish to generate the background")
+        return {"results": background_summary}
+
+    except Exception as e:
+        logger.error(f"[RAG Background] Error: {e}")
+        return JSONResponse(status_code=500, content={"error": str(e)})
+
+
+def generate_summary(records: List[Record], previous_summary: Optional[str] = None) -> str:
+    """
+    Summarize query/result pairs into a background text.
+
+    Args:
+        records (List[Record]): The query/result pairs to summarize
+        previous_summary (Optional[str]): A summary of earlier pairs to extend incrementally
+    Returns:
+        str: The summary text
+    """
+    # Combine all query/results into a single prompt
+    prompt_content = "\n".join(
+        [f"Q: {r.query}\nA: {r.result}" for r in records]
+    )
+    if previous_summary:
+        full_prompt = (
+            f"You are given the current summary of a conversation and its newest query-result pairs.\n"
+            f"Update the summary so it also covers the new pairs. Keep every fastener detail, quantity and decision "
+            f"that is still relevant, and keep it concise:\n\n"
+            f"Current summary:\n{previous_summary}\n\nNew pairs:\n{prompt_content}"
         )
+    else:
         full_prompt = (
             f"You are given a list of query-result pairs.\n"
             f"Summarize the general background or context from them:\n\n{prompt_content}"
         )
 
-        # Send to Gemini
-        response = genai_client.models.generate_content(
+    # Send to Gemini in the background lane so interactive chat is served first
+    response = llm_scheduler.call(
+        GEMINI_MODEL,
+        lambda: genai_client.models.generate_content(
             contents=[full_prompt],
             model=GEMINI_MODEL
-        )
-
-        background_summary = (response.text or "").strip()
-        logger.info(f"[RAG Background] Finish to generate the background")
-        return {"results": background_summary}
+        ),
+        priority=BACKGROUND,
+    )
 
-    except Exception as e:
-        logger.error(f"[RAG Background] Error: {e}")
-        return JSONResponse(status_code=500, content={"error": str(e)})
+    return (response.text or "").strip()
@@ -35,10 +35,16 @@ def get_conn():
         logger.error(f"An unexpected error occurred during DB connection: {e}")
         raise
 
-def run_query(sql: str, params: tuple = None) -> list:
+def run_query(sql: str, params: tuple = None, timeout: Optional[float] = None) -> list:
+    """
+    Runs one statement in its own connection. With a `timeout` (seconds), the statement is cancelled
+    by the server when it runs longer (psycopg2.errors.QueryCanceled).
+    """
     conn = get_conn()
     try:
         with conn.cursor() as cur:
+            if timeout is not None:
+                cur.execute("SET LOCAL statement_timeout = %s;", (max(int(timeout * 1000), 1),))
             cur.execute(sql, params)
             # Check if the query returns rows before trying to fetch
             if cur.description:
@@ -51,9 +57,12 @@ def run_query(sql: str, params: tuple = None) -> list:
         if conn:
             conn.close()
 
-def retrieve_similar_content(sql: str, params: tuple) -> list[tuple]:
+def retrieve_similar_content(sql: str, params: tuple, timeout: Optional[float] = None) -> list[tuple]:
     logger.debug(f"Executing similarity search")
-    return run_query(sql, params)
+    try:
+        return run_query(sql, params, timeout)
+    except psycopg2.errors.QueryCanceled as e:
+        raise TimeoutError(f"Similarity search timed out after {timeout:.1f}s") from e
 
 def insert_user(user_id: str, username: str, email: str):
     """
@@ -95,20 +104,34 @@ def get_user_by_id(user_id: str) -> dict:
         "updated_at": row[5],
     }
 
-def update_user_username(user_id: str, new_username: str):
+def upsert_user(user_id: str, username: str, email: str) -> dict:
     """
-    Update the username of an existing user in the database.
+    Inserts the user, or updates the username of an existing one, in a single round trip.
+    An unchanged user is not written; its stored row is returned as is.
     """
     sql = """
-    SELECT username
-    UPDATE users SET username = %s 
-    WHERE user_id = %s
+    WITH upserted AS (
+        INSERT INTO users (user_id, username, email)
+        VALUES (%s, %s, %s)
+        ON CONFLICT (user_id) DO UPDATE
+            SET username = EXCLUDED.username, updated_at = now()
+            WHERE users.username IS DISTINCT FROM EXCLUDED.username
+        RETURNING user_id, username, email
+    )
+    SELECT user_id, username, email FROM upserted
+    UNION ALL
+    SELECT user_id, username, email FROM users
+    WHERE user_id = %s AND NOT EXISTS (SELECT 1 FROM upserted);
     """
-
-    params = (new_username, user_id)
+    params = (user_id, username, email, user_id)
     results = run_query(sql, params)
 
     if not results:
-        return None
-    
-    return results[0][0]
\ No newline at end of file
+        return {}
+
+    row = results[0]
+    return {
+        "user_id": str(row[0]),
+        "username": row[1],
+        "email": row[2],
+    }
@@ -0,0 +1,61 @@
+import time
+from typing import Optional
+
+from src.core.config import CHATBOT_DEADLINE_SECONDS
+
+# Kept free at the end of a Lambda invocation to serialize and return the response
+LAMBDA_SAFETY_MARGIN_SECONDS = 1.5
+
+
+class DeadlineExceeded(TimeoutError):
+    pass
+
+
+class Deadline:
+    """
+    Wall-clock budget of a request, created once at the router and passed down through every stage.
+    Stages derive their own timeouts from what is left and skip optional work when time is short.
+    """
+
+    def __init__(self, seconds: float):
+        self.expires_at = time.monotonic() + seconds
+
+    @classmethod
+    def from_scope(cls, scope: dict, seconds: float = CHATBOT_DEADLINE_SECONDS) -> "Deadline":
+        """
+        Uses the configured budget, capped by the Lambda invocation's remaining time when running under Mangum.
+        """
+        context = scope.get("aws.context")
+        if context is not None and hasattr(context, "get_remaining_time_in_millis"):
+            remaining = context.get_remaining_time_in_millis() / 1000 - LAMBDA_SAFETY_MARGIN_SECONDS
+            seconds = min(seconds, max(remaining, 0.0))
+        return cls(seconds)
+
+    def with_reserve(self, reserve: float) -> "Deadline":
+        """
+        Deadline of a stage that must leave `reserve` seconds for later stages (e.g. generation).
+        """
+        stage = Deadline(0)
+        stage.expires_at = self.expires_at - reserve
+        return stage
+
+    def remaining(self) -> float:
+        return max(self.expires_at - time.monotonic(), 0.0)
+
+    def expired(self, reserve: float = 0.0) -> bool:
+        """
+        True once less than `reserve` seconds are left.
+        """
+        return self.remaining() <= reserve
+
+    def timeout(self, share: float = 1.0, reserve: float = 0.0) -> float:
+        """
+        Timeout in seconds for a stage: `share` of the time left after keeping `reserve` seconds for later stages.
+        """
+        return max(self.remaining() - reserve, 0.0) * share
+
+    def timeout_ms(self, share: float = 1.0, reserve: float = 0.0) -> int:
+        """
+        Same as `timeout`, in milliseconds as expected by the Gemini client's http options.
+        """
+        return max(int(self.timeout(share, reserve) * 1000), 1)
@@ -0,0 +1,150 @@
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Iterable, Optional
+
+# Set up basic logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+class DocumentStore:
+    """
+    In-memory store of the text files of a directory, read by name (`<root>/<name><suffix>`).
+
+    Documents are loaded lazily (or up front with `preload`) and kept in LRU order within `max_bytes`.
+    A cached document is re-checked against its file's mtime and size at most every
+    `revalidate_seconds`, and reloaded when the file changed; missing files are remembered for
+    `missing_ttl_seconds` so they are not looked up on every request.
+    """
+
+    def __init__(
+        self,
+        root: str,
+        max_bytes: int,
+        suffix: str = ".md",
+        revalidate_seconds: float = 60,
+        missing_ttl_seconds: float = 60,
+    ):
+        self.root = root
+        self.suffix = suffix
+        self.max_bytes = max_bytes
+        self.revalidate_seconds = revalidate_seconds
+        self.missing_ttl_seconds = missing_ttl_seconds
+        # name -> (text, (mtime_ns, size), checked_at)
+        self._documents: "OrderedDict[str, tuple[str, tuple[int, int], float]]" = OrderedDict()
+        self._missing: Dict[str, float] = {}  # name -> monotonic time the miss expires
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def path(self, name: str) -> str:
+        return os.path.join(self.root, f"{name}{self.suffix}")
+
+    def get(self, name: Optional[str]) -> Optional[str]:
+        """
+        Returns the text of the document, or None when its file does not exist.
+        """
+        if not name:
+            return None
+        now = time.monotonic()
+        with self._lock:
+            missing_until = self._missing.get(name)
+            if missing_until is not None:
+                if missing_until > now:
+                    self.hits += 1
+                    return None
+                del self._missing[name]
+
+            entry = self._documents.get(name)
+            if entry is not None and now - entry[2] < self.revalidate_seconds:
+                self._documents.move_to_end(name)
+                self.hits += 1
+                return entry[0]
+
+        return self._load(name, entry, now)
+
+    def get_many(self, names: Iterable[Optional[str]]) -> Dict[str, Optional[str]]:
+        """
+        Returns {name: text or None} for the given names, reading each distinct document once.
+        """
+        return {name: self.get(name) for name in dict.fromkeys(names) if name}
+
+    def preload(self) -> int:
+        """
+        Loads the documents of the directory, smallest first, until the byte bound is reached.
+        Returns the number of documents in the store.
+        """
+        try:
+            with os.scandir(self.root) as entries:
+                files = [
+                    (entry.stat().st_size, entry.name[: -len(self.suffix)])
+                    for entry in entries
+                    if entry.is_file() and entry.name.endswith(self.suffix)
+                ]
+        except OSError as e:
+            logger.warning(f"[Document Store] Could not list {self.root}: {e}")
+            return 0
+
+        loaded = 0
+        for size, name in sorted(files):
+            if self._bytes + size > self.max_bytes:
+                break
+            if self.get(name) is not None:
+                loaded += 1
+        logger.info(
+            f"[Document Store] Preloaded {loaded} of {len(files)} document(s) ({self._bytes} bytes) from {self.root}"
+        )
+        return len(self._documents)
+
+    def invalidate(self, name: Optional[str] = None) -> None:
+        with self._lock:
+            if name is None:
+                self._documents.clear()
+                self._missing.clear()
+                self._bytes = 0
+                return
+            self._missing.pop(name, None)
+            entry = self._documents.pop(name, None)
+            if entry is not None:
+                self._bytes -= entry[1][1]
+
+    def __len__(self) -> int:
+        return len(self._documents)
+
+    def _load(self, name: str, entry: Optional[tuple], now: float) -> Optional[str]:
+        path = self.path(name)
+        try:
+            stat = os.stat(path)
+            version = (stat.st_mtime_ns, stat.st_size)
+            if entry is not None and entry[1] == version:
+                text = entry[0]
+            else:
+                with open(path, "r", encoding="utf-8") as f:
+                    text = f.read()
+                self.misses += 1
+        except FileNotFoundError:
+            logger.warning(f"[Missing parsed file]: {path}")
+            with self._lock:
+                self._missing[name] = now + self.missing_ttl_seconds
+                stale = self._documents.pop(name, None)
+                if stale is not None:
+                    self._bytes -= stale[1][1]
+            self.misses += 1
+            return None
+
+        with self._lock:
+            stale = self._documents.pop(name, None)
+            if stale is not None:
+                self._bytes -= stale[1][1]
+            # Documents larger than the whole store are served but not kept
+            if version[1] <= self.max_bytes:
+                self._documents[name] = (text, version, now)
+                self._bytes += version[1]
+                while self._bytes > self.max_bytes:
+                    _, (_, (_, evicted_size), _) = self._documents.popitem(last=False)
+                    self._bytes -= evicted_size
+        return text
@@ -0,0 +1,28 @@
+import hashlib
+from typing import Optional
+
+
+def make_etag(*parts) -> str:
+    """
+    Builds a strong ETag from the parts that version a resource (e.g. its last update time and row count).
+    """
+    digest = hashlib.sha256("\0".join(str(part) for part in parts).encode("utf-8")).hexdigest()
+    return f'"{digest[:32]}"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """
+    Whether an If-None-Match header matches `etag`: "*", or one of its comma-separated entity tags.
+    If-None-Match uses the weak comparison, so a W/ prefix is ignored.
+    """
+    if not if_none_match:
+        return False
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate == "*":
+            return True
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == etag:
+            return True
+    return False
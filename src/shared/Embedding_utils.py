@@ -2,46 +2,60 @@ import requests
 import logging
 from src.core.config import genai_client, GEMINI_API_KEY, API_URL, HEADERS
 from typing import Optional, List
-from google.genai.types import EmbedContentConfig
+from google.genai.types import EmbedContentConfig, HttpOptions
+from src.shared.Scheduler_utils import llm_scheduler
+from src.shared.Deadline_utils import Deadline
 
 # Set up basic logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Upper bound of a MiniLM embedding request, further capped by the request deadline
+EMBEDDING_TIMEOUT_SECONDS = 30
+
 
 # --- Embeddings ---
-def get_embedding(text: str) -> Optional[List[float]]:
+async def get_embedding(text: str, deadline: Optional[Deadline] = None) -> Optional[List[float]]:
     if not API_URL:
         logger.error("MINILM_URL not set")
         return None
 
-    # Loop for the specified number of retries
-    for attempt in range(3):
-        try:
-            r = requests.post(API_URL, headers=HEADERS, json={"inputs": [text]})
-            r.raise_for_status()
-            return r.json()[0]
-        except requests.exceptions.Timeout:
-            logger.warning(f"Attempt {attempt + 1} timed out.")
-
-        except requests.exceptions.RequestException as e:
-            logger.error(f"Attempt {attempt + 1} failed with a request error: {e}")
+    def post():
+        timeout = min(EMBEDDING_TIMEOUT_SECONDS, deadline.timeout()) if deadline else EMBEDDING_TIMEOUT_SECONDS
+        r = requests.post(API_URL, headers=HEADERS, json={"inputs": [text]}, timeout=timeout)
+        r.raise_for_status()
+        return r.json()[0]
 
-        except Exception as e:
-            logger.error(f"An unexpected error occurred in get_embedding: {e}")
-
-    logger.error("All retry attempts to get embedding failed.")
+    # Retries with backoff are handled by the scheduler
+    try:
+        return await llm_scheduler.acall("minilm", post, deadline=deadline)
+    except requests.exceptions.RequestException as e:
+        logger.error(f"All retry attempts to get embedding failed: {e}")
+    except Exception as e:
+        logger.error(f"An unexpected error occurred in get_embedding: {e}")
     return None
 
-def get_embedding_gemini(text: str) -> Optional[List[float]]:
+async def get_embedding_gemini(text: str, deadline: Optional[Deadline] = None) -> Optional[List[float]]:
+    """
+    With a `deadline`, each attempt times out when it is spent and no retry starts past it
+    (DeadlineExceeded).
+    """
     if not GEMINI_API_KEY:
         print("GEMINI_API_KEY not set")
         return None
     try:
-        r = genai_client.models.embed_content(
-            model="gemini-embedding-001",
-            contents=text,
-            config=EmbedContentConfig(task_type="RETRIEVAL_QUERY", output_dimensionality=3072)
+        r = await llm_scheduler.acall(
+            "gemini-embedding-001",
+            lambda: genai_client.models.embed_content(
+                model="gemini-embedding-001",
+                contents=text,
+                config=EmbedContentConfig(
+                    task_type="RETRIEVAL_QUERY",
+                    output_dimensionality=3072,
+                    http_options=HttpOptions(timeout=deadline.timeout_ms()) if deadline else None,
+                )
+            ),
+            deadline=deadline,
         )
 
         return r.embeddings[0].values
@@ -1,21 +1,90 @@
 import os
-from typing import Optional
+from typing import Dict, Iterable, List, Optional
 import logging
-from src.core.config import IFI_DIR
+from src.core.config import (
+    IFI_DIR,
+    IFI_ARCHIVE,
+    IFI_INDEX,
+    IFI_CACHE_MAX_BYTES,
+    IFI_REVALIDATE_SECONDS,
+    IFI_MISSING_TTL_SECONDS,
+)
+from src.shared.Cache_utils import TTLCache
+from src.shared.DocumentStore_utils import DocumentStore
+from src.shared.IFIArchive_utils import IFIArchive
+from src.shared.IFIIndex_utils import DocumentInfo, load_index
+from src.shared.Section_utils import split_sections
 
 # Set up basic logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 
+def open_ifi_store() -> DocumentStore | IFIArchive:
+    """
+    Serves the packed IFI archive when one is shipped, the IFI_DIR markdown files otherwise.
+    """
+    if os.path.exists(IFI_ARCHIVE):
+        try:
+            return IFIArchive(IFI_ARCHIVE)
+        except (OSError, ValueError) as e:
+            logger.warning(f"[IFI Archive] Could not open {IFI_ARCHIVE}, reading {IFI_DIR} instead: {e}")
+    # Parsed IFI markdown files, kept in memory across requests of a warm instance
+    return DocumentStore(
+        IFI_DIR,
+        max_bytes=IFI_CACHE_MAX_BYTES,
+        revalidate_seconds=IFI_REVALIDATE_SECONDS,
+        missing_ttl_seconds=IFI_MISSING_TTL_SECONDS,
+    )
+
+
+ifi_store = open_ifi_store()
+
+# Loaded once at startup so prompt assembly knows document sizes without reading them
+ifi_index: Dict[str, DocumentInfo] = load_index(IFI_INDEX)
+
+# Sections of documents read from IFI_DIR (the archive stores them), keyed by name with the text they belong to
+section_cache = TTLCache(max_entries=1024)
+
+
 # --- File reader ---
 def read_file_text(filename: Optional[str]) -> str:
     if not filename:
         return ""
-        
-    path = os.path.join(IFI_DIR, f"{filename}.md")
-    if not os.path.exists(path):
-        logger.warning(f"[Missing parsed file]: {path}")
-        return ""
-    with open(path, "r", encoding="utf-8") as f:
-        return f.read()
+    return ifi_store.get(filename) or ""
+
+
+def read_file_texts(filenames: Iterable[Optional[str]]) -> Dict[str, str]:
+    """
+    Reads several IFI files at once: {filename: text}, with "" for missing files.
+    """
+    return {name: text or "" for name, text in ifi_store.get_many(filenames).items()}
+
+
+def document_info(filename: Optional[str], text: Optional[str] = None) -> Optional[DocumentInfo]:
+    """
+    Index entry of an IFI file; with `text`, only when the entry still describes that text.
+    """
+    info = ifi_index.get(filename) if filename else None
+    if info is not None and text is not None and info.chars != len(text):
+        return None
+    return info
+
+
+def file_sections(filename: str, text: str) -> List[tuple[int, int]]:
+    """
+    Section offsets of an IFI file's text: precomputed in the archive or the index, otherwise split once per loaded text.
+    """
+    if isinstance(ifi_store, IFIArchive):
+        sections = ifi_store.sections(filename)
+        if sections is not None:
+            return sections
+    info = document_info(filename, text)
+    if info is not None:
+        return info.sections
+    cached = section_cache.get(filename)
+    if cached is not None and cached[0] is text:
+        return cached[1]
+    sections = split_sections(text)
+    section_cache.set(filename, (text, sections))
+    return sections
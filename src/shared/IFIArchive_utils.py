@@ -0,0 +1,158 @@
+import hashlib
+import json
+import logging
+import mmap
+import os
+import struct
+import zlib
+from typing import Dict, Iterable, List, Optional
+
+from src.shared.Section_utils import split_sections
+
+# Set up basic logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Layout: MAGIC | u32 index length | JSON index | blobs
+#   index = {"version": <sha256>, "documents": {name: [offset, length, compressed, raw_length, sections]}}
+# Offsets are absolute; raw blobs are UTF-8 text, compressed ones zlib streams.
+# Sections are the [start, end] character offsets of the document's sections (see split_sections).
+MAGIC = b"IFIPACK1"
+HEADER = struct.Struct("<8sI")
+
+
+def build_archive(source_dir: str, archive_path: str, suffix: str = ".md", compress: bool = False) -> str:
+    """
+    Packs the `suffix` files of `source_dir` into one archive at `archive_path` (replaced atomically).
+
+    With `compress`, documents are stored zlib-compressed when that makes them smaller; otherwise they
+    are stored raw, so reads are served straight from the memory map.
+    Returns the version hash of the packed contents.
+    """
+    names = sorted(name[: -len(suffix)] for name in os.listdir(source_dir) if name.endswith(suffix))
+    blobs = []
+    version = hashlib.sha256()
+    for name in names:
+        with open(os.path.join(source_dir, f"{name}{suffix}"), "rb") as f:
+            raw = f.read()
+        version.update(f"{name}\0{len(raw)}\0".encode("utf-8"))
+        version.update(raw)
+        sections = split_sections(raw.decode("utf-8"))
+        packed = zlib.compress(raw, 9) if compress else raw
+        if len(packed) < len(raw):
+            blobs.append((name, packed, 1, len(raw), sections))
+        else:
+            blobs.append((name, raw, 0, len(raw), sections))
+
+    # Offsets depend on the index length, which depends on the offsets: size the index with
+    # placeholder offsets of the final width first
+    def encode_index(base: int) -> bytes:
+        documents = {}
+        offset = base
+        for name, blob, compressed, raw_length, sections in blobs:
+            documents[name] = [offset, len(blob), compressed, raw_length, sections]
+            offset += len(blob)
+        return json.dumps(
+            {"version": version.hexdigest(), "documents": documents}, separators=(",", ":")
+        ).encode("utf-8")
+
+    base = HEADER.size
+    while True:
+        index = encode_index(base)
+        if HEADER.size + len(index) == base:
+            break
+        base = HEADER.size + len(index)
+
+    tmp_path = f"{archive_path}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(HEADER.pack(MAGIC, len(index)))
+        f.write(index)
+        for _, blob, _, _, _ in blobs:
+            f.write(blob)
+    os.replace(tmp_path, archive_path)
+
+    logger.info(
+        f"[IFI Archive] Packed {len(blobs)} document(s) from {source_dir} into {archive_path} "
+        f"({os.path.getsize(archive_path)} bytes, version {version.hexdigest()[:12]})"
+    )
+    return version.hexdigest()
+
+
+class IFIArchive:
+    """
+    Read-only view of a packed IFI archive through a memory map.
+
+    Lookups are index lookups plus a slice of the map: the OS page cache holds the documents.
+    get_bytes returns raw documents as views of the map without copying; get decodes them into a
+    new str, which copies the document once per call.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, "rb") as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, index_length = HEADER.unpack_from(self._map, 0)
+        if magic != MAGIC:
+            self._map.close()
+            raise ValueError(f"[IFI Archive] Not an IFI archive: {path}")
+        index = json.loads(self._map[HEADER.size:HEADER.size + index_length])
+        self.version: str = index["version"]
+        self._documents: Dict[str, list] = index["documents"]
+        logger.info(f"[IFI Archive] Opened {path}: {len(self._documents)} document(s), version {self.version[:12]}")
+
+    def get_bytes(self, name: Optional[str]) -> Optional[memoryview | bytes]:
+        """
+        Returns the UTF-8 bytes of the document (a zero-copy view when stored raw), or None if absent.
+        """
+        entry = self._documents.get(name) if name else None
+        if entry is None:
+            return None
+        offset, length, compressed = entry[:3]
+        view = memoryview(self._map)[offset:offset + length]
+        return zlib.decompress(view) if compressed else view
+
+    def get(self, name: Optional[str]) -> Optional[str]:
+        """
+        Returns the document decoded as text (a copy of its bytes), or None if absent.
+        """
+        data = self.get_bytes(name)
+        if data is None:
+            if name:
+                logger.warning(f"[Missing parsed file]: {name} not in {self.path}")
+            return None
+        return str(data, "utf-8")
+
+    def get_many(self, names: Iterable[Optional[str]]) -> Dict[str, Optional[str]]:
+        return {name: self.get(name) for name in dict.fromkeys(names) if name}
+
+    def sections(self, name: Optional[str]) -> Optional[List[tuple[int, int]]]:
+        """
+        Section offsets computed when the archive was built (None for archives packed without them).
+        """
+        entry = self._documents.get(name) if name else None
+        if entry is None or len(entry) < 5:
+            return None
+        return [tuple(section) for section in entry[4]]
+
+    def preload(self) -> int:
+        # Ask the OS to read the archive ahead into the page cache
+        if hasattr(self._map, "madvise") and hasattr(mmap, "MADV_WILLNEED"):
+            self._map.madvise(mmap.MADV_WILLNEED)
+        return len(self._documents)
+
+    def verify(self) -> bool:
+        """
+        Recomputes the version hash from the packed documents.
+        """
+        version = hashlib.sha256()
+        for name in sorted(self._documents):
+            raw = bytes(self.get_bytes(name))
+            version.update(f"{name}\0{len(raw)}\0".encode("utf-8"))
+            version.update(raw)
+        return version.hexdigest() == self.version
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._documents
+
+    def __len__(self) -> int:
+        return len(self._documents)
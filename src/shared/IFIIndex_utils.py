@@ -0,0 +1,117 @@
+import hashlib
+import json
+import logging
+import math
+import os
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional
+
+from src.shared.Section_utils import split_sections
+
+# Set up basic logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Same heuristic as the context packer when no tokenizer is available: 1 token ~ 4 characters
+CHAR_PER_TOKEN = 4
+
+
+@dataclass
+class DocumentInfo:
+    name: str
+    tokens: int
+    size: int  # bytes
+    chars: int
+    sha256: str
+    mtime: float
+    sections: List[tuple[int, int]] = field(default_factory=list)
+
+
+def estimate_tokens(text: str) -> int:
+    return math.ceil(len(text) / CHAR_PER_TOKEN)
+
+
+def build_index(
+    source_dir: str,
+    index_path: str,
+    suffix: str = ".md",
+    count_tokens: Optional[Callable[[str], int]] = None,
+    tokenizer: str = "estimate",
+) -> int:
+    """
+    Records the token count, byte size, section boundaries, content hash and mtime of every
+    `suffix` file of `source_dir` in a compact JSON index at `index_path` (replaced atomically).
+
+    `count_tokens` counts a document's tokens (e.g. with the provider's tokenizer, named by `tokenizer`);
+    by default tokens are estimated from the character count. Documents whose content is unchanged since
+    the index at `index_path` was built with the same tokenizer keep their counts without being counted again.
+    Returns the number of indexed documents.
+    """
+    counted = load_token_counts(index_path, tokenizer) if count_tokens else {}
+    documents = {}
+    for file_name in sorted(os.listdir(source_dir)):
+        if not file_name.endswith(suffix):
+            continue
+        path = os.path.join(source_dir, file_name)
+        with open(path, "rb") as f:
+            raw = f.read()
+        text = raw.decode("utf-8")
+        sha256 = hashlib.sha256(raw).hexdigest()
+        if not count_tokens:
+            tokens = estimate_tokens(text)
+        elif sha256 in counted:
+            tokens = counted[sha256]
+        else:
+            tokens = count_tokens(text)
+        documents[file_name[: -len(suffix)]] = [
+            tokens,
+            len(raw),
+            len(text),
+            sha256,
+            os.path.getmtime(path),
+            split_sections(text),
+        ]
+
+    tmp_path = f"{index_path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump({"tokenizer": tokenizer, "documents": documents}, f, separators=(",", ":"))
+    os.replace(tmp_path, index_path)
+    logger.info(f"[IFI Index] Indexed {len(documents)} document(s) from {source_dir} into {index_path}")
+    return len(documents)
+
+
+def load_token_counts(index_path: str, tokenizer: str) -> Dict[str, int]:
+    """
+    {sha256: tokens} of an existing index built with `tokenizer`; empty when there is none.
+    """
+    try:
+        with open(index_path, "r", encoding="utf-8") as f:
+            index = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    if index.get("tokenizer") != tokenizer:
+        return {}
+    return {entry[3]: entry[0] for entry in index["documents"].values()}
+
+
+def load_index(index_path: str) -> Dict[str, DocumentInfo]:
+    """
+    Loads an index written by `build_index`: {name: DocumentInfo}. Empty when there is no index.
+    """
+    try:
+        with open(index_path, "r", encoding="utf-8") as f:
+            index = json.load(f)
+    except FileNotFoundError:
+        return {}
+    except (OSError, ValueError) as e:
+        logger.warning(f"[IFI Index] Could not load {index_path}: {e}")
+        return {}
+
+    documents = {
+        name: DocumentInfo(name, tokens, size, chars, sha256, mtime, [tuple(s) for s in sections])
+        for name, (tokens, size, chars, sha256, mtime, sections) in index["documents"].items()
+    }
+    logger.info(
+        f"[IFI Index] Loaded {len(documents)} document(s) from {index_path} (tokens: {index.get('tokenizer')})"
+    )
+    return documents
@@ -1,10 +1,29 @@
+import logging
+import time
+from typing import Dict, Iterable, Optional
+
 import boto3
+from fastapi import HTTPException
+
+from src.core.config import (
+    PRESIGNED_URL_EXPIRES_SECONDS,
+    PRESIGNED_URL_MARGIN_SECONDS,
+    PRESIGNED_URL_CACHE_SIZE,
+)
+from src.shared.Cache_utils import TTLCache
+
+# Set up basic logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
 
 s3 = boto3.client(
     's3',
     region_name='us-west-1'
 )
 
+# (bucket, key, content type) -> (epoch, presigned GET URL)
+presigned_urls = TTLCache(PRESIGNED_URL_CACHE_SIZE)
+
 def get_presigned_url(method: str, bucket_name: str, key: str, expiration: int = 3600, ContentType=None) -> str:
 
     params={
@@ -26,4 +45,44 @@ def get_presigned_url(method: str, bucket_name: str, key: str, expiration: int =
         ExpiresIn=expiration
     )
     return url
-    
\ No newline at end of file
+
+def presign_window() -> int:
+    """
+    Length of the windows a presigned GET URL is reused in: the URL still has at least
+    PRESIGNED_URL_MARGIN_SECONDS to live when its window ends.
+    """
+    return max(1, int(PRESIGNED_URL_EXPIRES_SECONDS - PRESIGNED_URL_MARGIN_SECONDS))
+
+def presign_epoch(now: Optional[float] = None) -> int:
+    """
+    Index of the current reuse window. Cached URLs all rotate when it changes, so responses built
+    from them are stable within an epoch (and may be versioned by it, e.g. in ETags).
+    """
+    return int((time.time() if now is None else now) // presign_window())
+
+def get_cached_presigned_urls(bucket_name: str, objects: Iterable[tuple[str, Optional[str]]]) -> Dict[tuple[str, Optional[str]], str]:
+    """
+    Presigned GET URLs for many (key, content type) pairs at once: {(key, content type): url}.
+
+    URLs are reused from the cache within the current epoch and only the missing ones are signed,
+    each pair once however often it is repeated. Reused URLs keep the browser's cached objects valid.
+    """
+    now = time.time()
+    epoch = presign_epoch(now)
+    ttl = (epoch + 1) * presign_window() - now
+
+    urls = {}
+    signed = 0
+    for key, content_type in dict.fromkeys(objects):
+        cache_key = (bucket_name, key, content_type)
+        cached = presigned_urls.get(cache_key)
+        if cached is not None and cached[0] == epoch:
+            urls[(key, content_type)] = cached[1]
+            continue
+        url = get_presigned_url('get_object', bucket_name, key, PRESIGNED_URL_EXPIRES_SECONDS, ContentType=content_type)
+        presigned_urls.set(cache_key, (epoch, url), ttl_seconds=ttl)
+        urls[(key, content_type)] = url
+        signed += 1
+
+    logger.debug(f"[S3] Presigned {signed} of {len(urls)} URL(s), reused {len(urls) - signed}")
+    return urls
@@ -0,0 +1,405 @@
+import asyncio
+import heapq
+import itertools
+import json
+import logging
+import random
+import re
+import threading
+import time
+from collections import defaultdict
+from typing import Any, Callable, Dict, Optional
+
+import httpx
+import requests
+from google.genai import errors as genai_errors
+
+from src.core.config import (
+    LLM_MAX_CONCURRENCY,
+    LLM_RATE_LIMITS,
+    LLM_DEFAULT_RPM,
+    LLM_MAX_RETRIES,
+    LLM_METRICS_INTERVAL_SECONDS,
+    LLM_METRICS_NAMESPACE,
+)
+from src.shared.Deadline_utils import Deadline, DeadlineExceeded
+
+# Set up basic logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Priority lanes: lower value is served first
+INTERACTIVE = 0
+BACKGROUND = 1
+
+RETRYABLE_STATUS = {408, 429, 500, 502, 503, 504}
+BASE_DELAY_SECONDS = 0.5
+MAX_DELAY_SECONDS = 30.0
+
+# Per-model counters published as CloudWatch metrics, with their units
+METRIC_UNITS = {
+    "calls": "Count",
+    "retries": "Count",
+    "throttled": "Count",
+    "failures": "Count",
+    "wait_seconds": "Seconds",
+    "latency_seconds": "Seconds",
+}
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket refilled at `rpm` requests per minute, with bursts up to `capacity`.
+    """
+
+    def __init__(self, rpm: float, capacity: Optional[float] = None):
+        self.rate = rpm / 60.0
+        self.capacity = capacity or max(1.0, self.rate)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+        self.lock = threading.Lock()
+
+    def take(self, deadline: Optional[Deadline] = None) -> float:
+        """
+        Blocks until a token is available and returns how long it waited.
+        With a `deadline`, raises DeadlineExceeded instead of waiting past it.
+        """
+        waited = 0.0
+        while True:
+            wait = self._try_take(deadline)
+            if not wait:
+                return waited
+            time.sleep(wait)
+            waited += wait
+
+    async def atake(self, deadline: Optional[Deadline] = None) -> float:
+        """
+        Async variant of `take` that waits on the event loop instead of a thread.
+        """
+        waited = 0.0
+        while True:
+            wait = self._try_take(deadline)
+            if not wait:
+                return waited
+            await asyncio.sleep(wait)
+            waited += wait
+
+    def _try_take(self, deadline: Optional[Deadline]) -> float:
+        # Takes a token and returns 0, or returns how long to wait for the next one
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if now >= self.paused_until and self.tokens >= 1:
+                self.tokens -= 1
+                return 0.0
+            wait = max(self.paused_until - now, (1 - self.tokens) / self.rate)
+        if deadline is not None and deadline.expired(reserve=wait):
+            raise DeadlineExceeded("[Scheduler] Deadline passed while rate limited")
+        return wait
+
+    def pause(self, seconds: float) -> None:
+        """
+        Holds back every caller of this bucket, e.g. after the provider answered 429.
+        """
+        with self.lock:
+            self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+            self.tokens = 0
+
+
+class RateScheduler:
+    """
+    Single gate for outbound provider calls (generation, embeddings, token counting, uploads).
+
+    - Per-model token buckets keep each model under its requests-per-minute quota. A caller takes
+      its token before queueing for a slot, so a throttled model does not hold slots other models could use.
+    - A bounded number of calls run at once; queued calls are admitted by priority lane
+      (INTERACTIVE before BACKGROUND), then in arrival order. Sync and async callers share the slots.
+    - Throttling and transient errors are retried with jittered exponential backoff, honoring the
+      provider's retry hint, and pause the model's bucket so other callers back off too.
+    - Async callers wait on the event loop; only the provider call itself runs in a thread.
+    - Counters are published as CloudWatch EMF log lines at most every LLM_METRICS_INTERVAL_SECONDS.
+    """
+
+    def __init__(
+        self,
+        max_concurrency: int = LLM_MAX_CONCURRENCY,
+        rate_limits: Optional[Dict[str, float]] = None,
+        default_rpm: float = LLM_DEFAULT_RPM,
+        max_retries: int = LLM_MAX_RETRIES,
+        metrics_interval: float = LLM_METRICS_INTERVAL_SECONDS,
+    ):
+        self.max_concurrency = max_concurrency
+        self.rate_limits = rate_limits if rate_limits is not None else LLM_RATE_LIMITS
+        self.default_rpm = default_rpm
+        self.max_retries = max_retries
+        self.metrics_interval = metrics_interval
+
+        self._cond = threading.Condition()
+        self._active = 0
+        self._queue = []  # heap of (priority, seq)
+        self._seq = itertools.count()
+        self._async_waiters: Dict[tuple, tuple] = {}  # entry -> (loop, asyncio.Event)
+        self._buckets: Dict[str, TokenBucket] = {}
+        self._metrics = defaultdict(lambda: defaultdict(float))
+        self._published: Dict[str, Dict[str, float]] = {}
+        self._published_at = time.monotonic()
+
+    # --- Public API
+    def call(
+        self,
+        model: str,
+        fn: Callable[[], Any],
+        priority: int = INTERACTIVE,
+        deadline: Optional[Deadline] = None,
+    ) -> Any:
+        """
+        Runs `fn` (a provider call for `model`) through the scheduler and returns its result.
+        With a `deadline`, gives up (DeadlineExceeded) instead of queueing, rate limiting or backing off
+        past it; `fn` is called anew per attempt, so it can derive the attempt's timeout from `deadline`.
+        """
+        stats = self._metrics[model]
+        attempt = 0
+        while True:
+            throttled = self._bucket(model).take(deadline)
+            queued = self._acquire(priority, deadline)
+            try:
+                stats["wait_seconds"] += queued + throttled
+                stats["calls"] += 1
+                start = time.monotonic()
+                result = fn()
+                stats["latency_seconds"] += time.monotonic() - start
+                return result
+            except Exception as e:
+                delay = self._retry_delay(model, e, attempt, deadline)
+            finally:
+                self._release()
+                self._publish_metrics()
+            attempt += 1
+            time.sleep(delay)
+
+    async def acall(
+        self,
+        model: str,
+        fn: Callable[[], Any],
+        priority: int = INTERACTIVE,
+        deadline: Optional[Deadline] = None,
+    ) -> Any:
+        """
+        Async variant of `call`: rate limiting, queueing and backoff wait on the event loop, and only
+        `fn` runs in a thread, so waiting callers hold no executor threads.
+        """
+        stats = self._metrics[model]
+        attempt = 0
+        while True:
+            throttled = await self._bucket(model).atake(deadline)
+            queued = await self._aacquire(priority, deadline)
+            try:
+                stats["wait_seconds"] += queued + throttled
+                stats["calls"] += 1
+                start = time.monotonic()
+                result = await asyncio.to_thread(fn)
+                stats["latency_seconds"] += time.monotonic() - start
+                return result
+            except Exception as e:
+                delay = self._retry_delay(model, e, attempt, deadline)
+            finally:
+                self._release()
+                self._publish_metrics()
+            attempt += 1
+            await asyncio.sleep(delay)
+
+    def metrics(self) -> dict:
+        with self._cond:
+            active, queued = self._active, len(self._queue)
+        return {
+            "active": active,
+            "queued": queued,
+            "models": {model: dict(stats) for model, stats in self._metrics.items()},
+        }
+
+    def publish_metrics(self) -> None:
+        """
+        Writes the counters gathered since the last publish as CloudWatch Embedded Metric Format lines:
+        one per model with the Model dimension, and one with the active and queued calls.
+        """
+        snapshot = self.metrics()
+        timestamp = int(time.time() * 1000)
+        for model, stats in snapshot["models"].items():
+            previous = self._published.get(model, {})
+            values = {name: stats.get(name, 0.0) - previous.get(name, 0.0) for name in METRIC_UNITS}
+            self._published[model] = stats
+            emit_emf(timestamp, {"Model": model}, values)
+        emit_emf(timestamp, {}, {"active": snapshot["active"], "queued": snapshot["queued"]})
+
+    # --- Internals
+    def _retry_delay(self, model: str, e: Exception, attempt: int, deadline: Optional[Deadline]) -> float:
+        # Re-raises `e` unless it is retryable within the retry budget and deadline; returns the backoff
+        stats = self._metrics[model]
+        if not is_retryable(e) or attempt >= self.max_retries:
+            stats["failures"] += 1
+            raise e
+        if get_status(e) == 429:
+            stats["throttled"] += 1
+        stats["retries"] += 1
+        delay = retry_hint(e) or backoff_delay(attempt)
+        self._bucket(model).pause(delay)
+        if deadline is not None and deadline.expired(reserve=delay):
+            stats["failures"] += 1
+            raise DeadlineExceeded(f"[Scheduler] No time left to retry {model}") from e
+        logger.warning(f"[Scheduler] {model} attempt {attempt + 1} failed ({e}); retrying in {delay:.1f}s")
+        return delay
+
+    def _publish_metrics(self) -> None:
+        if self.metrics_interval <= 0:
+            return
+        with self._cond:
+            now = time.monotonic()
+            if now - self._published_at < self.metrics_interval:
+                return
+            self._published_at = now
+        try:
+            self.publish_metrics()
+        except Exception as e:
+            logger.warning(f"[Scheduler] Could not publish metrics: {e}")
+
+    def _bucket(self, model: str) -> TokenBucket:
+        bucket = self._buckets.get(model)
+        if bucket is None:
+            with self._cond:
+                bucket = self._buckets.setdefault(
+                    model, TokenBucket(self.rate_limits.get(model, self.default_rpm))
+                )
+        return bucket
+
+    def _acquire(self, priority: int, deadline: Optional[Deadline] = None) -> float:
+        start = time.monotonic()
+        entry = (priority, next(self._seq))
+        with self._cond:
+            heapq.heappush(self._queue, entry)
+            while self._active >= self.max_concurrency or self._queue[0] != entry:
+                if deadline is not None and deadline.expired():
+                    self._queue.remove(entry)
+                    heapq.heapify(self._queue)
+                    self._notify()
+                    raise DeadlineExceeded("[Scheduler] Deadline passed while queued")
+                self._cond.wait(timeout=deadline.remaining() if deadline is not None else None)
+            heapq.heappop(self._queue)
+            self._active += 1
+            # The next queued caller may fit too
+            self._notify()
+        return time.monotonic() - start
+
+    async def _aacquire(self, priority: int, deadline: Optional[Deadline] = None) -> float:
+        # Same admission as _acquire, but the caller waits on an asyncio.Event set by _notify
+        start = time.monotonic()
+        entry = (priority, next(self._seq))
+        wakeup = asyncio.Event()
+        with self._cond:
+            heapq.heappush(self._queue, entry)
+            self._async_waiters[entry] = (asyncio.get_running_loop(), wakeup)
+        try:
+            while True:
+                with self._cond:
+                    if self._active < self.max_concurrency and self._queue[0] == entry:
+                        heapq.heappop(self._queue)
+                        del self._async_waiters[entry]
+                        self._active += 1
+                        self._notify()
+                        return time.monotonic() - start
+                    wakeup.clear()
+                if deadline is not None and deadline.expired():
+                    raise DeadlineExceeded("[Scheduler] Deadline passed while queued")
+                try:
+                    await asyncio.wait_for(
+                        wakeup.wait(), timeout=deadline.remaining() if deadline is not None else None
+                    )
+                except asyncio.TimeoutError:
+                    pass
+        except BaseException:
+            # Deadline or cancellation: leave the queue without blocking the callers behind
+            with self._cond:
+                if entry in self._async_waiters:
+                    del self._async_waiters[entry]
+                    self._queue.remove(entry)
+                    heapq.heapify(self._queue)
+                    self._notify()
+            raise
+
+    def _release(self) -> None:
+        with self._cond:
+            self._active -= 1
+            self._notify()
+
+    def _notify(self) -> None:
+        # Wakes queued sync and async callers; called with self._cond held
+        self._cond.notify_all()
+        for loop, wakeup in self._async_waiters.values():
+            loop.call_soon_threadsafe(wakeup.set)
+
+
+def emit_emf(timestamp: int, dimensions: Dict[str, str], values: Dict[str, float]) -> None:
+    """
+    Prints one CloudWatch Embedded Metric Format record; Lambda ships stdout to CloudWatch Logs,
+    which extracts the metrics.
+    """
+    record = {
+        "_aws": {
+            "Timestamp": timestamp,
+            "CloudWatchMetrics": [{
+                "Namespace": LLM_METRICS_NAMESPACE,
+                "Dimensions": [list(dimensions)],
+                "Metrics": [{"Name": name, "Unit": METRIC_UNITS.get(name, "Count")} for name in values],
+            }],
+        },
+        **dimensions,
+        **values,
+    }
+    print(json.dumps(record), flush=True)
+
+
+def get_status(e: Exception) -> Optional[int]:
+    if isinstance(e, genai_errors.APIError):
+        return e.code
+    if isinstance(e, requests.HTTPError) and e.response is not None:
+        return e.response.status_code
+    return None
+
+
+def is_retryable(e: Exception) -> bool:
+    if isinstance(e, (requests.Timeout, requests.ConnectionError, httpx.TimeoutException, httpx.NetworkError)):
+        return True
+    return get_status(e) in RETRYABLE_STATUS
+
+
+def retry_hint(e: Exception) -> Optional[float]:
+    """
+    Extracts the provider's suggested delay from a Retry-After header or a google.rpc.RetryInfo detail.
+    """
+    response = getattr(e, "response", None)
+    headers = getattr(response, "headers", None) or {}
+    retry_after = headers.get("retry-after") or headers.get("Retry-After")
+    if retry_after:
+        try:
+            return min(float(retry_after), MAX_DELAY_SECONDS)
+        except ValueError:
+            pass
+
+    details = getattr(e, "details", None)
+    if isinstance(details, dict):
+        for detail in details.get("error", {}).get("details", []) or []:
+            match = re.match(r"^([\d.]+)s$", str(detail.get("retryDelay", "")))
+            if match:
+                return min(float(match.group(1)), MAX_DELAY_SECONDS)
+    return None
+
+
+def backoff_delay(attempt: int) -> float:
+    # Half fixed, half jittered: always backs off, without retrying callers synchronizing
+    delay = min(MAX_DELAY_SECONDS, BASE_DELAY_SECONDS * (2 ** attempt))
+    return delay / 2 + random.uniform(0, delay / 2)
+
+
+# Shared by every outbound Gemini / embedding call
+llm_scheduler = RateScheduler()
@@ -0,0 +1,62 @@
+import re
+from typing import List, Optional
+
+# Sections are (start, end) character offsets into the markdown document, covering it end to end
+HEADING_PATTERN = re.compile(r"^#{1,6}\s")
+
+# Long chunks rarely appear verbatim (whitespace is normalized at ingestion), so only their ends are located
+ANCHOR_CHARS = 200
+
+
+def split_sections(markdown: str) -> List[tuple[int, int]]:
+    """
+    Splits a markdown document into addressable sections: each heading starts a section, and so does
+    every further table under the same heading. Text before the first heading is a section of its own.
+    """
+    starts = [0]
+    has_table = False
+    in_table = False
+    offset = 0
+    for line in markdown.splitlines(keepends=True):
+        stripped = line.lstrip()
+        is_table = stripped.startswith("|")
+        if HEADING_PATTERN.match(stripped):
+            if offset > starts[-1]:
+                starts.append(offset)
+            has_table = False
+        elif is_table and not in_table:
+            if has_table and offset > starts[-1]:
+                starts.append(offset)
+            has_table = True
+        in_table = is_table
+        offset += len(line)
+
+    return [(start, end) for start, end in zip(starts, starts[1:] + [len(markdown)]) if end > start]
+
+
+def locate_chunk(markdown: str, chunk: Optional[str]) -> Optional[tuple[int, int]]:
+    """
+    Finds the span of a retrieval chunk in its document: the whole chunk when it appears verbatim,
+    otherwise from its beginning to its end. None when the chunk cannot be found.
+    """
+    chunk = (chunk or "").strip()
+    if not chunk:
+        return None
+    start = markdown.find(chunk)
+    if start >= 0:
+        return start, start + len(chunk)
+
+    start = markdown.find(chunk[:ANCHOR_CHARS])
+    if start < 0:
+        return None
+    tail = chunk[-ANCHOR_CHARS:]
+    end = markdown.find(tail, start)
+    return start, (end + len(tail) if end >= 0 else start + len(chunk[:ANCHOR_CHARS]))
+
+
+def matched_sections(sections: List[tuple[int, int]], span: tuple[int, int]) -> List[int]:
+    """
+    Indexes of the sections overlapping `span`.
+    """
+    start, end = span
+    return [i for i, (s, e) in enumerate(sections) if s < end and e > start]
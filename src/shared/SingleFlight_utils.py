@@ -0,0 +1,40 @@
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Dict
+
+# Set up basic logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls sharing a key into one in-flight execution.
+
+    The first caller for a key runs the work as a task; callers arriving while it is still
+    running await the same task instead of repeating the work. The key is forgotten as soon
+    as the task finishes, so later calls run again.
+    """
+
+    def __init__(self, name: str = "SingleFlight"):
+        self.name = name
+        self._inflight: Dict[str, asyncio.Task] = {}
+        self.calls = 0
+        self.shared = 0
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Any:
+        self.calls += 1
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(fn())
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        else:
+            self.shared += 1
+            logger.info(f"[{self.name}] Joined in-flight call {key[:12]}")
+
+        # Shield so one cancelled caller does not cancel the work the others are waiting on
+        return await asyncio.shield(task)
+
+    def in_flight(self) -> int:
+        return len(self._inflight)
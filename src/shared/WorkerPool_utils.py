@@ -0,0 +1,68 @@
+import asyncio
+import logging
+import multiprocessing
+import threading
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from functools import partial
+from typing import Any, Callable, Optional
+
+# Set up basic logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+class WorkerPool:
+    """
+    Lazily started process pool for CPU-bound work (PDF text extraction, image re-encoding).
+
+    Workers are spawned, not forked, so they never inherit the server's threads or open clients;
+    functions run here must be importable module-level functions with picklable arguments.
+    Where processes are unavailable (e.g. AWS Lambda has no /dev/shm for multiprocessing
+    semaphores) the pool falls back to a thread pool, so callers never need a second code path.
+    """
+
+    def __init__(self, name: str, max_workers: int):
+        self.name = name
+        self.max_workers = max(1, max_workers)
+        self._executor: Optional[Executor] = None
+        self._lock = threading.Lock()
+
+    async def run(self, fn: Callable[..., Any], *args) -> Any:
+        executor = self._get_executor()
+        loop = asyncio.get_running_loop()
+        try:
+            return await loop.run_in_executor(executor, partial(fn, *args))
+        except BrokenProcessPool as e:
+            # A worker died (e.g. out of memory): start a fresh pool next time, finish this call in a thread
+            logger.warning(f"[Worker Pool] {self.name} process pool broke ({e}); restarting it")
+            self._reset(executor)
+            return await asyncio.to_thread(fn, *args)
+
+    def shutdown(self) -> None:
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def _get_executor(self) -> Executor:
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    try:
+                        self._executor = ProcessPoolExecutor(
+                            max_workers=self.max_workers,
+                            mp_context=multiprocessing.get_context("spawn"),
+                        )
+                    except (OSError, NotImplementedError, ImportError) as e:
+                        logger.warning(f"[Worker Pool] {self.name} processes unavailable ({e}); using threads")
+                        self._executor = ThreadPoolExecutor(
+                            max_workers=self.max_workers, thread_name_prefix=self.name
+                        )
+        return self._executor
+
+    def _reset(self, broken: Executor) -> None:
+        with self._lock:
+            if self._executor is broken:
+                self._executor = None
+        broken.shutdown(wait=False, cancel_futures=True)
@@ -1,43 +1,148 @@
+import asyncio
+import hashlib
 import logging
+import time
+import httpx
 import jwt
-import requests
-from typing import Dict, Optional
-from datetime import datetime, timedelta
+from typing import Annotated, Dict, Optional
 from jwt.algorithms import RSAAlgorithm
-from fastapi import HTTPException
-from src.core.config import COGNITO_REGION, COGNITO_CLIENT_ID, USER_POOL_ID
+from fastapi import Cookie, Depends, HTTPException, Request
+from src.core.config import (
+  COGNITO_REGION,
+  COGNITO_CLIENT_ID,
+  USER_POOL_ID,
+  VERIFIED_TOKEN_CACHE_SIZE,
+  JWKS_CACHE_SECONDS,
+  JWKS_REFRESH_AHEAD_SECONDS,
+  JWKS_MIN_REFRESH_SECONDS,
+)
+from src.shared.Cache_utils import TTLCache
+from src.shared.SingleFlight_utils import SingleFlight
+
+logger = logging.getLogger(__name__)
 
 
 COGNITO_ISSUER = f"https://cognito-idp.{COGNITO_REGION}.amazonaws.com/{USER_POOL_ID}"
 JWKS_URL = f"{COGNITO_ISSUER}/.well-known/jwks.json"
+JWKS_TIMEOUT_SECONDS = 10
 
-_jwks_cache: Optional[Dict] = None
-_jwks_cache_time: Optional[datetime] = None
-JWKS_CACHE_DURATION = timedelta(hours=24)
 
-
-def get_jwks() -> Dict:
-  global _jwks_cache, _jwks_cache_time
-
-  now = datetime.now()
-
-  if _jwks_cache and _jwks_cache_time:
-    if now - _jwks_cache_time < JWKS_CACHE_DURATION:
-      return _jwks_cache
-
-  try:
-    response = requests.get(JWKS_URL, timeout=10)
-    response.raise_for_status()
-    _jwks_cache = response.json()
-    _jwks_cache_time = now
-    return _jwks_cache
-  except requests.RequestException as e:
-    if _jwks_cache:
-      return _jwks_cache
-    raise HTTPException(status_code=500, detail=f"Failed to fetch JWKS: {str(e)}")
-
-
-def get_public_key(token: str) -> str:
+def parse_public_keys(jwks: Dict) -> Dict[str, object]:
+  """
+  Parses the RSA public keys of a JWKS once, by kid; keys that fail to parse are skipped.
+  """
+  keys = {}
+  for key in jwks.get("keys", []):
+    kid = key.get("kid")
+    if not kid:
+      continue
+    try:
+      keys[kid] = RSAAlgorithm.from_jwk(key)
+    except (jwt.InvalidKeyError, ValueError, KeyError) as e:
+      logger.warning(f"[JWT auth] Skipping JWK {kid}: {e}")
+  return keys
+
+
+class JWKSManager:
+  """
+  Keeps the parsed public keys of a JWKS endpoint without blocking requests on the network.
+
+  - Keys are refreshed in the background once they are older than `max_age - refresh_ahead`;
+    only past `max_age` (or before the first fetch) does a request wait for the refresh.
+  - Concurrent refreshes share one fetch.
+  - A token signed with an unknown kid (key rotation) triggers a refresh, at most once per `min_refresh_interval`.
+  - A failed refresh keeps serving the previous keys.
+  """
+
+  def __init__(
+    self,
+    url: str,
+    max_age: float = JWKS_CACHE_SECONDS,
+    refresh_ahead: float = JWKS_REFRESH_AHEAD_SECONDS,
+    min_refresh_interval: float = JWKS_MIN_REFRESH_SECONDS,
+    transport: Optional[httpx.AsyncBaseTransport] = None,
+  ):
+    self.url = url
+    self.max_age = max_age
+    self.refresh_ahead = refresh_ahead
+    self.min_refresh_interval = min_refresh_interval
+    self.transport = transport  # e.g. httpx.MockTransport serving a local JWKS in tests
+    self.keys: Dict[str, object] = {}
+    self.fetched_at: Optional[float] = None
+    self.last_attempt: Optional[float] = None
+    self.refreshes = 0
+    self._flight = SingleFlight("JWKS")
+    self._background: Optional[asyncio.Task] = None
+
+  def age(self) -> float:
+    return float("inf") if self.fetched_at is None else time.monotonic() - self.fetched_at
+
+  async def refresh(self) -> Dict[str, object]:
+    return await self._flight.do("jwks", self._fetch)
+
+  async def prefetch(self) -> None:
+    """
+    Fetches the keys once, logging instead of raising on failure. Starts no task that outlives the
+    call, so it can run on a throwaway loop (asyncio.run) at import time.
+    """
+    try:
+      await self.refresh()
+    except HTTPException as e:
+      logger.warning(f"[JWT auth] JWKS prefetch failed: {e.detail}")
+
+  async def get_key(self, kid: str):
+    age = self.age()
+    # Past max_age, wait for a refresh unless one just failed and stale keys are still available
+    if age >= self.max_age and (not self.keys or self._may_refresh()):
+      await self.refresh()
+    elif age >= self.max_age - self.refresh_ahead and self._background is None and self._may_refresh():
+      self._background = asyncio.ensure_future(self._refresh_in_background())
+
+    key = self.keys.get(kid)
+    if key is None and self._may_refresh():
+      logger.info(f"[JWT auth] Unknown kid {kid}; refreshing JWKS")
+      await self.refresh()
+      key = self.keys.get(kid)
+    return key
+
+  def _may_refresh(self) -> bool:
+    return self.last_attempt is None or time.monotonic() - self.last_attempt >= self.min_refresh_interval
+
+  async def _refresh_in_background(self) -> None:
+    try:
+      await self.refresh()
+    except HTTPException as e:
+      logger.warning(f"[JWT auth] Background JWKS refresh failed: {e.detail}")
+    finally:
+      self._background = None
+
+  async def _fetch(self) -> Dict[str, object]:
+    self.last_attempt = time.monotonic()
+    try:
+      async with httpx.AsyncClient(timeout=JWKS_TIMEOUT_SECONDS, transport=self.transport) as client:
+        response = await client.get(self.url)
+        response.raise_for_status()
+        keys = parse_public_keys(response.json())
+    except (httpx.HTTPError, ValueError) as e:
+      if self.keys:
+        logger.warning(f"[JWT auth] JWKS refresh failed, keeping {len(self.keys)} cached key(s): {e}")
+        return self.keys
+      raise HTTPException(status_code=500, detail=f"Failed to fetch JWKS: {str(e)}")
+
+    self.keys = keys
+    self.fetched_at = time.monotonic()
+    self.refreshes += 1
+    logger.info(f"[JWT auth] Refreshed JWKS: {len(keys)} key(s)")
+    return keys
+
+
+jwks_manager = JWKSManager(JWKS_URL)
+
+# sha256(token) -> verified claims, each kept until the token's exp
+verified_tokens = TTLCache(VERIFIED_TOKEN_CACHE_SIZE)
+
+
+async def get_public_key(token: str):
   try:
     header = jwt.get_unverified_header(token)
     kid = header.get("kid")
@@ -45,11 +150,9 @@ def get_public_key(token: str) -> str:
     if not kid:
       raise HTTPException(status_code=401, detail="Token header missing 'kid'")
 
-    jwks = get_jwks()
-
-    for key in jwks.get("keys", []):
-      if key.get("kid") == kid:
-        return RSAAlgorithm.from_jwk(key)
+    public_key = await jwks_manager.get_key(kid)
+    if public_key is not None:
+      return public_key
 
     raise HTTPException(status_code=401, detail="Public key not found in JWKS")
 
@@ -57,9 +160,24 @@ def get_public_key(token: str) -> str:
     raise HTTPException(status_code=401, detail=f"Invalid token format: {str(e)}")
 
 
-def verify_session_token(access_token: str) -> Dict:
+def token_cache_key(access_token: str) -> str:
+  return hashlib.sha256(access_token.encode("utf-8")).hexdigest()
+
+
+async def verify_session_token(access_token: str) -> Dict:
+  """
+  Verifies a Cognito access token and returns its claims.
+
+  Verified tokens are cached by hash until they expire, so repeated requests with the same
+  token skip the signature check.
+  """
+  cache_key = token_cache_key(access_token)
+  cached = verified_tokens.get(cache_key)
+  if cached is not None:
+    return dict(cached)
+
   try:
-    public_key = get_public_key(access_token)
+    public_key = await get_public_key(access_token)
 
     decoded = jwt.decode(
       access_token,
@@ -80,8 +198,9 @@ def verify_session_token(access_token: str) -> Dict:
     if COGNITO_CLIENT_ID and decoded.get("client_id") != COGNITO_CLIENT_ID:
       raise HTTPException(status_code=401, detail="Invalid client_id in token")
 
-    logging.info(decoded)
-    return decoded
+    logger.debug(f"[JWT auth] Verified token claims: {decoded}")
+    verified_tokens.set(cache_key, decoded, ttl_seconds=decoded["exp"] - time.time())
+    return dict(decoded)
 
   except jwt.ExpiredSignatureError:
     raise HTTPException(status_code=401, detail="Token has expired")
@@ -93,3 +212,25 @@ def verify_session_token(access_token: str) -> Dict:
     raise HTTPException(
       status_code=500, detail=f"Failed to decode access_token: {str(e)}"
     )
+
+
+async def get_current_user(
+  request: Request,
+  access_token: Optional[str] = Cookie(None, include_in_schema=False),
+) -> Dict:
+  """
+  Resolves the access_token cookie to its verified claims, once per request: FastAPI caches the
+  dependency for the request, and the claims are also kept on `request.state.user`.
+  """
+  if not access_token:
+    raise HTTPException(status_code=401, detail="access_token not found in cookies")
+
+  started = time.perf_counter()
+  claims = await verify_session_token(access_token)
+  request.state.user = claims
+  logger.debug(f"[JWT auth] Authenticated {claims['sub']} in {(time.perf_counter() - started) * 1000:.2f} ms")
+  return claims
+
+
+# Claims of the authenticated user, for route signatures: `user: CurrentUser`
+CurrentUser = Annotated[Dict, Depends(get_current_user)]
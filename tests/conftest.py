@@ -0,0 +1,42 @@
+# tests/conftest.py
+import io
+import os
+import pytest
+from fastapi import UploadFile
+from unittest.mock import Mock, patch
+
+# Set environment variables before importing our module
+os.environ.setdefault('GEMINI_API_KEY', 'fake-api-key')
+
+from src.modules.chatbot.lib import attachment_parser as parser
+
+@pytest.fixture
+def make_upload():
+    """Builds in-memory UploadFile stand-ins"""
+    def make(content: bytes, filename="drawing.pdf", content_type="application/pdf"):
+        mock_file = Mock(spec=UploadFile)
+        mock_file.filename = filename
+        mock_file.content_type = content_type
+        mock_file.file = io.BytesIO(content)
+        return mock_file
+    return make
+
+@pytest.fixture(autouse=True)
+def clear_caches():
+    """Content-addressed attachment caches must not leak between tests"""
+    parser.gemini_file_cache.clear()
+    parser.description_cache.clear()
+    yield
+
+@pytest.fixture
+def mock_genai_client():
+    """Gemini client of the attachment parser: uploads return a file, extraction returns one description"""
+    with patch.object(parser.genai, "Client") as mock_client_class:
+        mock_client = mock_client_class.return_value
+        mock_file = Mock()
+        mock_file.name = "files/uploaded"
+        mock_client.files.upload = Mock(return_value=mock_file)
+        mock_response = Mock()
+        mock_response.text = '["M6 x 20 socket head cap screw"]'
+        mock_client.models.generate_content = Mock(return_value=mock_response)
+        yield mock_client
@@ -0,0 +1,62 @@
+# tests/test_attachment_cache.py
+import os
+import pytest
+from unittest.mock import patch
+
+# Set environment variables before importing our module
+os.environ.setdefault('GEMINI_API_KEY', 'fake-api-key')
+
+from src.shared.Cache_utils import TTLCache
+from src.modules.chatbot.lib import attachment_parser as parser
+
+def test_ttl_cache_expires_and_evicts():
+    """Entries expire after their TTL and the least recently used entry is evicted first"""
+    cache = TTLCache(max_entries=2, ttl_seconds=60)
+    with patch("src.shared.Cache_utils.time.monotonic", return_value=0):
+        cache.set("a", 1)
+        cache.set("b", 2)
+        cache.get("a")
+        cache.set("c", 3)
+        cache.set("short", 4, ttl_seconds=0)  # Not stored
+
+    with patch("src.shared.Cache_utils.time.monotonic", return_value=30):
+        assert cache.get("a") == 1
+        assert cache.get("b") is None
+        assert cache.get("short") is None
+    with patch("src.shared.Cache_utils.time.monotonic", return_value=61):
+        assert cache.get("c") is None
+
+def test_content_hash_depends_on_bytes_and_type_only(make_upload):
+    """Same bytes and type under another filename hash the same; streams are rewound"""
+    upload = make_upload(b"drawing bytes")
+
+    digest = parser.content_hash(upload)
+
+    assert upload.file.read() == b"drawing bytes"
+    assert digest == parser.content_hash(make_upload(b"drawing bytes", filename="copy.pdf"))
+    assert digest != parser.content_hash(make_upload(b"drawing bytes", content_type="image/png"))
+    assert digest != parser.content_hash(make_upload(b"other bytes"))
+
+@pytest.mark.asyncio
+async def test_repeated_attachments_skip_upload_and_extraction(tmp_path, mock_genai_client, make_upload):
+    """The same attachment sent again reuses the extracted description without calling Gemini"""
+    first = await parser.attachments_parser([make_upload(b"drawing bytes")], file_dir=str(tmp_path))
+    second = await parser.attachments_parser(
+        [make_upload(b"drawing bytes", filename="renamed.pdf")], file_dir=str(tmp_path)
+    )
+
+    assert first == second
+    assert mock_genai_client.files.upload.call_count == 1
+    assert mock_genai_client.models.generate_content.call_count == 1
+
+@pytest.mark.asyncio
+async def test_uploaded_file_is_reused_for_new_attachment_sets(tmp_path, mock_genai_client, make_upload):
+    """A known attachment in a new combination is not uploaded again"""
+    await parser.attachments_parser([make_upload(b"drawing bytes")], file_dir=str(tmp_path))
+    await parser.attachments_parser(
+        [make_upload(b"drawing bytes"), make_upload(b"photo bytes", "photo.png", "image/png")],
+        file_dir=str(tmp_path),
+    )
+
+    assert mock_genai_client.files.upload.call_count == 2
+    assert mock_genai_client.models.generate_content.call_count == 2
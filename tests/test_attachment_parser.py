@@ -1,7 +1,9 @@
 # test_attachment_parser.py
+import io
 import pytest
 from fastapi import UploadFile
 import os
+import openpyxl
 from unittest.mock import Mock, patch
 
 # First import google.genai normally
@@ -12,7 +14,7 @@ os.environ['GEMINI_API_KEY'] = 'fake-api-key'
 os.environ['GEMINI_MODEL'] = 'fake-model'
 
 # Now import our module
-from src.lib.attachment_parser import attachment_parser, attachments_parser
+from src.modules.chatbot.lib.attachment_parser import attachment_parser, attachments_parser
 
 # Test data directory
 TEST_DATA_DIR = "test_data"
@@ -33,7 +35,7 @@ def mock_genai_client():
         
         # Mock content generation
         mock_response = Mock()
-        mock_response.text = "Generated description"
+        mock_response.text = '["M8 HEX nut, 1000 pcs"]'
         mock_client.models.generate_content = Mock(return_value=mock_response)
         
         yield mock_client
@@ -54,8 +56,13 @@ def mock_excel_file():
     mock_file = Mock(spec=UploadFile)
     mock_file.filename = "test.xlsx"
     mock_file.content_type = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
-    mock_file.file = Mock()
-    mock_file.file.read.return_value = b"mock excel content"
+    workbook = openpyxl.Workbook()
+    workbook.active.append(["data"])
+    workbook.active.append(["test"])
+    buffer = io.BytesIO()
+    workbook.save(buffer)
+    buffer.seek(0)
+    mock_file.file = buffer
     return mock_file
 
 @pytest.fixture
@@ -64,23 +71,18 @@ def mock_pdf_file():
     mock_file = Mock(spec=UploadFile)
     mock_file.filename = "test.pdf"
     mock_file.content_type = "application/pdf"
-    mock_file.file = Mock()
-    mock_file.file.read.return_value = b"mock pdf content"
+    mock_file.file = io.BytesIO(b"mock pdf content")
     return mock_file
 
 @pytest.mark.asyncio
 async def test_attachment_parser_excel(setup_test_env, mock_excel_file, mock_genai_client):
     """Test parsing Excel file"""
-    with patch('pandas.read_excel') as mock_read_excel:
-        mock_df = Mock()
-        mock_df.to_json.return_value = '{"data": "test"}'
-        mock_read_excel.return_value = mock_df
-        
-        content, file_type = await attachment_parser(mock_excel_file, TEST_DATA_DIR)
-        
-        assert file_type == "sheet"
-        assert content.startswith("Sheet Content: ")
-        assert "test" in content
+    content, file_type = await attachment_parser(mock_excel_file, TEST_DATA_DIR)
+    
+    assert file_type == "sheet"
+    assert content.startswith("Sheet Content:\n")
+    assert "row\tdata\n2\ttest" in content
+    mock_genai_client.files.upload.assert_not_called()
 
 @pytest.mark.asyncio
 async def test_attachment_parser_pdf(setup_test_env, mock_pdf_file, mock_genai_client):
@@ -88,7 +90,7 @@ async def test_attachment_parser_pdf(setup_test_env, mock_pdf_file, mock_genai_c
     content, file_type = await attachment_parser(mock_pdf_file, TEST_DATA_DIR)
     
     assert file_type == "file"
-    assert content == "mock_gemini_file"
+    assert content.name == "mock_gemini_file"
     mock_genai_client.files.upload.assert_called_once()
 
 @pytest.mark.asyncio
@@ -107,15 +109,11 @@ async def test_attachment_parser_unsupported_file(setup_test_env, mock_genai_cli
 @pytest.mark.asyncio
 async def test_attachments_parser_multiple_files(setup_test_env, mock_excel_file, mock_pdf_file, mock_genai_client):
     """Test parsing multiple attachments"""
-    with patch('pandas.read_excel') as mock_read_excel:
-        mock_df = Mock()
-        mock_df.to_json.return_value = '{"data": "test"}'
-        mock_read_excel.return_value = mock_df
-        
-        description = await attachments_parser(
-            attachments=[mock_excel_file, mock_pdf_file],
-            file_dir=TEST_DATA_DIR
-        )
-        
-        assert description == "Generated description"
-        assert mock_genai_client.models.generate_content.called
+    description = await attachments_parser(
+        attachments=[mock_excel_file, mock_pdf_file],
+        file_dir=TEST_DATA_DIR
+    )
+    
+    assert description == ["M8 HEX nut, 1000 pcs"]
+    assert mock_genai_client.models.generate_content.called
+    mock_genai_client.files.get.assert_not_called()
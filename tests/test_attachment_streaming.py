@@ -0,0 +1,62 @@
+# tests/test_attachment_streaming.py
+import io
+import os
+import openpyxl
+import pytest
+from fastapi import HTTPException
+from unittest.mock import Mock, patch
+
+# Set environment variables before importing our module
+os.environ.setdefault('GEMINI_API_KEY', 'fake-api-key')
+
+from src.modules.chatbot.lib import attachment_parser as parser
+
+@pytest.mark.asyncio
+async def test_uploads_stream_from_the_request_without_local_copies(tmp_path, mock_genai_client, make_upload):
+    """PDFs are uploaded from the request stream and the scratch directory is removed afterwards"""
+    uploaded = []
+
+    def upload(file, config):
+        uploaded.append((file.read(), config.mime_type))
+        gemini_file = Mock()
+        gemini_file.name = "files/drawing"
+        return gemini_file
+
+    mock_genai_client.files.upload = Mock(side_effect=upload)
+
+    await parser.attachments_parser([make_upload(b"drawing bytes")], file_dir=str(tmp_path))
+
+    assert uploaded == [(b"drawing bytes", "application/pdf")]
+    assert list(tmp_path.iterdir()) == []
+
+@pytest.mark.asyncio
+async def test_scratch_directory_is_removed_when_parsing_fails(tmp_path, mock_genai_client, make_upload):
+    """Spreadsheet copies are cleaned up even if the extraction call fails"""
+    mock_genai_client.models.generate_content = Mock(side_effect=ValueError("boom"))
+    workbook = openpyxl.Workbook()
+    workbook.active.append(["Part No"])
+    workbook.active.append(["A-100"])
+    buffer = io.BytesIO()
+    workbook.save(buffer)
+    sheet = make_upload(
+        buffer.getvalue(), "bom.xlsx",
+        "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+    )
+
+    with pytest.raises(RuntimeError):
+        await parser.attachments_parser([sheet], file_dir=str(tmp_path))
+
+    assert list(tmp_path.iterdir()) == []
+
+def test_check_attachment_sizes_rejects_oversized_uploads(make_upload):
+    """Single and total size limits answer 413 without reading the uploads"""
+    with patch.object(parser, "MAX_ATTACHMENT_BYTES", 10), patch.object(parser, "MAX_ATTACHMENTS_TOTAL_BYTES", 15):
+        parser.check_attachment_sizes([make_upload(b"x" * 10)])
+
+        with pytest.raises(HTTPException) as single:
+            parser.check_attachment_sizes([make_upload(b"x" * 11)])
+        with pytest.raises(HTTPException) as total:
+            parser.check_attachment_sizes([make_upload(b"x" * 8), make_upload(b"x" * 8)])
+
+    assert single.value.status_code == 413
+    assert total.value.status_code == 413
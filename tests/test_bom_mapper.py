@@ -0,0 +1,74 @@
+# tests/test_bom_mapper.py
+import os
+import pytest
+import openpyxl
+
+# Set environment variables before importing our module
+os.environ.setdefault('GEMINI_API_KEY', 'fake-api-key')
+
+from src.modules.chatbot.lib.bom_mapper import map_bom_sheet, map_columns, normalize_header
+from src.modules.chatbot.lib.spreadsheet_reader import Sheet
+from src.modules.chatbot.lib import attachment_parser as parser
+
+def bom_sheet(header, rows):
+    return Sheet("BOM", header, [(number, cells) for number, cells in enumerate(rows, start=2)])
+
+def test_normalize_header_strips_units_and_punctuation():
+    assert normalize_header("Qty (pcs)") == "qty"
+    assert normalize_header("Part No.") == "part no"
+    assert normalize_header("P/N") == normalize_header("p/n") == "p n"
+
+def test_map_columns_prefers_exact_synonyms():
+    """Each field gets its best column; a column is used once"""
+    mapping = map_columns(["Item", "Part Description", "Customer Part No", "Qty (pcs)", "Plating", "Remarks"])
+
+    assert mapping.columns == {
+        "description": 1, "quantity": 3, "finish": 4, "part_number": 2,
+    }
+    assert 0.6 < mapping.scores["part_number"] < 1
+
+def test_well_formed_bom_is_described_locally():
+    """Every line with an identity becomes one string with all details in column order"""
+    sheet = bom_sheet(
+        ["P/N", "Description", "Size", "Material", "Finish", "Qty", "Notes"],
+        [
+            ["A-100", "Hex bolt", "M10 x 40", "8.8", "Zinc", "100", ""],
+            ["A-101", "Flat washer", "M10", "", "Zinc", "200 pcs", "DIN 125"],
+        ],
+    )
+
+    descriptions = map_bom_sheet(sheet, min_confidence=0.8)
+
+    assert descriptions == [
+        "P/N: A-100; Description: Hex bolt; Size: M10 x 40; Material: 8.8; Finish: Zinc; Qty: 100",
+        "P/N: A-101; Description: Flat washer; Size: M10; Finish: Zinc; Qty: 200 pcs; Notes: DIN 125",
+    ]
+
+@pytest.mark.parametrize("header, rows", [
+    # No quantity column
+    (["Part No", "Description", "Size"], [["A-100", "Hex bolt", "M10"]]),
+    # Unrecognized headers
+    (["Col A", "Col B", "Col C"], [["A-100", "Hex bolt", "10"]]),
+    # Quantities that are not numbers in most rows
+    (["Part No", "Description", "Qty"], [["A-100", "Hex bolt", "see drawing"], ["A-101", "Nut", "TBD"], ["A-102", "Washer", "5"]]),
+])
+def test_low_confidence_sheets_fall_back_to_gemini(header, rows):
+    assert map_bom_sheet(bom_sheet(header, rows), min_confidence=0.8) is None
+
+def test_sheet_parts_keeps_sheet_order(tmp_path):
+    """Mapped sheets become descriptions, the others stay sheet text for Gemini"""
+    workbook = openpyxl.Workbook()
+    notes = workbook.active
+    notes.title = "Notes"
+    notes.append(["Remark"])
+    notes.append(["All parts RoHS compliant"])
+    bom = workbook.create_sheet("BOM")
+    bom.append(["Part No", "Description", "Qty"])
+    bom.append(["A-100", "Hex bolt M10 x 40", 100])
+    path = tmp_path / "bom.xlsx"
+    workbook.save(path)
+
+    parts = parser.sheet_parts(str(path), ".xlsx")
+
+    assert parts[0].startswith("Sheet Content:\n## Sheet: Notes")
+    assert parts[1] == ["Part No: A-100; Description: Hex bolt M10 x 40; Qty: 100"]
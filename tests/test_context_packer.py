@@ -0,0 +1,192 @@
+# tests/test_context_packer.py
+import os
+import threading
+import pytest
+from unittest.mock import Mock, patch
+
+# Set environment variables before importing our module
+os.environ.setdefault('GEMINI_API_KEY', 'fake-api-key')
+
+from src.core.models import History, ChatResult, ChatbotReq
+from src.modules.chatbot.lib.context_packer import (
+    pack_context,
+    excerpt_around,
+    min_packed_tokens,
+    estimate_tokens,
+    select_sections,
+    EXCERPT_MARKER,
+    TRUNCATION_MARKER,
+)
+from src.shared.IFIIndex_utils import DocumentInfo
+from src.shared.Section_utils import split_sections
+from src.modules.chatbot.service import server
+
+IFI_FILES = {
+    "IFI_small": "small table\n" * 10,  # ~30 tokens
+    "IFI_large": "".join(f"row {i} | value\n" for i in range(2000)),  # ~7.5k tokens
+    "IFI_medium": "medium table\n" * 200,  # ~650 tokens
+    "IFI_sections": "".join(f"# Part {i}\n| Size | Qty |\n| M{i} | {i} |\n" for i in range(10)),
+}
+
+@pytest.fixture(autouse=True)
+def mock_read_file_texts():
+    """Serve IFI files from memory"""
+    with patch('src.modules.chatbot.lib.context_packer.read_file_texts') as mock_read:
+        mock_read.side_effect = lambda names: {name: IFI_FILES.get(name, "") for name in names}
+        yield mock_read
+
+def make_history(i):
+    return History(query=f"question {i}", file_description="", resources=[], result=ChatResult(text=f"answer {i}"))
+
+def test_pack_context_ranks_docs_by_score():
+    """Most relevant documents are packed first and in full"""
+    docs = [("small", "IFI_small", 0.2), ("medium", "IFI_medium", 0.9)]
+
+    packed = pack_context(docs, [], "", context_budget=10000)
+
+    assert packed.included_docs == ["IFI_medium", "IFI_small"]
+    assert packed.context_text.startswith("medium table")
+    assert packed.dropped_docs == []
+
+def test_pack_context_excerpts_and_drops_least_relevant():
+    """Documents that do not fit are excerpted while budget remains, then dropped"""
+    docs = [
+        ("row 1500 | value", "IFI_large", 0.5),
+        ("medium", "IFI_medium", 0.9),
+        ("small", "IFI_small", 0.1),
+    ]
+
+    packed = pack_context(docs, [], "", context_budget=1500)
+
+    assert packed.included_docs == ["IFI_medium"]
+    assert packed.excerpted_docs == ["IFI_large"]
+    assert packed.dropped_docs == ["IFI_small"]
+    assert "row 1500 | value" in packed.context_text
+    assert estimate_tokens(packed.context_text) <= 1500 + 10
+
+def test_pack_context_reports_missing_docs_as_dropped():
+    """Missing IFI files are reported instead of silently ignored"""
+    packed = pack_context([("x", "IFI_missing", 1.0)], [], "")
+
+    assert packed.dropped_docs == ["IFI_missing"]
+    assert packed.context_text == ""
+
+def test_pack_context_caps_history_by_recency():
+    """Only the most recent history turns that fit are kept, in order"""
+    histories = [make_history(i) for i in range(50)]
+
+    packed = pack_context([], histories, "", history_budget=100)
+
+    assert packed.dropped_histories > 0
+    assert "question 49" in packed.history_text
+    assert "question 0\n" not in packed.history_text
+    assert packed.history_text.index("question 48") < packed.history_text.index("question 49")
+
+def test_pack_context_truncates_attachment():
+    """Attachment descriptions beyond the budget are truncated on a line boundary"""
+    description = "\n".join(f"M{i} HEX nut" for i in range(1000))
+
+    packed = pack_context([], [], description, attachment_budget=50)
+
+    assert packed.attachment_truncated
+    assert packed.attachment_text.endswith(TRUNCATION_MARKER)
+    assert packed.attachment_text.startswith("M0 HEX nut")
+
+def test_excerpt_around_falls_back_to_head():
+    """Without an anchor match the excerpt keeps the head of the document"""
+    document = IFI_FILES["IFI_large"]
+
+    excerpt = excerpt_around(document, "not in document", 400)
+
+    assert excerpt.startswith("row 0 | value")
+    assert excerpt.endswith(EXCERPT_MARKER)
+
+def test_pack_context_places_summary_before_recent_turns():
+    """The rolling summary leads the history section and shares its budget"""
+    histories = [make_history(i) for i in range(3)]
+
+    packed = pack_context([], histories, "", summary="User wants M8 HEX nuts", history_budget=1000)
+
+    assert packed.history_text.startswith("Summary of earlier turns:\nUser wants M8 HEX nuts")
+    assert packed.history_text.index("Recent turns:") < packed.history_text.index("question 0")
+    assert packed.dropped_histories == 0
+
+def test_pack_context_keeps_matched_sections_and_neighbours():
+    """Only the sections around the matched chunk are packed"""
+    docs = [("| M5 | 5 |", "IFI_sections", 0.9)]
+
+    packed = pack_context(docs, [], "", context_budget=10000)
+
+    assert packed.sectioned_docs == ["IFI_sections"]
+    assert "# Part 4" in packed.context_text and "# Part 6" in packed.context_text
+    assert "# Part 3" not in packed.context_text and "# Part 7" not in packed.context_text
+    assert packed.context_text.startswith(EXCERPT_MARKER)
+
+def test_select_sections_without_match_or_radius():
+    """Unmatched chunks fall back to the whole document; radius 0 keeps only the match"""
+    document = IFI_FILES["IFI_sections"]
+    sections = split_sections(document)
+
+    assert select_sections(document, sections, "not here", 1) is None
+    selected = select_sections(document, sections, "| M0 | 0 |", 0)
+    assert selected == f"# Part 0\n| Size | Qty |\n| M0 | 0 |\n{EXCERPT_MARKER}"
+
+def test_pack_context_uses_indexed_token_counts():
+    """Indexed token counts replace the character estimate"""
+    document = IFI_FILES["IFI_small"]
+    info = DocumentInfo("IFI_small", tokens=2000, size=len(document), chars=len(document), sha256="", mtime=0)
+
+    with patch.dict('src.shared.File_utils.ifi_index', {"IFI_small": info}):
+        packed = pack_context([("small", "IFI_small", 0.9)], [], "", context_budget=1000)
+
+    assert packed.included_docs == []
+    assert packed.excerpted_docs == ["IFI_small"]
+
+def indexed(name, **kwargs):
+    document = IFI_FILES[name]
+    info = dict(tokens=estimate_tokens(document), size=len(document), chars=len(document), sha256="", mtime=0)
+    info.update(kwargs)
+    return DocumentInfo(name, **info)
+
+def test_pack_context_reads_only_docs_that_can_fit(mock_read_file_texts):
+    """Size decisions come from the index: documents that cannot fit are dropped without being read"""
+    read = []
+
+    def read_file_texts(names):
+        read.extend(names)
+        return {name: IFI_FILES.get(name, "") for name in read}
+
+    mock_read_file_texts.side_effect = read_file_texts
+    index = {"IFI_medium": indexed("IFI_medium"), "IFI_large": indexed("IFI_large")}
+    docs = [("medium", "IFI_medium", 0.9), ("row 1 | value", "IFI_large", 0.5), ("small", "IFI_small", 0.1)]
+
+    with patch.dict('src.shared.File_utils.ifi_index', index):
+        packed = pack_context(docs, [], "", context_budget=1000)
+
+    assert packed.included_docs == ["IFI_medium", "IFI_small"]
+    assert packed.dropped_docs == ["IFI_large"]
+    assert read == ["IFI_medium", "IFI_small"]
+
+def test_min_packed_tokens_uses_indexed_sections():
+    """The smallest run of sections a match can keep bounds a document's cost"""
+    info = indexed("IFI_sections", tokens=1000, chars=1000, sections=[(0, 100), (100, 150), (150, 400), (400, 1000)])
+
+    assert min_packed_tokens(info, radius=1) == 150
+    assert min_packed_tokens(info, radius=0) == 50
+    assert min_packed_tokens(info, radius=-1) == 1000
+
+@pytest.mark.asyncio
+async def test_ask_gemini_packs_context_off_the_event_loop():
+    """IFI reads and section splitting run in a worker thread, not on the event loop"""
+    threads = []
+
+    def record_thread(*args, **kwargs):
+        threads.append(threading.current_thread())
+        return pack_context(*args, **kwargs)
+
+    with patch.object(server, "pack_context", side_effect=record_thread), \
+         patch.object(server.llm_scheduler, "acall", return_value=Mock(text='{"text": "ok", "email": null}')):
+        result = await server.ask_gemini([("x", "IFI_small", 1.0)], ChatbotReq(query="quote M8"), "")
+
+    assert result == {"text": "ok", "email": None}
+    assert threads and threads[0] is not threading.main_thread()
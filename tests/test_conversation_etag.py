@@ -0,0 +1,130 @@
+import os
+import pytest
+from datetime import datetime, timezone
+from unittest.mock import patch
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+# Set environment variables before importing our module
+os.environ.setdefault('GEMINI_API_KEY', 'fake-api-key')
+
+from src.modules.conversation.conversation_handler import router
+from src.modules.conversation.conversation_repository import ConversationRepository
+from src.shared.ETag_utils import etag_matches, make_etag
+from src.shared.jwt_auth import get_current_user
+
+USER_ID = "9f1c2d3e-4b5a-4c6d-8e7f-0a1b2c3d4e5f"
+OTHER_USER_ID = "11111111-2222-4333-8444-555555555555"
+CONVERSATION_ID = "219ba1b4-2d7c-47a5-a4b0-ad6d40d0bf01"
+UPDATED_AT = datetime(2025, 10, 10, 12, 0, tzinfo=timezone.utc)
+
+CONVERSATION = {
+    "conversation_id": CONVERSATION_ID,
+    "user_id": USER_ID,
+    "title": "My First Conversation",
+    "created_at": UPDATED_AT,
+    "updated_at": UPDATED_AT,
+}
+MESSAGE = {
+    "message_id": "87af8ec5-83a4-4794-834c-d5533acee7bc",
+    "conversation_id": CONVERSATION_ID,
+    "query": "Create RFQ email",
+    "file_description": None,
+    "resources": [],
+    "result_text": "Done",
+    "email": None,
+    "attachments": [],
+    "created_at": UPDATED_AT,
+    "updated_at": UPDATED_AT,
+}
+
+@pytest.fixture
+def client():
+    app = FastAPI()
+    app.include_router(router, prefix="/api/conversation")
+    app.dependency_overrides[get_current_user] = lambda: {"sub": USER_ID}
+    return TestClient(app)
+
+@pytest.fixture
+def repository():
+    with patch.object(ConversationRepository, "get_conversations_version", return_value={"updated_at": UPDATED_AT, "count": 1}) as conversations_version, \
+         patch.object(ConversationRepository, "get_conversations_by_user", side_effect=lambda _: [dict(CONVERSATION)]) as conversations, \
+         patch.object(ConversationRepository, "get_messages_version", return_value={"user_id": USER_ID, "updated_at": UPDATED_AT, "count": 1}) as messages_version, \
+         patch.object(ConversationRepository, "check_conversation_ownership", return_value="ok"), \
+         patch.object(ConversationRepository, "get_messages_by_conversation", side_effect=lambda _: [dict(MESSAGE)]) as messages:
+        yield {
+            "conversations_version": conversations_version,
+            "conversations": conversations,
+            "messages_version": messages_version,
+            "messages": messages,
+        }
+
+def test_etag_matches():
+    etag = make_etag("a", 1)
+    assert etag.startswith('"') and etag.endswith('"')
+    assert etag == make_etag("a", 1) and etag != make_etag("a", 2)
+    assert etag_matches(etag, etag)
+    assert etag_matches(f'"other", W/{etag}', etag)
+    assert etag_matches("*", etag)
+    assert not etag_matches(None, etag)
+    assert not etag_matches('"other"', etag)
+
+def test_conversations_not_modified_skips_loading(client, repository):
+    first = client.get("/api/conversation")
+    etag = first.headers["etag"]
+    assert first.status_code == 200
+    assert first.json()["count"] == 1
+    assert first.headers["cache-control"] == "private, no-cache"
+
+    second = client.get("/api/conversation", headers={"If-None-Match": etag})
+    assert second.status_code == 304
+    assert second.headers["etag"] == etag
+    assert second.content == b""
+    assert repository["conversations"].call_count == 1
+
+def test_conversations_etag_changes_with_version(client, repository):
+    etag = client.get("/api/conversation").headers["etag"]
+
+    repository["conversations_version"].return_value = {"updated_at": UPDATED_AT, "count": 2}
+    response = client.get("/api/conversation", headers={"If-None-Match": etag})
+
+    assert response.status_code == 200
+    assert response.headers["etag"] != etag
+    assert repository["conversations"].call_count == 2
+
+def test_messages_not_modified_skips_loading(client, repository):
+    url = f"/api/conversation/{CONVERSATION_ID}/messages"
+    first = client.get(url)
+    etag = first.headers["etag"]
+    assert first.status_code == 200
+    assert first.json()["count"] == 1
+
+    second = client.get(url, headers={"If-None-Match": etag})
+    assert second.status_code == 304
+    assert repository["messages"].call_count == 1
+
+    repository["messages_version"].return_value = {"user_id": USER_ID, "updated_at": UPDATED_AT, "count": 2}
+    third = client.get(url, headers={"If-None-Match": etag})
+    assert third.status_code == 200
+    assert third.headers["etag"] != etag
+
+def test_messages_etag_expires_with_presigned_urls(client, repository):
+    url = f"/api/conversation/{CONVERSATION_ID}/messages"
+    with patch("src.shared.S3_utils.time.time", return_value=0):
+        etag = client.get(url).headers["etag"]
+    with patch("src.shared.S3_utils.time.time", return_value=1800):
+        response = client.get(url, headers={"If-None-Match": etag})
+
+    assert response.status_code == 200
+
+def test_messages_etag_checks_ownership(client, repository):
+    url = f"/api/conversation/{CONVERSATION_ID}/messages"
+    repository["messages_version"].return_value = {"user_id": OTHER_USER_ID, "updated_at": UPDATED_AT, "count": 1}
+    forbidden = client.get(url, headers={"If-None-Match": "*"})
+
+    repository["messages_version"].return_value = {}
+    missing = client.get(url, headers={"If-None-Match": "*"})
+
+    assert forbidden.status_code == 403
+    assert missing.status_code == 404
+    repository["messages"].assert_not_called()
@@ -0,0 +1,145 @@
+# tests/test_deadline.py
+import asyncio
+import json
+import os
+import pytest
+from types import SimpleNamespace
+from unittest.mock import Mock, patch
+
+# Set environment variables before importing our module
+os.environ.setdefault('GEMINI_API_KEY', 'fake-api-key')
+
+from google.genai import errors as genai_errors
+from src.core.models import ChatbotRes
+from src.shared.Deadline_utils import Deadline, DeadlineExceeded
+from src.shared.Scheduler_utils import RateScheduler, TokenBucket
+from src.modules.chatbot.service import server
+from src.modules.chatbot.lib import similarity_retriever
+
+def test_deadline_derives_stage_timeouts():
+    """Stage timeouts keep the reserve for later stages"""
+    deadline = Deadline(10)
+
+    assert 9 < deadline.remaining() <= 10
+    assert deadline.timeout(reserve=4) == pytest.approx(6, abs=0.1)
+    assert deadline.timeout(share=0.5, reserve=4) == pytest.approx(3, abs=0.1)
+    assert deadline.expired(reserve=11)
+    assert not deadline.expired(reserve=5)
+
+def test_deadline_from_scope_is_capped_by_lambda_time():
+    """Under Mangum the Lambda's remaining time caps the budget"""
+    context = SimpleNamespace(get_remaining_time_in_millis=lambda: 5000)
+
+    deadline = Deadline.from_scope({"aws.context": context}, seconds=25)
+
+    assert deadline.remaining() <= 5
+
+def test_scheduler_stops_retrying_past_deadline():
+    """Backoff that would overrun the deadline raises DeadlineExceeded"""
+    scheduler = RateScheduler(max_concurrency=1, rate_limits={}, default_rpm=6000, max_retries=5)
+    error = genai_errors.APIError(429, {"error": {"details": [{"retryDelay": "20s"}]}})
+    fn = Mock(side_effect=error)
+
+    with pytest.raises(DeadlineExceeded):
+        scheduler.call("gemini", fn, deadline=Deadline(2))
+    assert fn.call_count == 1
+
+def test_stage_deadline_keeps_reserve():
+    """A stage deadline expires `reserve` seconds before the request's"""
+    stage = Deadline(10).with_reserve(4)
+
+    assert stage.remaining() == pytest.approx(6, abs=0.1)
+    assert Deadline(3).with_reserve(4).expired()
+
+def test_token_bucket_does_not_wait_past_deadline():
+    """A rate-limited call gives up instead of sleeping past the deadline"""
+    bucket = TokenBucket(rpm=60, capacity=1)
+    bucket.pause(30)
+
+    with pytest.raises(DeadlineExceeded):
+        bucket.take(Deadline(1))
+
+@pytest.mark.asyncio
+async def test_retrieval_is_skipped_without_time_for_it():
+    """No window runs, not even the first, once only the generation reserve is left"""
+    with patch.object(similarity_retriever, 'get_embedding_gemini') as mock_embed, \
+         patch.object(similarity_retriever, 'split_into_windows') as mock_split:
+        docs = await similarity_retriever.get_context_and_ifi(
+            "M8 HEX nut", deadline=Deadline(server.DEADLINE_GENERATION_RESERVE_SECONDS - 1)
+        )
+
+    assert docs == []
+    mock_embed.assert_not_called()
+    mock_split.assert_not_called()
+
+@pytest.mark.asyncio
+async def test_retrieval_keeps_windows_finished_in_time():
+    """Every call of the stage gets the stage deadline; a window that times out ends the stage"""
+    stages = []
+
+    async def embed(window, deadline):
+        stages.append(deadline)
+        if window == "w2":
+            raise DeadlineExceeded("late")
+        return [0.1]
+
+    with patch.object(similarity_retriever, 'split_into_windows', return_value=["w1", "w2", "w3"]) as mock_split, \
+         patch.object(similarity_retriever, 'get_embedding_gemini', side_effect=embed), \
+         patch.object(similarity_retriever, 'retrieve_similar_content', return_value=[("content", "IFI_1", 0.9)]) as mock_search:
+        docs = await similarity_retriever.get_context_and_ifi(
+            "M8 HEX nut", with_scores=True, deadline=Deadline(20)
+        )
+
+    assert docs == [("content", "IFI_1", 0.9)]
+    assert len(stages) == 2
+    assert stages[0].remaining() < 20 - server.DEADLINE_GENERATION_RESERVE_SECONDS + 0.1
+    assert mock_split.call_args.args[3] is stages[0]
+    search_timeout = mock_search.call_args.args[2]
+    assert 0 < search_timeout <= 20 - server.DEADLINE_GENERATION_RESERVE_SECONDS
+
+@pytest.fixture
+def mock_stages():
+    """Mock parsing, retrieval and history loading around ask_gemini"""
+    with patch.object(server, 'attachments_parser') as mock_parser, \
+         patch.object(server, 'attachment_digests', side_effect=lambda atts: ["digest"] * len(atts)), \
+         patch.object(server, 'get_context_and_ifi') as mock_retrieve, \
+         patch.object(server, 'load_rolling_history', return_value=([], None, False)):
+        async def parse(*args, **kwargs):
+            return ["M8 HEX nut"]
+
+        async def retrieve(*args, **kwargs):
+            return [("content", "IFI_1", 0.9)]
+
+        mock_parser.side_effect = parse
+        mock_retrieve.side_effect = retrieve
+        yield mock_parser, mock_retrieve
+
+@pytest.mark.asyncio
+async def test_agent_service_degrades_when_generation_times_out(mock_stages):
+    """A generation timeout still returns a valid ChatbotRes"""
+    with patch.object(server, 'ask_gemini', side_effect=DeadlineExceeded("late")):
+        res = await server.agent_service(None, json.dumps({"query": "quote M8"}), Deadline(20))
+
+    assert isinstance(res, ChatbotRes)
+    assert res.result.text == server.DEADLINE_FALLBACK_TEXT
+    assert res.result.email is None
+    assert res.resources == ["IFI_1"]
+
+@pytest.mark.asyncio
+async def test_agent_service_skips_slow_attachment_parsing(mock_stages):
+    """Attachment parsing that overruns its share is dropped, not fatal"""
+    mock_parser, _ = mock_stages
+
+    async def slow_parse(*args, **kwargs):
+        await asyncio.sleep(5)
+        return ["never"]
+
+    mock_parser.side_effect = slow_parse
+    with patch.object(server, 'ask_gemini', return_value={"text": "ok", "email": None}):
+        res = await server.agent_service(
+            [Mock()], json.dumps({"query": "quote M8"}),
+            Deadline(server.DEADLINE_GENERATION_RESERVE_SECONDS + 0.2),
+        )
+
+    assert res.file_description == ""
+    assert res.result.text == "ok"
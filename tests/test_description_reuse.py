@@ -0,0 +1,82 @@
+# tests/test_description_reuse.py
+import os
+from unittest.mock import patch
+
+# Set environment variables before importing our module
+os.environ.setdefault('GEMINI_API_KEY', 'fake-api-key')
+
+from src.modules.chatbot.lib import description_reuse
+from src.modules.chatbot.lib.attachment_parser import attachment_digests
+from src.modules.chatbot.lib.description_reuse import reuse_stored_descriptions, s3_key_from_url
+from src.modules.chatbot.lib.s3_attachments import S3Attachment
+
+KEY = "attachments/user-1/conv-abc/0b6f6d3e-3c64-4d0a-9d3f-0a3c5c7e2b11-bom.xlsx"
+
+def stored(messages):
+    return patch.object(
+        description_reuse.ConversationRepository, "get_described_attachments", return_value=messages
+    )
+
+def test_s3_key_from_url():
+    assert s3_key_from_url(f"https://bucket.s3.amazonaws.com/{KEY}") == KEY
+    assert s3_key_from_url(f"https://bucket.s3.amazonaws.com/{KEY}?X-Amz-Signature=abc") == KEY
+    assert s3_key_from_url("https://example.com/file.pdf") is None
+    assert s3_key_from_url(None) is None
+
+def test_reuses_description_of_resent_attachment(make_upload):
+    drawing, spec = make_upload(b"drawing"), make_upload(b"spec")
+    digests = attachment_digests([drawing, spec])
+    messages = [{
+        "message_id": "m1",
+        "file_description": "M6 x 20 SHCS\n\nM8 washer",
+        "attachments": [{"s3_url": "https://bucket.s3.amazonaws.com/attachments/x", "content_hash": digests[1]}],
+    }]
+
+    with stored(messages):
+        descriptions, remaining = reuse_stored_descriptions("abc", [drawing, spec], digests)
+
+    assert descriptions == ["M6 x 20 SHCS", "M8 washer"]
+    assert remaining == [0]
+
+def test_matches_s3_attachments_by_key():
+    attachment = S3Attachment(key=KEY, filename="bom.xlsx", content_type="application/vnd.ms-excel", size=10, etag="e2")
+    messages = [{
+        "message_id": "m1",
+        "file_description": "M6 hex nut",
+        "attachments": [{"s3_url": f"https://bucket.s3.amazonaws.com/{KEY}", "content_hash": None}],
+    }]
+
+    with stored(messages):
+        descriptions, remaining = reuse_stored_descriptions("abc", [attachment], [attachment.digest])
+
+    assert descriptions == ["M6 hex nut"]
+    assert remaining == []
+
+def test_skips_messages_with_attachments_not_resent(make_upload):
+    drawing = make_upload(b"drawing")
+    digests = attachment_digests([drawing])
+    messages = [{
+        "message_id": "m1",
+        "file_description": "Covers two files",
+        "attachments": [{"s3_url": None, "content_hash": digests[0]}, {"s3_url": None, "content_hash": "other"}],
+    }]
+
+    with stored(messages):
+        descriptions, remaining = reuse_stored_descriptions("abc", [drawing], digests)
+
+    assert descriptions == []
+    assert remaining == [0]
+
+def test_newest_message_wins_for_repeated_attachment(make_upload):
+    drawing = make_upload(b"drawing")
+    digests = attachment_digests([drawing])
+    messages = [
+        {"message_id": "new", "file_description": "Newer", "attachments": [{"s3_url": None, "content_hash": digests[0]}]},
+        {"message_id": "old", "file_description": "Older", "attachments": [{"s3_url": None, "content_hash": digests[0]}]},
+    ]
+
+    with stored(messages):
+        descriptions, remaining = reuse_stored_descriptions("abc", [drawing], digests)
+
+    assert descriptions == ["Newer"]
+    assert remaining == []
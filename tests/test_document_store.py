@@ -0,0 +1,64 @@
+# tests/test_document_store.py
+import os
+from unittest.mock import patch
+
+from src.shared.DocumentStore_utils import DocumentStore
+
+def write(tmp_path, name, text):
+    path = tmp_path / f"{name}.md"
+    path.write_text(text, encoding="utf-8")
+    return path
+
+def test_documents_are_read_once(tmp_path):
+    write(tmp_path, "IFI_1", "table one")
+    store = DocumentStore(str(tmp_path), max_bytes=1024)
+
+    with patch("builtins.open", wraps=open) as mock_open:
+        assert store.get("IFI_1") == "table one"
+        assert store.get("IFI_1") == "table one"
+
+    assert mock_open.call_count == 1
+    assert store.hits == 1
+
+def test_changed_file_is_reloaded_after_revalidation(tmp_path):
+    path = write(tmp_path, "IFI_1", "old")
+    store = DocumentStore(str(tmp_path), max_bytes=1024, revalidate_seconds=0)
+    assert store.get("IFI_1") == "old"
+
+    path.write_text("new text", encoding="utf-8")
+    os.utime(path, ns=(0, 10**9))
+
+    assert store.get("IFI_1") == "new text"
+
+def test_missing_files_are_cached(tmp_path):
+    store = DocumentStore(str(tmp_path), max_bytes=1024, missing_ttl_seconds=60)
+
+    with patch("os.stat", wraps=os.stat) as mock_stat:
+        assert store.get("IFI_missing") is None
+        assert store.get("IFI_missing") is None
+
+    assert mock_stat.call_count == 1
+
+def test_byte_bound_evicts_least_recently_used(tmp_path):
+    for name in ("a", "b", "c"):
+        write(tmp_path, name, name * 40)
+    store = DocumentStore(str(tmp_path), max_bytes=100)
+
+    store.get("a")
+    store.get("b")
+    store.get("a")
+    store.get("c")
+
+    assert len(store) == 2
+    assert store._bytes <= 100
+    assert "b" not in store._documents
+
+def test_get_many_and_preload(tmp_path):
+    write(tmp_path, "IFI_1", "one")
+    write(tmp_path, "IFI_2", "two")
+    store = DocumentStore(str(tmp_path), max_bytes=1024)
+
+    assert store.preload() == 2
+    assert store.get_many(["IFI_2", "IFI_1", "IFI_2", None, "IFI_3"]) == {
+        "IFI_2": "two", "IFI_1": "one", "IFI_3": None,
+    }
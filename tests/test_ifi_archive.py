@@ -0,0 +1,54 @@
+# tests/test_ifi_archive.py
+import pytest
+
+from src.shared.IFIArchive_utils import IFIArchive, build_archive
+
+DOCUMENTS = {
+    "IFI_1": "| Size | Grade |\n| M6 | 8.8 |\n",
+    "IFI_2": "Ünïcode table\n" * 50,
+}
+
+@pytest.fixture
+def source(tmp_path):
+    directory = tmp_path / "ifi"
+    directory.mkdir()
+    for name, text in DOCUMENTS.items():
+        (directory / f"{name}.md").write_text(text, encoding="utf-8")
+    (directory / "notes.txt").write_text("not an IFI file")
+    return directory
+
+@pytest.mark.parametrize("compress", [False, True])
+def test_archive_round_trip(source, tmp_path, compress):
+    path = str(tmp_path / "ifi.pack")
+    version = build_archive(str(source), path, compress=compress)
+
+    archive = IFIArchive(path)
+
+    assert archive.version == version
+    assert len(archive) == 2
+    assert archive.get("IFI_1") == DOCUMENTS["IFI_1"]
+    assert archive.get_many(["IFI_2", "IFI_3"]) == {"IFI_2": DOCUMENTS["IFI_2"], "IFI_3": None}
+    assert archive.verify()
+    assert archive.sections("IFI_1") == [(0, len(DOCUMENTS["IFI_1"]))]
+
+def test_raw_documents_are_views_of_the_map(source, tmp_path):
+    path = str(tmp_path / "ifi.pack")
+    build_archive(str(source), path)
+
+    data = IFIArchive(path).get_bytes("IFI_1")
+
+    assert isinstance(data, memoryview)
+    assert bytes(data) == DOCUMENTS["IFI_1"].encode("utf-8")
+
+def test_version_changes_with_contents(source, tmp_path):
+    first = build_archive(str(source), str(tmp_path / "a.pack"))
+    (source / "IFI_1.md").write_text("changed", encoding="utf-8")
+
+    assert build_archive(str(source), str(tmp_path / "b.pack")) != first
+
+def test_rejects_other_files(tmp_path):
+    path = tmp_path / "bogus.pack"
+    path.write_bytes(b"not an archive at all")
+
+    with pytest.raises(ValueError):
+        IFIArchive(str(path))
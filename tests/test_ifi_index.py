@@ -0,0 +1,52 @@
+# tests/test_ifi_index.py
+import json
+
+from src.shared.IFIIndex_utils import build_index, load_index
+
+def test_index_round_trip(tmp_path):
+    source = tmp_path / "ifi"
+    source.mkdir()
+    (source / "IFI_1.md").write_text("# Sizes\n| M6 | 10 |\n# Grades\n8.8\n", encoding="utf-8")
+    (source / "IFI_2.md").write_text("ünïcode", encoding="utf-8")
+    path = str(tmp_path / "index.json")
+
+    assert build_index(str(source), path, count_tokens=lambda text: 7, tokenizer="test") == 2
+    index = load_index(path)
+
+    info = index["IFI_1"]
+    assert info.tokens == 7
+    assert info.size == info.chars == 33
+    assert info.sections == [(0, 20), (20, 33)]
+    assert len(info.sha256) == 64
+    assert index["IFI_2"].size > index["IFI_2"].chars
+    assert json.loads(open(path).read())["tokenizer"] == "test"
+
+def test_missing_or_broken_index_is_empty(tmp_path):
+    broken = tmp_path / "broken.json"
+    broken.write_text("{not json")
+
+    assert load_index(str(tmp_path / "missing.json")) == {}
+    assert load_index(str(broken)) == {}
+
+def test_unchanged_documents_keep_their_counted_tokens(tmp_path):
+    source = tmp_path / "ifi"
+    source.mkdir()
+    (source / "IFI_1.md").write_text("# Sizes\n| M6 | 10 |\n", encoding="utf-8")
+    (source / "IFI_2.md").write_text("# Grades\n8.8\n", encoding="utf-8")
+    path = str(tmp_path / "index.json")
+    counted = []
+
+    def count_tokens(text):
+        counted.append(text)
+        return 7
+
+    build_index(str(source), path, count_tokens=count_tokens, tokenizer="test")
+    (source / "IFI_2.md").write_text("# Grades\n10.9\n", encoding="utf-8")
+    build_index(str(source), path, count_tokens=count_tokens, tokenizer="test")
+    build_index(str(source), path, count_tokens=count_tokens, tokenizer="other")
+
+    assert counted == [
+        "# Sizes\n| M6 | 10 |\n", "# Grades\n8.8\n",
+        "# Grades\n10.9\n",
+        "# Sizes\n| M6 | 10 |\n", "# Grades\n10.9\n",
+    ]
@@ -0,0 +1,74 @@
+# tests/test_image_preprocessor.py
+import os
+import pytest
+from pathlib import Path
+from PIL import Image
+from unittest.mock import Mock, patch
+
+# Set environment variables before importing our module
+os.environ.setdefault('GEMINI_API_KEY', 'fake-api-key')
+
+from src.modules.chatbot.lib import attachment_parser as parser
+from src.modules.chatbot.lib.image_preprocessor import prepare_image
+
+def save_photo(path, size=(2400, 1800), orientation=None):
+    image = Image.effect_noise(size, 64).convert("RGB")
+    exif = Image.Exif()
+    exif[0x010F] = "PhoneMaker"  # Make
+    if orientation:
+        exif[0x0112] = orientation
+    image.save(path, format="JPEG", quality=98, exif=exif)
+    return str(path)
+
+def test_photo_is_downscaled_reoriented_and_stripped(tmp_path):
+    """Large photos fit the max dimension, are rotated upright, and lose their EXIF"""
+    path = save_photo(tmp_path / "label.jpg", orientation=6)  # Rotated 90 degrees
+
+    prepared = prepare_image(path, str(tmp_path / "label-prepared"), max_dimension=1024, jpeg_quality=85)
+
+    assert prepared.mime_type == "image/jpeg"
+    assert prepared.original_size == (2400, 1800)
+    assert prepared.prepared_size == (768, 1024)
+    assert prepared.prepared_bytes < prepared.original_bytes
+    with Image.open(prepared.path) as result:
+        assert result.size == (768, 1024)
+        assert not result.getexif()
+
+def test_line_art_stays_lossless_png(tmp_path):
+    """Palette drawings are re-encoded as PNG, and transparent images never reach JPEG with alpha"""
+    drawing = Image.new("P", (3000, 1000), 0)
+    drawing.save(tmp_path / "drawing.png")
+
+    prepared = prepare_image(str(tmp_path / "drawing.png"), str(tmp_path / "drawing-prepared"), 1500, 85)
+
+    assert prepared.mime_type == "image/png"
+    assert prepared.prepared_size == (1500, 500)
+
+def test_small_images_keep_the_original(tmp_path):
+    """Nothing is gained by re-encoding a small, upright, already compressed image"""
+    path = tmp_path / "small.jpg"
+    Image.effect_noise((200, 100), 64).convert("RGB").save(path, format="JPEG", quality=50)
+
+    assert prepare_image(str(path), str(tmp_path / "small-prepared"), 1024, 85) is None
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["small.jpg"]
+
+@pytest.mark.asyncio
+async def test_attachment_parser_uploads_the_prepared_image(tmp_path, mock_genai_client, make_upload):
+    """The downscaled JPEG is uploaded instead of the original photo"""
+    path = save_photo(tmp_path / "label.jpg")
+    upload = make_upload(Path(path).read_bytes(), "label.jpg", "image/jpeg")
+    uploaded = []
+
+    async def run(fn, *args):
+        return fn(*args)
+
+    with patch.object(parser.attachment_pool, "run", side_effect=run), \
+            patch.object(parser, "IMAGE_MAX_DIMENSION", 1024):
+        mock_genai_client.files.upload.side_effect = lambda file, config: uploaded.append(
+            (Image.open(file).size, config.mime_type)
+        ) or Mock()
+
+        content, file_type = await parser.attachment_parser(upload, str(tmp_path))
+
+    assert file_type == "file"
+    assert uploaded == [((1024, 768), "image/jpeg")]
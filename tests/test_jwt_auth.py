@@ -0,0 +1,182 @@
+# tests/test_jwt_auth.py
+import asyncio
+import os
+import time
+import httpx
+import jwt
+import pytest
+from unittest.mock import patch
+from cryptography.hazmat.primitives.asymmetric import rsa
+from fastapi import Depends, FastAPI, HTTPException
+from fastapi.testclient import TestClient
+from jwt.algorithms import RSAAlgorithm
+
+# Set environment variables before importing our module
+os.environ.setdefault('GEMINI_API_KEY', 'fake-api-key')
+
+from src.shared import jwt_auth
+from src.shared.jwt_auth import CurrentUser, JWKSManager
+
+def make_key(kid):
+    private_key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    jwk = {**RSAAlgorithm.to_jwk(private_key.public_key(), as_dict=True), "kid": kid, "alg": "RS256"}
+    return private_key, jwk
+
+PRIVATE_KEY, JWK = make_key("key-1")
+ROTATED_KEY, ROTATED_JWK = make_key("key-2")
+
+def make_token(exp_in=3600, kid="key-1", private_key=PRIVATE_KEY, **claims):
+    payload = {
+        "sub": "user-1",
+        "iss": jwt_auth.COGNITO_ISSUER,
+        "token_use": "access",
+        "client_id": jwt_auth.COGNITO_CLIENT_ID,
+        "exp": int(time.time()) + exp_in,
+        **claims,
+    }
+    return jwt.encode(payload, private_key, algorithm="RS256", headers={"kid": kid})
+
+class LocalJWKS:
+    """Local JWKS endpoint stand-in, counting requests"""
+
+    def __init__(self, keys):
+        self.keys = keys
+        self.requests = 0
+        self.delay = 0.0
+
+    async def handler(self, request):
+        self.requests += 1
+        await asyncio.sleep(self.delay)
+        return httpx.Response(200, json={"keys": self.keys})
+
+    def manager(self, **kwargs):
+        return JWKSManager("https://cognito.test/jwks.json", transport=httpx.MockTransport(self.handler), **kwargs)
+
+@pytest.fixture
+def jwks():
+    """Serve the test JWKS and start every test with empty caches"""
+    endpoint = LocalJWKS([JWK])
+    jwt_auth.verified_tokens.clear()
+    with patch.object(jwt_auth, "jwks_manager", endpoint.manager()):
+        yield endpoint
+
+@pytest.mark.asyncio
+async def test_keys_are_parsed_once_per_jwks_refresh(jwks):
+    with patch.object(jwt_auth.RSAAlgorithm, "from_jwk", wraps=RSAAlgorithm.from_jwk) as mock_from_jwk:
+        await jwt_auth.verify_session_token(make_token())
+        await jwt_auth.verify_session_token(make_token(exp_in=7200))
+
+    assert mock_from_jwk.call_count == 1
+    assert jwks.requests == 1
+
+@pytest.mark.asyncio
+async def test_verified_token_is_cached_until_exp(jwks):
+    token = make_token()
+
+    with patch.object(jwt_auth.jwt, "decode", wraps=jwt.decode) as mock_decode:
+        first = await jwt_auth.verify_session_token(token)
+        second = await jwt_auth.verify_session_token(token)
+
+    assert mock_decode.call_count == 1
+    assert first == second and first["sub"] == "user-1"
+
+@pytest.mark.asyncio
+async def test_expired_and_unknown_key_tokens_are_rejected(jwks):
+    with pytest.raises(HTTPException) as expired:
+        await jwt_auth.verify_session_token(make_token(exp_in=-10))
+    with pytest.raises(HTTPException) as unknown:
+        await jwt_auth.verify_session_token(make_token(kid="other"))
+
+    assert expired.value.status_code == 401
+    assert unknown.value.status_code == 401
+    assert len(jwt_auth.verified_tokens) == 0
+
+@pytest.mark.asyncio
+async def test_concurrent_refreshes_share_one_fetch():
+    endpoint = LocalJWKS([JWK])
+    endpoint.delay = 0.05
+    manager = endpoint.manager()
+
+    keys = await asyncio.gather(*(manager.get_key("key-1") for _ in range(5)))
+
+    assert all(key is not None for key in keys)
+    assert endpoint.requests == 1
+
+def test_prefetch_on_a_throwaway_loop_serves_later_loops():
+    """A prefetch run with asyncio.run leaves nothing in flight; the next loop uses its keys"""
+    endpoint = LocalJWKS([JWK])
+    manager = endpoint.manager()
+
+    asyncio.run(manager.prefetch())
+
+    assert manager._flight.in_flight() == 0
+    assert manager._background is None
+    assert asyncio.run(manager.get_key("key-1")) is not None
+    assert endpoint.requests == 1
+
+@pytest.mark.asyncio
+async def test_unknown_kid_refreshes_at_most_once_per_interval():
+    endpoint = LocalJWKS([JWK])
+    manager = endpoint.manager(min_refresh_interval=60)
+    await manager.prefetch()
+
+    endpoint.keys = [JWK, ROTATED_JWK]
+    manager.last_attempt -= 60
+    assert await manager.get_key("key-2") is not None
+    assert await manager.get_key("key-3") is None
+
+    assert endpoint.requests == 2
+
+@pytest.mark.asyncio
+async def test_keys_refresh_ahead_of_expiry_in_background():
+    endpoint = LocalJWKS([JWK])
+    manager = endpoint.manager(max_age=100, refresh_ahead=10)
+    await manager.prefetch()
+
+    manager.fetched_at -= 95
+    manager.last_attempt -= 95
+    assert await manager.get_key("key-1") is not None
+    await asyncio.sleep(0.01)
+
+    assert endpoint.requests == 2
+    assert manager.age() < 5
+
+@pytest.mark.asyncio
+async def test_failed_refresh_keeps_previous_keys():
+    endpoint = LocalJWKS([JWK])
+    manager = endpoint.manager(max_age=100, refresh_ahead=10, min_refresh_interval=60)
+    await manager.prefetch()
+    failures = []
+
+    async def failing(request):
+        failures.append(request)
+        raise httpx.ConnectError("down")
+
+    manager.transport = httpx.MockTransport(failing)
+    manager.fetched_at -= 200
+    manager.last_attempt -= 200
+
+    assert await manager.get_key("key-1") is not None
+    assert await manager.get_key("key-1") is not None
+    assert len(failures) == 1
+
+def test_current_user_is_resolved_once_per_request(jwks):
+    """Route and sub-dependencies share one verification per request"""
+    app = FastAPI()
+
+    def owner(user: CurrentUser) -> str:
+        return user["sub"]
+
+    @app.get("/me")
+    async def me(user: CurrentUser, sub: str = Depends(owner)):
+        return {"sub": user["sub"], "owner": sub}
+
+    client = TestClient(app)
+    with patch.object(jwt_auth, "verify_session_token", wraps=jwt_auth.verify_session_token) as mock_verify:
+        missing = client.get("/me")
+        client.cookies.set("access_token", make_token())
+        response = client.get("/me")
+
+    assert response.json() == {"sub": "user-1", "owner": "user-1"}
+    assert mock_verify.call_count == 1
+    assert missing.status_code == 401
@@ -0,0 +1,120 @@
+# tests/test_pdf_reader.py
+import os
+import pytest
+import pymupdf
+from pathlib import Path
+from unittest.mock import patch
+
+# Set environment variables before importing our module
+os.environ.setdefault('GEMINI_API_KEY', 'fake-api-key')
+
+from src.modules.chatbot.lib import attachment_parser as parser
+from src.modules.chatbot.lib.pdf_reader import extract_pages, page_count, render_pages
+
+TEXT = "Hex bolt M10 x 40, grade 8.8, zinc plated"
+
+def insert_photo(page, rect=pymupdf.Rect(72, 144, 300, 372)):
+    pixmap = pymupdf.Pixmap(pymupdf.csRGB, pymupdf.IRect(0, 0, 40, 40), False)
+    pixmap.clear_with(200)
+    page.insert_image(rect, pixmap=pixmap)
+
+def draw_bracket(page):
+    """Vector-only line drawing, as exported from CAD"""
+    for x in range(100, 400, 30):
+        page.draw_line((x, 100), (x, 500))
+    page.draw_rect(pymupdf.Rect(100, 100, 400, 500))
+
+def make_pdf(path, pages):
+    """pages: list of "text" strings, None for an image-only (scanned) page, or a function drawing the page"""
+    doc = pymupdf.open()
+    for text in pages:
+        page = doc.new_page()
+        if text is None:
+            insert_photo(page)
+        elif callable(text):
+            text(page)
+        elif text:
+            page.insert_text((72, 72), text)
+    doc.save(path)
+    doc.close()
+    return str(path)
+
+def test_extract_pages_classifies_text_scanned_and_blank_pages(tmp_path):
+    """Text pages keep their text, image-only pages are scanned, blank pages are skipped"""
+    path = make_pdf(tmp_path / "mixed.pdf", [TEXT, None, ""])
+
+    pages = extract_pages(path, 0, page_count(path), min_chars=16)
+
+    assert [(page.number, page.visual) for page in pages] == [(0, False), (1, True)]
+    assert "Hex bolt M10 x 40" in pages[0].text
+    assert render_pages("mixed.pdf", pages).splitlines()[-1] == "--- Page 2 (scanned; see the attached file) ---"
+
+def test_extract_pages_keeps_drawings_and_figures(tmp_path):
+    """Vector-only pages are visual, and text pages with a photo keep their text and are visual too"""
+    def text_with_photo(page):
+        page.insert_text((72, 72), TEXT)
+        insert_photo(page)
+
+    def text_with_logo(page):
+        page.insert_text((72, 72), TEXT)
+        insert_photo(page, pymupdf.Rect(500, 20, 540, 40))
+
+    path = make_pdf(tmp_path / "drawing.pdf", [draw_bracket, text_with_photo, text_with_logo])
+
+    pages = extract_pages(path, 0, page_count(path), min_chars=16)
+
+    assert [(page.number, page.visual) for page in pages] == [(0, True), (1, True), (2, False)]
+    assert pages[0].text == ""
+    assert "Hex bolt M10 x 40" in pages[1].text
+    assert render_pages("drawing.pdf", pages).splitlines()[1:4] == [
+        "--- Page 1 (scanned; see the attached file) ---",
+        "--- Page 2 (figures in the attached file) ---",
+        TEXT,
+    ]
+
+@pytest.mark.asyncio
+async def test_text_pdf_is_passed_inline_without_upload(tmp_path, mock_genai_client, make_upload):
+    """A PDF with a text layer is converted locally and never uploaded"""
+    path = make_pdf(tmp_path / "datasheet.pdf", [TEXT])
+
+    content, file_type = await parser.attachment_parser(make_upload(Path(path).read_bytes(), "datasheet.pdf"), str(tmp_path))
+
+    assert file_type == "text"
+    assert content.startswith("PDF Content:\n## PDF: datasheet.pdf\n--- Page 1 ---")
+    mock_genai_client.files.upload.assert_not_called()
+
+@pytest.mark.asyncio
+async def test_only_scanned_pages_are_uploaded(tmp_path, mock_genai_client, make_upload):
+    """A partly scanned PDF yields its text plus an upload of only the scanned and vector-only pages"""
+    path = make_pdf(tmp_path / "drawing.pdf", [TEXT, None, draw_bracket])
+    uploaded_pages = []
+
+    def upload(file, config):
+        with pymupdf.open(file) as subset:
+            uploaded_pages.append(subset.page_count)
+        return mock_genai_client.files.upload.return_value
+
+    mock_genai_client.files.upload.side_effect = upload
+
+    content, file_type = await parser.attachment_parser(make_upload(Path(path).read_bytes()), str(tmp_path), digest="d1")
+
+    assert file_type == "pdf"
+    assert "Hex bolt M10 x 40" in content[0]
+    assert content[1] is mock_genai_client.files.upload.return_value
+    assert uploaded_pages == [2]
+
+@pytest.mark.asyncio
+async def test_large_pdfs_are_extracted_in_parallel_runs_in_page_order(tmp_path):
+    """Runs of pages are extracted by the worker pool and merged back in order"""
+    path = make_pdf(tmp_path / "catalog.pdf", [f"Catalog page number {i} with fastener text" for i in range(5)])
+    runs = []
+
+    async def run(fn, *args):
+        runs.append(args[1:3])
+        return fn(*args)
+
+    with patch.object(parser, "PDF_PAGES_PER_TASK", 2), patch.object(parser.attachment_pool, "run", side_effect=run):
+        pages = await parser.extract_pdf_pages(path)
+
+    assert runs == [(0, 2), (2, 4), (4, 6)]
+    assert [page.number for page in pages] == [0, 1, 2, 3, 4]
@@ -0,0 +1,64 @@
+import os
+import pytest
+from unittest.mock import patch
+
+# Set environment variables before importing our module
+os.environ.setdefault('GEMINI_API_KEY', 'fake-api-key')
+
+from src.shared import S3_utils
+from src.shared.S3_utils import get_cached_presigned_urls, presign_epoch, presign_window
+
+BUCKET = "attachments-bucket"
+PDF = ("a.pdf", "application/pdf")
+
+@pytest.fixture
+def signer():
+    S3_utils.presigned_urls.clear()
+    calls = []
+
+    def sign(method, Params, ExpiresIn):
+        calls.append((Params["Key"], Params.get("ResponseContentType")))
+        return f"https://{Params['Bucket']}/{Params['Key']}?type={Params.get('ResponseContentType')}&n={len(calls)}"
+
+    with patch.object(S3_utils.s3, "generate_presigned_url", side_effect=sign):
+        yield calls
+    S3_utils.presigned_urls.clear()
+
+def test_presign_window_keeps_margin():
+    assert presign_window() == S3_utils.PRESIGNED_URL_EXPIRES_SECONDS - S3_utils.PRESIGNED_URL_MARGIN_SECONDS
+    assert presign_epoch(0) == 0
+    assert presign_epoch(presign_window()) == 1
+
+def test_bulk_signing_deduplicates(signer):
+    urls = get_cached_presigned_urls(BUCKET, [
+        ("a.pdf", "application/pdf"),
+        ("b.png", "image/png"),
+        ("a.pdf", "application/pdf"),
+    ])
+
+    assert len(urls) == 2
+    assert signer == [("a.pdf", "application/pdf"), ("b.png", "image/png")]
+
+def test_urls_are_reused_within_epoch(signer):
+    with patch("src.shared.S3_utils.time.time", return_value=10):
+        first = get_cached_presigned_urls(BUCKET, [PDF])
+        second = get_cached_presigned_urls(BUCKET, [PDF, ("c.pdf", "application/pdf")])
+
+    assert second[PDF] == first[PDF]
+    assert signer == [("a.pdf", "application/pdf"), ("c.pdf", "application/pdf")]
+
+def test_content_type_is_part_of_the_key(signer):
+    octet = ("a.pdf", "application/octet-stream")
+    urls = get_cached_presigned_urls(BUCKET, [PDF, octet])
+
+    assert urls[PDF] != urls[octet]
+    assert len(signer) == 2
+
+def test_urls_rotate_with_epoch(signer):
+    with patch("src.shared.S3_utils.time.time", return_value=10):
+        first = get_cached_presigned_urls(BUCKET, [PDF])
+    with patch("src.shared.S3_utils.time.time", return_value=presign_window() + 10):
+        second = get_cached_presigned_urls(BUCKET, [PDF])
+
+    assert first[PDF] != second[PDF]
+    assert len(signer) == 2
@@ -0,0 +1,125 @@
+# tests/test_request_coalescer.py
+import asyncio
+import os
+import pytest
+from unittest.mock import Mock, patch
+
+# Set environment variables before importing our module
+os.environ.setdefault('GEMINI_API_KEY', 'fake-api-key')
+
+from src.shared.SingleFlight_utils import SingleFlight
+from src.core.config import DEADLINE_GENERATION_RESERVE_SECONDS
+from src.shared.Deadline_utils import Deadline
+from src.modules.chatbot.lib import request_coalescer
+from src.modules.chatbot.lib.attachment_parser import attachment_digests
+from src.modules.chatbot.lib.request_coalescer import request_key, coalesce_request
+
+@pytest.mark.asyncio
+async def test_single_flight_shares_in_flight_call():
+    """Concurrent calls with the same key run the work once"""
+    flight = SingleFlight()
+    calls = 0
+
+    async def work():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.05)
+        return "result"
+
+    results = await asyncio.gather(*[flight.do("key", work) for _ in range(5)])
+
+    assert results == ["result"] * 5
+    assert calls == 1
+    assert flight.shared == 4
+    assert flight.in_flight() == 0
+
+@pytest.mark.asyncio
+async def test_single_flight_runs_again_after_completion():
+    """A finished call is not cached; the next call runs the work again"""
+    flight = SingleFlight()
+    calls = 0
+
+    async def work():
+        nonlocal calls
+        calls += 1
+        return calls
+
+    assert await flight.do("key", work) == 1
+    assert await flight.do("key", work) == 2
+
+@pytest.mark.asyncio
+async def test_single_flight_propagates_errors_to_all_callers():
+    """Every waiter sees the error of the shared call"""
+    flight = SingleFlight()
+
+    async def work():
+        await asyncio.sleep(0.01)
+        raise RuntimeError("boom")
+
+    results = await asyncio.gather(*[flight.do("key", work) for _ in range(3)], return_exceptions=True)
+
+    assert all(isinstance(r, RuntimeError) for r in results)
+
+def test_request_key_covers_payload_and_attachment_digests(make_upload):
+    """Keys differ by payload, attachment content and name; uploads are hashed once, by the caller"""
+    def key_of(payload, upload):
+        return request_key(payload, [upload], attachment_digests([upload]))
+
+    key = key_of('{"query": "quote"}', make_upload(b"drawing bytes"))
+
+    assert key == key_of('{"query": "quote"}', make_upload(b"drawing bytes"))
+    assert key != key_of('{"query": "quote"}', make_upload(b"other bytes"))
+    assert key != key_of('{"query": "quote"}', make_upload(b"drawing bytes", filename="other.xlsx"))
+    assert key != key_of('{"query": "other"}', make_upload(b"drawing bytes"))
+
+@pytest.mark.asyncio
+async def test_coalesce_request_deduplicates_identical_requests(make_upload):
+    """Identical chatbot requests in flight share one agent_service call"""
+    calls = 0
+
+    async def agent():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.05)
+        return "response"
+
+    results = await asyncio.gather(
+        coalesce_request('{"query": "quote"}', [make_upload(b"a")], ["digest-a"], agent),
+        coalesce_request('{"query": "quote"}', [make_upload(b"a")], ["digest-a"], agent),
+    )
+
+    assert results == ["response", "response"]
+    assert calls == 1
+
+@pytest.mark.asyncio
+async def test_follower_waits_for_lock_within_deadline():
+    """A follower polls the advisory lock and gives up once only the generation reserve is left"""
+    conn = Mock()
+    with patch.object(request_coalescer, "_try_lock", return_value=False) as mock_try, \
+         patch.object(request_coalescer, "LOCK_POLL_SECONDS", 0.01):
+        acquired = await request_coalescer._wait_for_lock(
+            conn, 1, Deadline(DEADLINE_GENERATION_RESERVE_SECONDS + 0.1)
+        )
+
+    assert not acquired
+    assert mock_try.call_count >= 1
+
+@pytest.mark.asyncio
+async def test_follower_runs_request_when_leader_overruns():
+    """A follower that cannot get the lock in time answers the request itself, without storing it"""
+    conn = Mock()
+
+    async def agent():
+        return "response"
+
+    with patch.object(request_coalescer, "get_conn", return_value=conn), \
+         patch.object(request_coalescer, "_try_lock", return_value=False), \
+         patch.object(request_coalescer, "_wait_for_lock", return_value=False), \
+         patch.object(request_coalescer, "_store_result") as mock_store, \
+         patch.object(request_coalescer, "_unlock") as mock_unlock:
+        result = await request_coalescer._coalesce_across_instances("ab" * 32, agent, Deadline(20))
+
+    assert result == "response"
+    mock_store.assert_not_called()
+    mock_unlock.assert_not_called()
+    conn.close.assert_called_once()
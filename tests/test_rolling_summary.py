@@ -0,0 +1,91 @@
+# tests/test_rolling_summary.py
+import json
+import os
+import threading
+import time
+import pytest
+from unittest.mock import patch
+
+# Set environment variables before importing our module
+os.environ.setdefault('GEMINI_API_KEY', 'fake-api-key')
+
+from src.core.config import HISTORY_RAW_TURNS
+from src.core.models import ChatbotReq
+from src.shared.Deadline_utils import Deadline
+from src.modules.chatbot.service import server
+from src.modules.conversation.conversation_repository import ConversationRepository
+from src.modules.conversation.conversation_service import ConversationService
+
+CONVERSATION_ID = "219ba1b4-2d7c-47a5-a4b0-ad6d40d0bf01"
+
+def make_request(turns):
+    histories = [
+        {"query": f"q{i}", "file_description": "", "resources": [], "result": {"text": f"a{i}"}}
+        for i in range(turns)
+    ]
+    return {"query": "quote M8", "histories": histories, "conversation_id": CONVERSATION_ID}
+
+def summary_state(summary, covered, stored):
+    return {"summary": summary, "summary_message_count": covered, "message_count": stored}
+
+@pytest.mark.asyncio
+async def test_summary_is_stale_past_raw_turns():
+    """Only a summary trailing the stored messages by more than HISTORY_RAW_TURNS is refreshed"""
+    request = ChatbotReq(**make_request(2 + HISTORY_RAW_TURNS))
+    with patch.object(ConversationRepository, "get_conversation_summary",
+                      return_value=summary_state("earlier turns", 2, 2 + HISTORY_RAW_TURNS)):
+        histories, summary, stale = await server.load_rolling_history(request)
+    with patch.object(ConversationRepository, "get_conversation_summary",
+                      return_value=summary_state("earlier turns", 2, 3 + HISTORY_RAW_TURNS)):
+        _, _, stale_after_more = await server.load_rolling_history(request)
+
+    assert summary == "earlier turns"
+    assert len(histories) == HISTORY_RAW_TURNS
+    assert not stale
+    assert stale_after_more
+
+@pytest.mark.asyncio
+async def test_posted_history_does_not_decide_staleness():
+    """A client posting a long history cannot force a refresh of an up-to-date summary"""
+    with patch.object(ConversationRepository, "get_conversation_summary",
+                      return_value=summary_state("earlier turns", 2, 2)):
+        _, _, stale = await server.load_rolling_history(ChatbotReq(**make_request(50)))
+
+    assert not stale
+
+@pytest.mark.asyncio
+async def test_stale_summary_is_refreshed_within_the_turn():
+    """The refresh runs alongside generation and is done when the response is returned"""
+    state = summary_state(None, 0, HISTORY_RAW_TURNS + 1)
+    with patch.object(ConversationRepository, "check_conversation_ownership", return_value="ok"), \
+         patch.object(ConversationRepository, "get_conversation_summary", return_value=state), \
+         patch.object(server, 'get_context_and_ifi', return_value=[]), \
+         patch.object(server, 'ask_gemini', return_value={"text": "ok", "email": None}), \
+         patch.object(ConversationService, "refresh_summary") as mock_refresh:
+        res = await server.agent_service(
+            None, json.dumps(make_request(HISTORY_RAW_TURNS + 1)), Deadline(20), user_id="user-1"
+        )
+
+    assert res.result.text == "ok"
+    mock_refresh.assert_called_once_with(CONVERSATION_ID)
+
+@pytest.mark.asyncio
+async def test_slow_summary_refresh_does_not_hold_the_response():
+    """The turn waits at most SUMMARY_REFRESH_WAIT_SECONDS for the refresh once the answer is ready"""
+    release = threading.Event()
+    state = summary_state(None, 0, HISTORY_RAW_TURNS + 1)
+    with patch.object(ConversationRepository, "check_conversation_ownership", return_value="ok"), \
+         patch.object(ConversationRepository, "get_conversation_summary", return_value=state), \
+         patch.object(server, 'get_context_and_ifi', return_value=[]), \
+         patch.object(server, 'ask_gemini', return_value={"text": "ok", "email": None}), \
+         patch.object(server, "SUMMARY_REFRESH_WAIT_SECONDS", 0.05), \
+         patch.object(ConversationService, "refresh_summary", side_effect=lambda _: release.wait(5)):
+        started = time.monotonic()
+        res = await server.agent_service(
+            None, json.dumps(make_request(HISTORY_RAW_TURNS + 1)), Deadline(20), user_id="user-1"
+        )
+        elapsed = time.monotonic() - started
+        release.set()
+
+    assert res.result.text == "ok"
+    assert elapsed < 1
@@ -0,0 +1,72 @@
+# tests/test_s3_attachments.py
+import os
+import boto3
+import pytest
+from moto import mock_aws
+from unittest.mock import patch
+
+# Set environment variables before importing our module
+os.environ.setdefault('GEMINI_API_KEY', 'fake-api-key')
+os.environ.setdefault('AWS_ACCESS_KEY_ID', 'testing')
+os.environ.setdefault('AWS_SECRET_ACCESS_KEY', 'testing')
+
+from src.modules.chatbot.lib import attachment_parser as parser
+from src.modules.chatbot.lib import s3_attachments
+from src.modules.chatbot.lib.s3_attachments import open_s3_attachment, resolve_s3_attachments
+
+BUCKET = "lemonaid-attachments-bucket"
+KEY = "attachments/user-1/conv-abc/0b6f6d3e-3c64-4d0a-9d3f-0a3c5c7e2b11-drawing.pdf"
+
+@pytest.fixture
+def bucket():
+    with mock_aws():
+        client = boto3.client("s3", region_name="us-west-1")
+        client.create_bucket(Bucket=BUCKET, CreateBucketConfiguration={"LocationConstraint": "us-west-1"})
+        client.put_object(Bucket=BUCKET, Key=KEY, Body=b"drawing bytes", ContentType="application/pdf")
+        with patch.object(s3_attachments, "s3", client):
+            yield client
+
+def test_resolve_reads_metadata_without_downloading(bucket):
+    (attachment,) = resolve_s3_attachments([KEY], conversation_id="abc")
+
+    assert attachment.filename == "drawing.pdf"
+    assert attachment.content_type == "application/pdf"
+    assert attachment.size == len(b"drawing bytes")
+
+@pytest.mark.parametrize("key, conversation_id", [
+    ("uploads/other.pdf", None),  # Not an attachment key
+    ("attachments/user-1/conv-abc/../conv-xyz/a.pdf", None),
+    (KEY, "xyz"),  # Another conversation
+    ("attachments/user-1/conv-abc/missing.pdf", "abc"),
+])
+def test_resolve_rejects_foreign_or_missing_keys(bucket, key, conversation_id):
+    with pytest.raises(ValueError):
+        resolve_s3_attachments([key], conversation_id)
+
+def test_resolve_requires_the_users_prefix(bucket):
+    with pytest.raises(ValueError):
+        resolve_s3_attachments([KEY], conversation_id="abc", user_id="2")
+
+    (attachment,) = resolve_s3_attachments([KEY], conversation_id="abc", user_id="1")
+    assert attachment.key == KEY
+
+def test_open_streams_object_into_upload_file(bucket, tmp_path):
+    (attachment,) = resolve_s3_attachments([KEY])
+
+    upload = open_s3_attachment(attachment, str(tmp_path))
+
+    assert upload.filename == "drawing.pdf"
+    assert upload.content_type == "application/pdf"
+    assert upload.file.read() == b"drawing bytes"
+    upload.file.close()
+
+@pytest.mark.asyncio
+async def test_unchanged_objects_reuse_descriptions_without_download(bucket, tmp_path, mock_genai_client):
+    """A later turn referencing the same object version is answered from the description cache"""
+    first = await parser.attachments_parser(resolve_s3_attachments([KEY]), file_dir=str(tmp_path))
+    with patch.object(s3_attachments.s3, "get_object") as get_object:
+        second = await parser.attachments_parser(resolve_s3_attachments([KEY]), file_dir=str(tmp_path))
+
+    assert first == second == ["M6 x 20 socket head cap screw"]
+    get_object.assert_not_called()
+    assert mock_genai_client.models.generate_content.call_count == 1
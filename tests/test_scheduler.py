@@ -0,0 +1,205 @@
+# tests/test_scheduler.py
+import asyncio
+import json
+import os
+import threading
+import time
+import pytest
+from unittest.mock import Mock, patch
+
+# Set environment variables before importing our module
+os.environ.setdefault('GEMINI_API_KEY', 'fake-api-key')
+
+from google.genai import errors as genai_errors
+from src.shared.Scheduler_utils import (
+    RateScheduler,
+    TokenBucket,
+    retry_hint,
+    INTERACTIVE,
+    BACKGROUND,
+)
+from src.core.models import ChatbotReq
+from src.modules.chatbot.service import server
+
+def make_api_error(code, retry_delay=None):
+    details = []
+    if retry_delay:
+        details.append({"@type": "type.googleapis.com/google.rpc.RetryInfo", "retryDelay": retry_delay})
+    return genai_errors.APIError(code, {"error": {"code": code, "status": "RESOURCE_EXHAUSTED", "details": details}})
+
+class FakeClock:
+    """Monotonic clock that advances only when the scheduler sleeps"""
+    def __init__(self):
+        self.now = 0.0
+        self.sleep = Mock(side_effect=self.advance)
+
+    def advance(self, seconds):
+        self.now += seconds
+
+    def monotonic(self):
+        return self.now
+
+@pytest.fixture
+def no_sleep():
+    """Skip real backoff sleeps"""
+    clock = FakeClock()
+    with patch('src.shared.Scheduler_utils.time', clock):
+        yield clock.sleep
+
+def test_call_retries_throttled_calls_with_retry_hint(no_sleep):
+    """A 429 is retried after the provider's suggested delay"""
+    scheduler = RateScheduler(max_concurrency=2, rate_limits={}, default_rpm=6000, max_retries=3)
+    fn = Mock(side_effect=[make_api_error(429, "7s"), "ok"])
+
+    assert scheduler.call("gemini", fn) == "ok"
+    assert fn.call_count == 2
+    assert 7.0 in [c.args[0] for c in no_sleep.call_args_list]
+    stats = scheduler.metrics()["models"]["gemini"]
+    assert stats["throttled"] == 1
+    assert stats["retries"] == 1
+
+def test_call_does_not_retry_client_errors(no_sleep):
+    """Non-retryable errors surface immediately"""
+    scheduler = RateScheduler(max_concurrency=2, rate_limits={}, default_rpm=6000, max_retries=3)
+    fn = Mock(side_effect=make_api_error(400))
+
+    with pytest.raises(genai_errors.APIError):
+        scheduler.call("gemini", fn)
+    assert fn.call_count == 1
+    assert scheduler.metrics()["models"]["gemini"]["failures"] == 1
+
+def test_call_gives_up_after_max_retries(no_sleep):
+    """Persistent throttling fails after the retry budget"""
+    scheduler = RateScheduler(max_concurrency=2, rate_limits={}, default_rpm=6000, max_retries=2)
+    fn = Mock(side_effect=make_api_error(503))
+
+    with pytest.raises(genai_errors.APIError):
+        scheduler.call("gemini", fn)
+    assert fn.call_count == 3
+
+def test_retry_hint_reads_retry_after_header():
+    """Retry-After headers are honored"""
+    error = Mock()
+    error.response.headers = {"Retry-After": "3"}
+
+    assert retry_hint(error) == 3.0
+
+def test_token_bucket_waits_when_empty(no_sleep):
+    """An empty bucket makes callers wait for the refill"""
+    bucket = TokenBucket(rpm=60, capacity=1)
+
+    assert bucket.take() == 0.0
+    assert bucket.take() > 0
+    assert no_sleep.called
+
+def test_interactive_lane_is_admitted_before_background():
+    """Queued interactive calls run before queued background calls"""
+    scheduler = RateScheduler(max_concurrency=1, rate_limits={}, default_rpm=60000, max_retries=0)
+    release = threading.Event()
+    order = []
+
+    blocker = threading.Thread(target=scheduler.call, args=("m", lambda: release.wait(5)))
+    blocker.start()
+    while scheduler.metrics()["active"] == 0:
+        time.sleep(0.001)
+
+    background = threading.Thread(target=scheduler.call, args=("m", lambda: order.append("background"), BACKGROUND))
+    background.start()
+    while scheduler.metrics()["queued"] < 1:
+        time.sleep(0.001)
+    interactive = threading.Thread(target=scheduler.call, args=("m", lambda: order.append("interactive"), INTERACTIVE))
+    interactive.start()
+    while scheduler.metrics()["queued"] < 2:
+        time.sleep(0.001)
+
+    release.set()
+    for t in (blocker, background, interactive):
+        t.join(5)
+
+    assert order == ["interactive", "background"]
+
+@pytest.mark.asyncio
+async def test_async_callers_do_not_block_the_event_loop():
+    """A provider call stuck in the scheduler (throttled, backing off) leaves other requests running"""
+    scheduler = RateScheduler(max_concurrency=1, rate_limits={}, default_rpm=6000)
+
+    ticks = 0
+    ticks_during_call = None
+
+    def slow_generate(**kwargs):
+        nonlocal ticks_during_call
+        time.sleep(0.3)
+        ticks_during_call = ticks
+        return Mock(text='{"text": "ok", "email": null}')
+
+    async def ticker():
+        nonlocal ticks
+        for _ in range(5):
+            await asyncio.sleep(0.02)
+            ticks += 1
+
+    with patch.object(server, "llm_scheduler", scheduler), \
+         patch.object(server.genai_client.models, "generate_content", side_effect=slow_generate):
+        result, _ = await asyncio.gather(
+            server.ask_gemini([], ChatbotReq(query="quote M8"), ""),
+            ticker(),
+        )
+
+    assert result == {"text": "ok", "email": None}
+    assert ticks_during_call == 5
+
+@pytest.mark.asyncio
+async def test_queued_async_callers_hold_no_threads():
+    """Async callers queued for a slot wait on the event loop; only running provider calls use threads"""
+    scheduler = RateScheduler(max_concurrency=1, rate_limits={}, default_rpm=60000, max_retries=0)
+    release = threading.Event()
+    offloaded = []
+    to_thread = asyncio.to_thread
+
+    async def counting_to_thread(fn, *args):
+        offloaded.append(fn)
+        return await to_thread(fn, *args)
+
+    with patch('src.shared.Scheduler_utils.asyncio.to_thread', side_effect=counting_to_thread):
+        blocker = asyncio.ensure_future(scheduler.acall("m", lambda: release.wait(5)))
+        queued = [asyncio.ensure_future(scheduler.acall("m", lambda: "ok")) for _ in range(10)]
+        while scheduler.metrics()["queued"] < 10:
+            await asyncio.sleep(0.001)
+
+        assert len(offloaded) == 1
+        release.set()
+        results = await asyncio.gather(*queued)
+        await blocker
+
+    assert results == ["ok"] * 10
+    assert len(offloaded) == 11
+
+@pytest.mark.asyncio
+async def test_rate_limited_model_does_not_hold_a_slot():
+    """A caller waiting for its model's rate limit leaves the concurrency slot to other models"""
+    scheduler = RateScheduler(max_concurrency=1, rate_limits={"slow": 1}, default_rpm=60000, max_retries=0)
+    await scheduler.acall("slow", lambda: "first")
+
+    throttled = asyncio.ensure_future(scheduler.acall("slow", lambda: "second"))
+    await asyncio.sleep(0.01)
+    result = await asyncio.wait_for(scheduler.acall("fast", lambda: "ok"), timeout=1)
+
+    assert result == "ok"
+    assert not throttled.done()
+    throttled.cancel()
+
+def test_metrics_are_published_as_emf(capsys):
+    """Each publish writes the per-model counters gathered since the previous one"""
+    scheduler = RateScheduler(max_concurrency=1, rate_limits={}, default_rpm=60000, max_retries=0)
+    scheduler.call("gemini", lambda: "ok")
+    scheduler.publish_metrics()
+    scheduler.publish_metrics()
+
+    records = [json.loads(line) for line in capsys.readouterr().out.splitlines()]
+    model_records = [record for record in records if record.get("Model") == "gemini"]
+
+    assert [record["calls"] for record in model_records] == [1, 0]
+    definition = model_records[0]["_aws"]["CloudWatchMetrics"][0]
+    assert definition["Dimensions"] == [["Model"]]
+    assert {"Name": "latency_seconds", "Unit": "Seconds"} in definition["Metrics"]
+    assert records[1]["queued"] == 0
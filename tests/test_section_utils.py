@@ -0,0 +1,38 @@
+# tests/test_section_utils.py
+from src.shared.Section_utils import locate_chunk, matched_sections, split_sections
+
+DOCUMENT = (
+    "IFI 500 hex nuts\n"
+    "# Dimensions\n"
+    "| Size | Width |\n| M6 | 10 |\n"
+    "\n"
+    "| Size | Height |\n| M6 | 5 |\n"
+    "## Materials\n"
+    "Steel grade 8.\n"
+)
+
+def texts(document, sections):
+    return [document[start:end] for start, end in sections]
+
+def test_split_sections_on_headings_and_tables():
+    sections = split_sections(DOCUMENT)
+
+    assert texts(DOCUMENT, sections) == [
+        "IFI 500 hex nuts\n",
+        "# Dimensions\n| Size | Width |\n| M6 | 10 |\n\n",
+        "| Size | Height |\n| M6 | 5 |\n",
+        "## Materials\nSteel grade 8.\n",
+    ]
+    assert sections[-1][1] == len(DOCUMENT)
+
+def test_document_without_structure_is_one_section():
+    assert split_sections("plain text\nmore text\n") == [(0, 21)]
+
+def test_locate_chunk_and_match_sections():
+    sections = split_sections(DOCUMENT)
+
+    span = locate_chunk(DOCUMENT, "| Size | Height |\n| M6 | 5 |")
+
+    assert matched_sections(sections, span) == [2]
+    assert locate_chunk(DOCUMENT, "not in the document") is None
+    assert locate_chunk(DOCUMENT, "") is None
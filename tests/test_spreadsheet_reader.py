@@ -0,0 +1,112 @@
+# tests/test_spreadsheet_reader.py
+import io
+import json
+import os
+import pytest
+import openpyxl
+from fastapi import UploadFile
+from unittest.mock import Mock, patch
+
+# Set environment variables before importing our module
+os.environ.setdefault('GEMINI_API_KEY', 'fake-api-key')
+
+from src.modules.chatbot.lib import attachment_parser as parser
+from src.modules.chatbot.lib.spreadsheet_reader import (
+    Sheet, chunk_sheets, read_spreadsheet, render_sheets,
+)
+
+@pytest.fixture
+def bom_xlsx(tmp_path):
+    workbook = openpyxl.Workbook()
+    bom = workbook.active
+    bom.title = "BOM"
+    bom.append([None, None, None, None])
+    bom.append(["Part No", None, "Description", "Qty"])
+    bom.append(["A-100", None, "M6 x 20\tSHCS", 40.0])
+    bom.append([None, None, None, None])
+    bom.append(["A-101", None, "M8 washer", 2.5])
+    workbook.create_sheet("Empty")
+    notes = workbook.create_sheet("Notes")
+    notes.append(["Finish"])
+    notes.append(["Zinc plated"])
+    path = tmp_path / "bom.xlsx"
+    workbook.save(path)
+    return str(path)
+
+def test_xlsx_reads_all_non_empty_sheets_and_drops_blanks(bom_xlsx):
+    """Blank rows/columns and empty sheets are dropped; source row numbers are kept"""
+    sheets = read_spreadsheet(bom_xlsx, ".xlsx")
+
+    assert [sheet.name for sheet in sheets] == ["BOM", "Notes"]
+    assert sheets[0].header == ["Part No", "Description", "Qty"]
+    assert sheets[0].rows == [(3, ["A-100", "M6 x 20 SHCS", "40"]), (5, ["A-101", "M8 washer", "2.5"])]
+
+def test_render_writes_header_once_with_row_numbers(bom_xlsx):
+    """The encoding is header-once TSV with a row column"""
+    text = render_sheets(read_spreadsheet(bom_xlsx, ".xlsx"))
+
+    assert text == (
+        "## Sheet: BOM (2 rows)\n"
+        "row\tPart No\tDescription\tQty\n"
+        "3\tA-100\tM6 x 20 SHCS\t40\n"
+        "5\tA-101\tM8 washer\t2.5\n"
+        "\n"
+        "## Sheet: Notes (1 rows)\n"
+        "row\tFinish\n"
+        "2\tZinc plated"
+    )
+
+def test_csv_is_read_with_sniffed_delimiter(tmp_path):
+    """Semicolon CSV with a BOM marker is parsed locally"""
+    path = tmp_path / "bom.csv"
+    path.write_text("\ufeffPart No;Qty\nA-100;40\n;\n", encoding="utf-8")
+
+    assert render_sheets(read_spreadsheet(str(path), ".csv")) == "## Sheet: CSV (1 rows)\nrow\tPart No\tQty\n2\tA-100\t40"
+
+def test_unsupported_extension_raises(tmp_path):
+    with pytest.raises(ValueError):
+        read_spreadsheet(str(tmp_path / "bom.ods"), ".ods")
+
+def test_chunk_sheets_splits_long_sheets_and_packs_small_ones():
+    """Chunks hold at most N rows, keep the header of split sheets, and keep row order"""
+    long_sheet = Sheet("BOM", ["Part"], [(i, [f"P{i}"]) for i in range(2, 7)])
+    small_sheet = Sheet("Notes", ["Note"], [(2, ["zinc"])])
+
+    chunks = chunk_sheets([long_sheet, small_sheet], rows_per_chunk=2)
+
+    assert [[(s.name, [n for n, _ in s.rows]) for s in chunk] for chunk in chunks] == [
+        [("BOM", [2, 3])], [("BOM", [4, 5])], [("BOM", [6]), ("Notes", [2])],
+    ]
+    assert render_sheets(chunks[1]).splitlines()[:2] == ["## Sheet: BOM (part: 2 of 5 rows)", "row\tPart"]
+
+@pytest.mark.asyncio
+async def test_large_sheets_are_extracted_in_parallel_chunks_in_row_order(tmp_path):
+    """Each chunk is its own call; a chunk with invalid output is retried alone; results keep row order"""
+    workbook = openpyxl.Workbook()
+    workbook.active.append(["Part"])
+    for i in range(5):
+        workbook.active.append([f"P{i}"])
+    buffer = io.BytesIO()
+    workbook.save(buffer)
+    upload = Mock(spec=UploadFile)
+    upload.filename = "bom.xlsx"
+    upload.content_type = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+    upload.file = buffer
+    calls = []
+
+    def generate_content(model, contents, config):
+        (chunk,) = contents
+        parts = [line.split("\t")[1] for line in chunk.splitlines()[3:]]
+        calls.append(parts)
+        response = Mock()
+        # The first attempt of the middle chunk comes back truncated
+        response.text = '["P2' if parts == ["P2", "P3"] and calls.count(parts) == 1 else json.dumps(parts)
+        return response
+
+    parser.description_cache.clear()
+    with patch.object(parser.genai, "Client") as mock_client_class, patch.object(parser, "SHEET_CHUNK_ROWS", 2):
+        mock_client_class.return_value.models.generate_content.side_effect = generate_content
+        descriptions = await parser.attachments_parser([upload], file_dir=str(tmp_path))
+
+    assert descriptions == ["P0", "P1", "P2", "P3", "P4"]
+    assert sorted(calls) == [["P0", "P1"], ["P2", "P3"], ["P2", "P3"], ["P4"]]
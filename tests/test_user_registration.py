@@ -0,0 +1,48 @@
+# tests/test_user_registration.py
+import os
+import jwt
+import pytest
+from unittest.mock import patch
+
+# Set environment variables before importing our module
+os.environ.setdefault('GEMINI_API_KEY', 'fake-api-key')
+
+from src.modules.auth.lib import cognito_utils
+from src.modules.auth.lib.cognito_utils import register_user_with_id_token
+
+USER_ID = "6f1c2e0a-4b7d-4e65-9a51-3f0f1d2b8c77"
+
+def make_id_token(name="Ada", email="ada@example.com"):
+    return jwt.encode({"sub": USER_ID, "name": name, "email": email, "picture": "p.png"}, "test-secret-key-of-at-least-32-bytes")
+
+@pytest.fixture
+def mock_upsert():
+    cognito_utils.known_users.clear()
+    with patch.object(cognito_utils, "upsert_user") as mock:
+        mock.side_effect = lambda user_id, username, email: {
+            "user_id": user_id, "username": username, "email": email,
+        }
+        yield mock
+
+def test_known_user_skips_the_database(mock_upsert):
+    first = register_user_with_id_token(make_id_token())
+    second = register_user_with_id_token(make_id_token())
+
+    assert mock_upsert.call_count == 1
+    assert first == second == {
+        "user_id": USER_ID, "username": "Ada", "email": "ada@example.com", "picture": "p.png",
+    }
+
+def test_changed_username_is_upserted_again(mock_upsert):
+    register_user_with_id_token(make_id_token())
+    renamed = register_user_with_id_token(make_id_token(name="Ada L."))
+
+    assert mock_upsert.call_count == 2
+    assert renamed["username"] == "Ada L."
+
+def test_failed_upsert_raises(mock_upsert):
+    mock_upsert.side_effect = lambda *args: {}
+
+    with pytest.raises(ValueError):
+        register_user_with_id_token(make_id_token())
+    assert len(cognito_utils.known_users) == 0